@@ -25,6 +25,8 @@ if __name__=="__main__":
     ending_year=2050
     file_location=r'C:\Users\user_name\Documents' #this is a pre-existing folder where outputs will be stored and read from, including shading data, mosaic files, segmentation file, and the rasterized segmentation file and output files (output data) as excel files with structure output_region_name.xlsx (same as the market mode) 
     shading_granularity='hourly' #options are hourly, or representative
+    shading_workers=1 # number of processes used to calculate the shading (ex. os.cpu_count()), the results are the same for any number
+    lidar_workers=1 # number of processes used to create the DSM files of the lidar files (ex. os.cpu_count())
 
     u_c=20 #PVsyst Fayman temperature coefficient constant
     u_v=0 #PVsyst Fayman temperature coefficient multiplying wind speed
@@ -49,9 +51,9 @@ if __name__=="__main__":
     hosting_capacity=hosting_capacity_variables.hosting_capacity(inverter_efficiency_nominal,dc_to_ac_capacity_ratio,lifetime_years,
                                                     u_v,u_c,hosting_limit)
     if len(region_names)>1:
-        start_analysis.calculate_all_regions_grid(file_location,resolution,mode,p_range,q_range,region_names,hosting_capacity,hourly_demand,annual_demand,starting_year,ending_year,scaling_option,shading_granularity)
+        start_analysis.calculate_all_regions_grid(file_location,resolution,mode,p_range,q_range,region_names,hosting_capacity,hourly_demand,annual_demand,starting_year,ending_year,scaling_option,shading_granularity,shading_workers=shading_workers,lidar_workers=lidar_workers)
     else:
-        start_analysis.calculate_one_region_grid(region_names[0],file_location,resolution,hosting_capacity,mode,p_range,q_range,hourly_demand[0],annual_demand[0],starting_year,ending_year,scaling_option,shading_granularity)
+        start_analysis.calculate_one_region_grid(region_names[0],file_location,resolution,hosting_capacity,mode,p_range,q_range,hourly_demand[0],annual_demand[0],starting_year,ending_year,scaling_option,shading_granularity,shading_workers=shading_workers,lidar_workers=lidar_workers)
     
     et =time.time()
     elapsed_time=round((et-st)/60,2)
@@ -19,6 +19,8 @@ if __name__=="__main__":
                         #  i.e. if scaling up the results from the region used with lidar data to calculate a larger area
                         # Example: scaling up from the shaded POA calculated for Toronto,CA to calculate the province-wide results for Ontario
     shading_granularity='hourly' #options are hourly, or representative
+    shading_workers=1 # number of processes used to calculate the shading (ex. os.cpu_count()), the results are the same for any number
+    lidar_workers=1 # number of processes used to create the DSM files of the lidar files (ex. os.cpu_count())
 
     region_names=['Example1_scale','Example2_scale'] #should match the files names in the \batch_inputs\Grid_scale folder
     # region_names=['Example1_scale'] #should match the files names in the \batch_inputs\Grid_scale folder
@@ -55,9 +57,9 @@ if __name__=="__main__":
     hosting_capacity=hosting_capacity_variables.hosting_capacity(inverter_efficiency_nominal,dc_to_ac_capacity_ratio,lifetime_years,
                                                     u_v,u_c,hosting_limit)
     if len(region_names)>1:
-        start_analysis.calculate_all_regions_grid(file_location,resolution,mode,p_range,q_range,region_names,hosting_capacity,hourly_demand,annual_demand,starting_year,ending_year,scaling_option,shading_granularity,cap_coefficient_shade,elec_coefficient_shade)
+        start_analysis.calculate_all_regions_grid(file_location,resolution,mode,p_range,q_range,region_names,hosting_capacity,hourly_demand,annual_demand,starting_year,ending_year,scaling_option,shading_granularity,cap_coefficient_shade,elec_coefficient_shade,shading_workers,lidar_workers)
     else:
-        start_analysis.calculate_one_region_grid(region_names[0],file_location,resolution,hosting_capacity,mode,p_range,q_range,hourly_demand[0],annual_demand[0],starting_year,ending_year,scaling_option,shading_granularity,cap_coefficient_shade,elec_coefficient_shade)
+        start_analysis.calculate_one_region_grid(region_names[0],file_location,resolution,hosting_capacity,mode,p_range,q_range,hourly_demand[0],annual_demand[0],starting_year,ending_year,scaling_option,shading_granularity,cap_coefficient_shade,elec_coefficient_shade,shading_workers,lidar_workers)
     
     et =time.time()
     elapsed_time=round((et-st)/60,2)
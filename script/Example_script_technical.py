@@ -25,11 +25,13 @@ if __name__=="__main__":
     performance_ratio=0.75
     module_efficiency=0.225
     resolution=1 # resolution for the DSM files (only used when there are no DSM files already made)
+    shading_workers=1 # number of processes used to calculate the shading (ex. os.cpu_count()), the results are the same for any number
+    lidar_workers=1 # number of processes used to create the DSM files of the lidar files (ex. os.cpu_count())
 
     ####################################################
 
     start_analysis.run_detailed(file_location,mode,shading_granularity,resolution,region_name,performance_ratio,
-                 module_efficiency)
+                 module_efficiency,shading_workers,lidar_workers)
 
     et =time.time()
     elapsed_time=round((et-st)/60,2)
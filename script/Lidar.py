@@ -5,7 +5,44 @@ Created on Mon Jan 25 12:52:14 2021
 @author: nsalimza and egaucher
 """
 import glob
+import json
+import time
+from hashlib import sha256
+from multiprocessing import Pool
+from os import makedirs,path,replace,scandir,stat
+from rasterio import open as open_file
 from WBT.whitebox_tools import WhiteboxTools
+from tools import file_checksum,tile_manifest
+
+#DSM_files of a process of the pool used by DSM_tiles
+worker_files=None
+
+def build_tile(task:tuple)->tuple:
+    """
+    Creates the DSM of one LAS file in a process of the pool (used by DSM_files.DSM_tiles).
+    The DSM is created in a temporary folder and moved to the output file once complete.
+
+    Parameters
+    ----------
+    task : tuple
+        (LAS file, resolution, output file, temporary folder)
+
+    Returns
+    -------
+    tuple
+        (LAS file, output file, checksum of the LAS file or None if the DSM was not created)
+    """
+    global worker_files
+    if worker_files is None:
+        worker_files=DSM_files()
+    file,resolution,output_file,temp_folder=task
+    temp_file=path.join(temp_folder,path.basename(output_file))
+    worker_files.DSM_one(file,resolution,temp_file)
+    if not(path.isfile(temp_file)):
+        return file,output_file,None
+    replace(temp_file,output_file)
+    return file,output_file,file_checksum(file).digest()
+
 class DSM_files:
     def __init__(self)->None:
         self.wbt = WhiteboxTools()
@@ -49,7 +86,7 @@ class DSM_files:
             #callback=default_callback
         )
         
-    def DSM_one(self,file:str,resolution:float|int,output_file:str)->None:
+    def DSM_one(self,file:str,resolution:float|int,output_file:str)->int:
         """
         This function creates a digital surface model (DSM) 
         from the input .las and .laz files (LiDAR files)
@@ -63,6 +100,10 @@ class DSM_files:
         output_file : string
             the output filename and path for the tif file
 
+        Returns
+        -------
+        int
+            return code of WhiteboxTools (0 if the DSM was created)
         """
         
         # Digital surface model
@@ -75,7 +116,7 @@ class DSM_files:
         #--max_triangle_edge_length	Optional maximum triangle edge length; triangles larger than this size will not be gridded
 
         
-        self.wbt.lidar_digital_surface_model(
+        return self.wbt.lidar_digital_surface_model(
             i= file, 
             output= output_file,
             resolution=resolution, 
@@ -86,6 +127,108 @@ class DSM_files:
             #callback=default_callback
         )
         
+    def DSM_tiles(self,directory:str,resolution:float|int,workers:int=1,files:list[str]=None)->int:
+        """
+        Creates the DSM of each LAS file of a folder (same name with the extension .tif) with
+        DSM_one, in parallel with a pool of processes. The LAS files and the resolution of the
+        DSM files are recorded in a manifest (DSM_manifest.json) as each DSM is created, so an
+        interrupted run resumes and a new run only creates the DSM of the LAS files that changed
+        (or all of them if the resolution changed).
+
+        Parameters
+        ----------
+        directory : string
+            folder of the LAS files (.las or .laz), where the DSM files are created
+        resolution : float or int
+            the resolution required for creating the DSM.
+        workers : int
+            number of processes creating DSM files at once
+        files : list[string]
+            LAS files of the folder to use (ex. from tile_index), all the files if None
+
+        Returns
+        -------
+        int
+            number of DSM files created
+        """
+        manifest=tile_manifest(path.join(directory,'DSM_manifest.json'))
+        parameters={'resolution':float(resolution)}
+        temp_folder=path.join(directory,'DSM_temp')
+        names=None if files is None else set(path.basename(file) for file in files)
+        tasks=[]
+        for entry in sorted(scandir(directory),key=lambda entry:entry.name):
+            if not(entry.is_file()) or path.splitext(entry.name)[1].lower() not in ['.las','.laz']:
+                continue
+            if names is not None and entry.name not in names:
+                continue
+            output_file=path.splitext(entry.path)[0]+'.tif'
+            if manifest.up_to_date(entry.path,output_file,parameters):
+                continue
+            if entry.name not in manifest.tiles and self.existing_DSM(entry.path,output_file,resolution):
+                #DSM created before the manifest existed
+                manifest.record(entry.path,output_file,parameters)
+                continue
+            tasks.append((entry.path,resolution,output_file,temp_folder))
+        if len(tasks)==0:
+            manifest.save()
+            print("All the DSM files are up to date")
+            return 0
+        print("Creating ",len(tasks)," DSM files")
+        makedirs(temp_folder,exist_ok=True)
+        start=time.time()
+        built=0
+        failed=[]
+        if workers<=1:
+            results=map(build_tile,tasks)
+        else:
+            pool=Pool(workers)
+            results=pool.imap_unordered(build_tile,tasks)
+        try:
+            for file,output_file,checksum in results:
+                if checksum is None:
+                    failed.append(file)
+                    continue
+                manifest.record(file,output_file,parameters,checksum)
+                manifest.save()
+                built+=1
+                print("Created DSM ",built," of ",len(tasks),": ",path.basename(output_file))
+        finally:
+            manifest.save()
+            if workers>1:
+                pool.terminate()
+        print("Created ",built," DSM files in ",round(time.time()-start,1)," s")
+        if len(failed)>0:
+            raise Exception("The DSM could not be created for: "+', '.join(failed))
+        return built
+
+    @staticmethod
+    def existing_DSM(file:str,output_file:str,resolution:float|int)->bool:
+        """
+        Checks if a DSM created without the manifest can be kept: it is more recent than the
+        LAS file and has the required resolution.
+
+        Parameters
+        ----------
+        file : string
+            LAS file
+        output_file : string
+            DSM file of the LAS file
+        resolution : float or int
+            the resolution required for the DSM.
+
+        Returns
+        -------
+        bool
+            True if the DSM can be kept
+        """
+        if not(path.isfile(output_file)) or path.getmtime(output_file)<path.getmtime(file):
+            return False
+        try:
+            with open_file(output_file) as DSM:
+                return abs(DSM.res[0]-resolution)<1e-9 and abs(DSM.res[1]-resolution)<1e-9
+        except Exception:
+            return False
+
     def modify_lidar_density(self,resolution:float|int,directory:str)->None:
         """
         This function artifically thins the point cloud density of the input 
@@ -121,7 +264,7 @@ class DSM_files:
                 resolution=resolution, 
                 method="highest", #nearest
             )
-    def mosaic(self,directory: str, output_file: str) -> None:
+    def mosaic(self,directory: str, output_file: str, inputs: list[str]=None) -> None:
         """
         Merge all tif files into one file.
 
@@ -131,6 +274,8 @@ class DSM_files:
             the directory with all the input DSM files to merge.
         shapefile: str
             the location of the mosaic file output with file extension .tif
+        inputs: list[str]
+            DSM files to merge (ex. of the tiles with buildings), all the tif files of the directory if None
         """
         
         #Mosaic
@@ -138,9 +283,60 @@ class DSM_files:
         #-o, --output	Output raster file
         #--method	Resampling method; options include 'nn' (nearest neighbour), 'bilinear', and 'cc' (cubic convolution)
         
+        if inputs is not None and len(inputs)==0:
+            raise Exception("No DSM files (.tif) to combine in "+directory)
         self.wbt.set_working_dir(directory)
         self.wbt.mosaic(
             output_file, 
-            inputs=None, 
+            inputs=None if inputs is None else ';'.join(inputs), 
             method="nn", 
-        )
\ No newline at end of file
+        )
+
+    def virtual_mosaic(self,directory: str, output_file: str, inputs: list[str]=None) -> None:
+        """
+        Combines the tif files into a virtual mosaic (GDAL VRT). The VRT only references the
+        DSM files, so it is created in seconds and does not copy them, and all the readers of
+        the mosaic (rasterio, GDAL) read windows of it as if it was one file. The size and
+        modification time of the DSM files are saved in the metadata of the VRT (DSM_SOURCES)
+        so its checksum, used to reuse the shading results, changes when a DSM file changes.
+
+        Parameters
+        ----------
+        directory : string
+            the directory with all the input DSM files to combine.
+        output_file: str
+            the location of the mosaic file output with file extension .vrt
+        inputs: list[str]
+            DSM files to combine (ex. of the tiles with buildings), all the tif files of the directory if None
+        """
+        from osgeo import gdal
+        if inputs is None:
+            inputs=sorted(glob.glob(path.join(directory,'*.tif')))
+        if len(inputs)==0:
+            raise Exception("No DSM files (.tif) to combine in "+directory)
+        sources=[[path.basename(file),stat(file).st_size,stat(file).st_mtime_ns] for file in inputs]
+        mosaic=gdal.BuildVRT(output_file,inputs,options=gdal.BuildVRTOptions(resampleAlg='nearest'))
+        if mosaic is None:
+            raise Exception("The virtual mosaic could not be created: "+output_file)
+        mosaic.SetMetadataItem('DSM_SOURCES',sha256(json.dumps(sources).encode()).hexdigest())
+        mosaic.FlushCache()
+        mosaic=None
+
+    def export_mosaic(self,virtual_file: str, output_file: str) -> None:
+        """
+        Copies a virtual mosaic (.vrt) to one GeoTIFF file (ex. to use it in another software
+        or with the WhiteboxTools shading backend).
+
+        Parameters
+        ----------
+        virtual_file : string
+            the virtual mosaic (.vrt)
+        output_file: str
+            the location of the mosaic file output with file extension .tif
+        """
+        from osgeo import gdal
+        mosaic=gdal.Translate(output_file,virtual_file,options=gdal.TranslateOptions(format='GTiff',
+                              creationOptions=['TILED=YES','COMPRESS=DEFLATE','BIGTIFF=IF_SAFER']))
+        if mosaic is None:
+            raise Exception("The mosaic could not be exported: "+output_file)
+        mosaic=None
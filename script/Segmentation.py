@@ -57,6 +57,46 @@ def all_tiles(directory:str,bldg_footprint:str,shapefile:str)->None:
         azimuth=180.0, 
         altitude=30.0)
 
+def tile_folder(directory:str,files:list[str])->str:
+    """
+    This function creates a folder with only some of the lidar files of a directory
+    (ex. the tiles with buildings from tile_index) so that all_tiles only segments them.
+    The files are hard links to the lidar files (copies if the links cannot be created),
+    so no lidar file is duplicated on disk.
+
+    Parameters
+    ----------
+    directory : string
+        the directory with all the lidar files.
+    files : list[str]
+        lidar files to segment.
+
+    Returns
+    -------
+    string
+        folder with the selected lidar files
+    """
+    import os
+    import shutil
+    folder=os.path.join(directory,'Selected tiles')
+    os.makedirs(folder,exist_ok=True)
+    names=set(os.path.basename(file) for file in files)
+    #files of a previous selection
+    for entry in os.scandir(folder):
+        if entry.is_file() and entry.name not in names:
+            os.remove(entry.path)
+    for file in files:
+        link=os.path.join(folder,os.path.basename(file))
+        if os.path.isfile(link) and os.path.getmtime(link)>=os.path.getmtime(file) and os.path.getsize(link)==os.path.getsize(file):
+            continue
+        if os.path.isfile(link):
+            os.remove(link)
+        try:
+            os.link(file,link)
+        except OSError:
+            shutil.copy2(file,link)
+    return folder
+
 def one_tile(input_file:str,bldg_footprint:str,shapefile:str)->None:
     """
     Thsi function outputs a complete segmentation file using one lidar file
@@ -5,15 +5,19 @@ Created on Fri Apr 16 15:24:03 2021
 @author: nsalimza and egaucher
 """
 from WBT.whitebox_tools import WhiteboxTools
-from pandas import DataFrame
-from numpy import arange,unique,column_stack,zeros 
+from pandas import DataFrame,Index,Series,Timestamp,Timedelta,date_range
+from numpy import ndarray,arange,zeros,full,nan,stack,flatnonzero,unique,concatenate,where,searchsorted,ceil,savez,load,array_split,nanmax,nanmean
 from rasterio import open as open_file
-from pvlib import iotools
-from os import path
+from rasterio.windows import Window
+from os import path,getpid
+from multiprocessing import Pool
 from itertools import chain
+from hashlib import sha256
+import json
+from tools import shadow_engine,zonal_index,shading_cache,chunk_store,tid_store,file_checksum,weather_context,segment_raster,file_handle
 
 class TID:
-    def __init__(self,region,file_location:str)->None:
+    def __init__(self,region,file_location:str,mode:str='Technical',backend:str='whitebox',sun_tolerance:float=0.25)->None:
         self.raster_file=region.raster_file
         self.latitude=region.latitude
         self.longitude=region.longitude
@@ -23,34 +27,39 @@ class TID:
         self.weather_file_address=region.weather_file
         self.file_location=file_location
         self.file_classifier=region.file_classifier
-        if region.latitude>60:
-            self.Weather_dataframe=iotools.read_epw(region.weather_file)[0]
-            self.Weather_dataframe.rename(columns={'ghi':'GHI'},inplace=True)
-            self.Weather_dataframe.rename(columns={'temp_air':'Temperature'},inplace=True)
-        else:
-            self.Weather_dataframe=iotools.read_psm3(region.weather_file)[0] # https://pvlib-python.readthedocs.io/en/stable/generated/pvlib.iotools.read_psm3.html
-            self.Weather_dataframe.rename(columns={'ghi':'GHI'},inplace=True)
-            self.Weather_dataframe.rename(columns={'dni':'DNI'},inplace=True)
-            self.Weather_dataframe.rename(columns={'dhi':'DHI'},inplace=True)
-            self.Weather_dataframe.rename(columns={'temp_air':'Temperature'},inplace=True)
+        if backend not in ['numpy','whitebox']:
+            raise Exception("Not a valid shading backend. Options include: numpy or whitebox")
+        self.backend=backend
+        #the sun positions of the numpy backend are grouped by azimuth sector and by altitude rounded to this value (degrees)
+        self.sun_tolerance=sun_tolerance
+        self.cache=None
+        #size of the tiles in cells (0 to shade the whole mosaic at once)
+        self.tile_size=region.shading_tile_size
+        if self.tile_size>0 and backend!='numpy':
+            raise Exception("The tiled shading is only available with the numpy backend")
+        if self.mosaic.lower().endswith('.vrt') and backend!='numpy':
+            raise Exception("The WhiteboxTools backend needs a .tif mosaic. Export the virtual mosaic with region_data.export_mosaic")
+        #The weather file is read once per process and shared with the technical potential of the same mode (tools.weather_context)
+        self.weather_context=weather_context.get(region.weather_file,region.latitude,region.longitude,region.altitude,region.timezone,
+                                                 weather_context.reader_for(region.latitude,mode))
+        self.Weather_dataframe=self.weather_context.weather.copy()
 
         self.wbt=WhiteboxTools()
         self.wbt.set_verbose_mode(False)
             
-        Rasterized_segments = open_file(self.raster_file)
-        #Get 2D numpy arrays
-        Rasterized_segments_array=Rasterized_segments.read(1)
-
-        #Turn arrays into 1D vectors 
-        self.Rasterized_segments_ravel=Rasterized_segments_array.ravel()
-
-        del Rasterized_segments_array
-        del Rasterized_segments
-
-        #Create a dataframe of 0s with hours as rows and FIDs as columns
-        #Rasterized_segments_ravel includes -999. We are counting the number of unique values with this, which we want to exclude. But we then wish to add 1, so this is equivalent.
+        if self.tile_size>0:
+            #The cells of each tile are indexed when the tile is shaded, only the FIDs are needed here
+            self.zonal=None
+            self.FID=self.tile_FID()
+        else:
+            #Position and number of cells of each FID, found once and used to average every TID raster
+            #(memory-mapped from the converted raster, the processes of a pool share it)
+            self.zonal=segment_raster.get(self.raster_file).zonal()
+            self.FID=self.zonal.FID
 
-        self.TID = DataFrame(index = self.Weather_dataframe.index, columns = arange(1,len(unique(self.Rasterized_segments_ravel)),1))
+        #Hours with daylight (GHI>0), the only hours kept in the hourly TID
+        self.daylight=flatnonzero(self.Weather_dataframe['GHI'].values>0)
+        self.TID=None
 
     def annual(self)->DataFrame:
         """
@@ -79,6 +88,19 @@ class TID:
         #--end_time	Starting hour to track shadows (e.g. 21, 21:00, 21:00:00). Assumes 24-hour time: HH:MM:SS. 'sunset' is also a valid time
         
         ########
+        if self.backend=='numpy':
+            year=self.Weather_dataframe.index[0]
+            times=date_range(Timestamp(year.year,1,1,tz=year.tz),periods=365*24,freq='h')
+            sun=shadow_engine.sun_positions(times,self.latitude,self.longitude)
+            #all the sun positions of the year are one period
+            sun['hour']=0
+            if self.tile_size>0:
+                sunlit=self.shade_tiles(sun,r'\Timeindaylight_annual_')
+            else:
+                sunlit=self.shade_sun(sun)
+                self.save_cache()
+            self.TID=Series(sunlit[0],index=self.FID,name='TID').rename_axis('FID_raster')
+            return self.TID
 
         output_file=self.file_location+r'\Timeindaylight_annual_'+self.file_classifier+'.tif'
 
@@ -99,42 +121,61 @@ class TID:
         self.TID=self.extract_TID(output_file)
         return self.TID
 
-    def hourly(self)->DataFrame:
+    def hourly(self,workers:int=1,store:str=None,block_size:int=240)->DataFrame:
         """
         Function to calculate the hourly time in daylight for the shading analysis
 
+        Parameters
+        ----------
+        workers : int
+            number of processes used to calculate the shading. The results are the same
+            as with one process.
+        store : string
+            folder where the completed hours are saved (tools.chunk_store). If the folder
+            already has hours from an interrupted run with the same inputs, only the
+            remaining hours are calculated. Nothing is saved if None.
+        block_size : int
+            number of hours calculated between two saves to the store
+
         Returns
         -------
         TID : Dataframe
-            Output containing all the TID information for each segement. Meant to be 
-            an input to a POA function
+            Output containing all the TID information for each segement for the daylight
+            hours only (GHI>0), indexed by the time of the hour. Meant to be an input to a
+            POA function
 
         """
-        for i in arange(0,8760,1):
-            if self.Weather_dataframe.iloc[i].loc['GHI']>0:
-                self.wbt.time_in_daylight(
-                    self.mosaic,
-                    self.file_location+r'\Timeindaylight_hourly_'+self.file_classifier+'.tif',
-                    self.latitude, 
-                    self.longitude, 
-                    az_fraction=15.0, 
-                    max_dist=50.0, 
-                    utc_offset=self.UTC_offset, 
-                    start_day= self.Weather_dataframe.index[i].dayofyear, 
-                    end_day= self.Weather_dataframe.index[i].dayofyear, 
-                    start_time= str(self.Weather_dataframe.index[i].hour)+':'+str(self.Weather_dataframe.index[i].minute),
-                    end_time= str(self.Weather_dataframe.index[i+1].hour)+':'+str(self.Weather_dataframe.index[i+1].minute))
-                
-                if path.isfile(self.file_location+r'\Timeindaylight_hourly_'+self.file_classifier+'.tif'):
-                    TID_avg_by_FID=self.extract_TID(self.file_location+r'\Timeindaylight_hourly_'+self.file_classifier+'.tif')
-                    
-                    #Put data into TimeInDaylight dataframe
-                    self.TID.loc[self.Weather_dataframe.index[i]] = TID_avg_by_FID.values
-                    print("Hour of the year: ",i)
+        daylight=list(self.daylight)
+        #row of each hour in the TID matrix, hours without an output raster stay nan
+        row={hour:i for i,hour in enumerate(daylight)}
+        TID=full((len(daylight),len(self.FID)),nan,dtype='float32')
+        remaining=daylight
+        if store is None:
+            checkpoint=None
+            block_size=max(1,len(daylight))
+        else:
+            checkpoint=chunk_store(store)
+            completed=set(checkpoint.open(self.metadata()))
+            hours,values=checkpoint.read()
+            if len(hours)>0:
+                TID[[row[i] for i in hours]]=values
+                print("Resuming the shading, hours already completed: ",len(completed))
+            remaining=[i for i in daylight if i not in completed]
+        for start in range(0,len(remaining),block_size):
+            block=remaining[start:start+block_size]
+            results=self.shade_hours(block,r'\Timeindaylight_hourly_',workers)
+            values=stack([full(len(self.FID),nan) if TID_avg_by_FID is None else TID_avg_by_FID for TID_avg_by_FID in results])
+            TID[[row[i] for i in block]]=values
+            if checkpoint is not None:
+                checkpoint.append(block,values)
+            print("Hours of the year completed: ",start+len(block)," of ",len(remaining))
+        self.save_cache()
 
+        #Create a dataframe with the daylight hours as rows and FIDs as columns
+        self.TID=DataFrame(TID,index=self.Weather_dataframe.index[daylight],columns=arange(1,len(self.FID)+1,1))
         return self.TID
 
-    def representative(self,rep_days:int)->DataFrame:
+    def representative(self,rep_days:int,workers:int=1)->DataFrame:
         """
         Function to calculate the shading using only representative days.
 
@@ -143,6 +184,9 @@ class TID:
         rep_days : int
             the number of representative days to use in the year. Either 4 (one on each equinox) or 
             12 (once per month)
+        workers : int
+            number of processes used to calculate the shading. The results are the same
+            as with one process.
 
         Returns
         -------
@@ -151,93 +195,600 @@ class TID:
             an input to a POA function.
 
         """
-        
+        total_range=self.representative_hours(rep_days)
+        daylight=[i for i in total_range if self.Weather_dataframe.iloc[i].loc['GHI']>0]
+        results=dict(zip(daylight,self.shade_hours(daylight,r'\Timeindaylight_rep_',workers)))
+        self.save_cache()
+        temp=[]
+        for i in total_range:
+            if results.get(i) is not None:
+                temp.append(results[i])
+            else:
+                temp.append(zeros(len(self.FID)))
+        TID = DataFrame(temp)
+        return TID
+
+    def representative_hours(self,rep_days:int)->list[int]:
+        """
+        Function to list the hours of the representative days.
+
+        Parameters
+        ----------
+        rep_days : int
+            the number of representative days to use in the year. Either 4 (one on each equinox) or 
+            12 (once per month)
+
+        Returns
+        -------
+        list[int]
+            position of the hours in the weather dataframe
+
+        """
         if rep_days==12:
             total_range = chain(range(480,504),range(1224,1248),range(1896,1920),range(2640,2664),
                             range(3360,3384), range(4104,4128), range(4824,4848),range(5568,5592),
                             range(6312,6336), range(7032,7056),range(7776,7800),range(8496,8520))
         else:
             total_range = chain(range(1896,1920), range(4104,4128), range(6312,6336), range(8496,8520)) #representative days of March, June, September, and december 21
+        return list(total_range)
+
+    def shade_hours(self,hours:list[int],output_name:str,workers:int=1)->list:
+        """
+        Function to calculate the average TID of each segment for a list of hours, either
+        in this process or in a pool of processes. Each process of the WhiteboxTools backend
+        writes its own output raster so that the hours can be calculated at the same time.
+
+        Parameters
+        ----------
+        hours : list[int]
+            position of the hours in the weather dataframe
+        output_name : string
+            beginning of the name of the output raster of the WhiteboxTools backend
+        workers : int
+            number of processes
+
+        Returns
+        -------
+        list
+            average TID of each segment (array) for each hour, in the same order as hours.
+            None if the WhiteboxTools backend did not output a raster for that hour.
+
+        """
+        if self.backend=='numpy':
+            sun=shadow_engine.sun_positions(self.Weather_dataframe.index[hours],self.latitude,self.longitude)
+            if self.tile_size>0:
+                return list(self.shade_tiles(sun,output_name,workers))
+            return list(self.shade_sun(sun,workers))
+        chunks=[hours[i:i+24] for i in range(0,len(hours),24)]
+        if workers<=1:
+            init_worker(self,output_name)
+            results=[TID_avg_by_FID for chunk in map(shade_chunk,chunks) for TID_avg_by_FID in chunk]
+            worker.clear()
+            return results
+        with Pool(workers,initializer=init_worker,initargs=(self,output_name,True)) as pool:
+            return [TID_avg_by_FID for chunk in pool.imap(shade_chunk,chunks) for TID_avg_by_FID in chunk]
+
+    def shade_sun(self,sun:DataFrame,workers:int=1)->ndarray:
+        """
+        Function to calculate the average TID of each segment with the shading cache of the
+        mosaic. Only the sun positions that are not already in the cache are calculated,
+        either in this process or in a pool of processes.
+
+        Parameters
+        ----------
+        sun : DataFrame
+            sun positions with the columns hour, azimuth and elevation (shadow_engine.sun_positions)
+        workers : int
+            number of processes
+
+        Returns
+        -------
+        ndarray
+            average TID with one row per hour and one column per segment
+
+        """
+        cache=self.get_cache()
+        keys=cache.missing(sun)
+        print("Sun positions calculated: ",len(keys)," of ",len(keys)+len(cache.keys))
+        if workers<=1 or len(keys)==0:
+            cache.add(keys,cache.evaluate(keys))
+        else:
+            with Pool(workers,initializer=init_worker,initargs=(self,'',True)) as pool:
+                cache.add(keys,concatenate(list(pool.imap(evaluate_keys,array_split(keys,workers*4)))))
+        return cache.sunlit_fraction(sun)
+
+    def tiles(self)->list[tuple[Window,Window]]:
+        """
+        Function used to split the mosaic into square tiles of tile_size cells. Each tile 
+        is padded by a halo at least as wide as the maximum search distance of the shading
+        so that the shadows cast from the neighbouring tiles are included.
+
+        Returns
+        -------
+        list[tuple[Window,Window]]
+            window of each tile and window of the tile with its halo
+
+        """
+        with open_file(self.mosaic) as dsm:
+            height,width=dsm.height,dsm.width
+            halo=int(ceil(50.0/abs(dsm.transform.a)))
+        tiles=[]
+        for row in range(0,height,self.tile_size):
+            for col in range(0,width,self.tile_size):
+                core=Window(col,row,min(self.tile_size,width-col),min(self.tile_size,height-row))
+                row_off,col_off=max(row-halo,0),max(col-halo,0)
+                padded=Window(col_off,row_off,min(col+core.width+halo,width)-col_off,min(row+core.height+halo,height)-row_off)
+                tiles.append((core,padded))
+        return tiles
+
+    def tile_FID(self)->ndarray:
+        """
+        Function used to find the FIDs of the rasterized segmentation one tile at a time.
+
+        Returns
+        -------
+        ndarray
+            sorted FIDs of all the segments
+
+        """
+        FID=[]
+        Rasterized_segments=segment_raster.get(self.raster_file)
+        for core,padded in self.tiles():
+            segments=Rasterized_segments.read(core)
+            FID.append(unique(segments[segments>0]))
+        return unique(concatenate(FID))
+
+    def shade_tiles(self,sun:DataFrame,output_name:str,workers:int=1)->ndarray:
+        """
+        Function to calculate the average TID of each segment one tile at a time, either
+        in this process or in a pool of processes, and to combine the results of the tiles.
+
+        Parameters
+        ----------
+        sun : DataFrame
+            sun positions with the columns hour, azimuth and elevation (shadow_engine.sun_positions)
+        output_name : string
+            beginning of the name of the output file of each tile
+        workers : int
+            number of processes
+
+        Returns
+        -------
+        ndarray
+            average TID with one row per hour and one column per segment
+
+        """
+        tiles=self.tiles()
+        files=[self.file_location+output_name+self.file_classifier+'_tile'+str(tile)+'.npz' for tile in range(len(tiles))]
+        tasks=[(tile,sun,files[tile]) for tile in range(len(tiles))]
+        if workers<=1:
+            init_worker(self,output_name)
+            list(map(shade_tile,tasks))
+            worker.clear()
+        else:
+            with Pool(workers,initializer=init_worker,initargs=(self,output_name,True)) as pool:
+                list(pool.imap_unordered(shade_tile,tasks))
+        return self.stitch_tiles(files)
+
+    def shade_tile(self,tile:int,sun:DataFrame,output_file:str)->str:
+        """
+        Function to calculate the TID of the segment cells of one tile. Only the tile and 
+        its halo are read. The sum of the TID and the number of cells of each segment in the
+        tile are saved so that the segments crossing the border of the tiles can be averaged
+        with stitch_tiles. The tiles are independent and can be calculated on other machines
+        as long as the output files are gathered before stitching them.
+
+        Parameters
+        ----------
+        tile : int
+            position of the tile in self.tiles()
+        sun : DataFrame
+            sun positions with the columns hour, azimuth and elevation (shadow_engine.sun_positions)
+        output_file : string
+            output file of the tile (.npz)
+
+        Returns
+        -------
+        string
+            output file of the tile
+
+        """
+        tiles=self.tiles()
+        core,padded=tiles[tile]
+        segments=segment_raster.get(self.raster_file).read(padded)
+        #Only the segment cells of the tile are shaded, the halo is only used for the horizon
+        row,col=core.row_off-padded.row_off,core.col_off-padded.col_off
+        inside=zeros(segments.shape,dtype=bool)
+        inside[row:row+core.height,col:col+core.width]=True
+        zonal=zonal_index(Rasterized_segments_ravel=where(inside,segments,0).ravel())
+        hours=unique(sun['hour'].values)
+        sums=zeros((len(hours),len(zonal.FID)))
+        if len(zonal.FID)>0:
+            tile_name=path.splitext(self.mosaic)[0]+'_%s_tile'+str(tile)
+            engine=shadow_engine(self.mosaic,zonal.pixels,max_dist=50.0,az_fraction=15.0,horizon_file=tile_name%'horizon'+'.tif',window=padded)
+            cache=shading_cache(engine,zonal,self.sun_tolerance,tile_name%'shading_cache'+'.npz')
+            cache.update(sun)
+            cache.save()
+            sums=cache.sunlit_fraction(sun)*zonal.counts
+        savez(output_file,FID=zonal.FID,counts=zonal.counts,sums=sums,hours=hours)
+        print("Tile ",tile+1," of ",len(tiles)," completed")
+        return output_file
+
+    def stitch_tiles(self,files:list[str])->ndarray:
+        """
+        Function used to combine the output files of the tiles into the average TID of
+        each segment.
+
+        Parameters
+        ----------
+        files : list[str]
+            output files of all the tiles (.npz)
+
+        Returns
+        -------
+        ndarray
+            average TID with one row per hour and one column per segment
+
+        """
+        sums,counts=None,zeros(len(self.FID))
+        for filename in files:
+            with load(filename) as tile:
+                if sums is None:
+                    sums=zeros((len(tile['hours']),len(self.FID)))
+                columns=searchsorted(self.FID,tile['FID'])
+                sums[:,columns]+=tile['sums']
+                counts[columns]+=tile['counts']
+        return (sums/counts).astype('float32')
+
+    def shade_hour_whitebox(self,i:int,output_file:str):
+        """
+        Function to calculate the average TID of each segment for one hour with the
+        WhiteboxTools time_in_daylight tool.
+
+        Parameters
+        ----------
+        i : int
+            position of the hour in the weather dataframe
+        output_file : string
+            output raster of the time_in_daylight tool
+
+        Returns
+        -------
+        ndarray
+            average TID of each segment. None if the tool did not output a raster.
+
+        """
+        start=self.Weather_dataframe.index[i]
+        end=start+Timedelta(hours=1)
+        self.wbt.time_in_daylight(
+            self.mosaic,
+            output_file,
+            self.latitude, 
+            self.longitude, 
+            az_fraction=15.0, 
+            max_dist=50.0, 
+            utc_offset=self.UTC_offset, 
+            start_day= start.dayofyear, 
+            end_day= start.dayofyear, 
+            start_time= str(start.hour)+':'+str(start.minute),
+            end_time= str(end.hour)+':'+str(end.minute))
         
-        temp=[]
-        for i in total_range:
-            if self.Weather_dataframe.iloc[i].loc['GHI']>0:
-                self.wbt.time_in_daylight(
-                    self.mosaic,
-                    self.file_location+r'\Timeindaylight_rep_'+self.file_classifier+'.tif',
-                    self.latitude, 
-                    self.longitude, 
-                    az_fraction=15.0, 
-                    max_dist=50.0, 
-                    utc_offset=self.UTC_offset, 
-                    start_day= self.Weather_dataframe.index[i].dayofyear, 
-                    end_day= self.Weather_dataframe.index[i].dayofyear, 
-                    start_time= str(self.Weather_dataframe.index[i].hour)+':'+str(self.Weather_dataframe.index[i].minute),
-                    end_time= str(self.Weather_dataframe.index[i+1].hour)+':'+str(self.Weather_dataframe.index[i+1].minute))
-            
-                if path.isfile(self.file_location+r"\Timeindaylight_rep_"+self.file_classifier+'.tif'):
-                    TID_avg_by_FID=self.extract_TID(self.file_location+r"\Timeindaylight_rep_"+self.file_classifier+'.tif')
-                    print("Hour of the year: ",i)
-                
-                    #Put data into TimeInDaylight dataframe
-                    temp.append(TID_avg_by_FID.values)
-            else:
-                temp.append(zeros((1,len(self.TID.iloc[1])))[0])
-        TID = DataFrame(temp)
-        return TID
-    
-
-    def extract_TID(self,filename:str)->DataFrame:
-     """
-     Function used to open and extract the TID information from the file outputted
-     from the TID function.
-
-     Parameters
-     ----------
-     filename : string
-        TID output file name and path.
-    
-
-     Returns
-     -------
-     TID_avg_by_FID : Dataframe
-        Output containing all the TID information for each segement. Meant to be 
-        an input to a POA function.
-
-     """
-     Rasterized_segments = open_file(self.raster_file)
-    #Get 2D numpy arrays
-     Rasterized_segments_array=Rasterized_segments.read(1)
-    
-    #Turn arrays into 1D vectors 
-     Rasterized_segments_ravel=Rasterized_segments_array.ravel()
-    
-     del Rasterized_segments_array
-     del Rasterized_segments
-    #######Calculating_average_TimeInDaylight_for_rasterized_FID_hourly#####
-     Timeindaylight_hourly=open_file(filename)
-      #Get 2D numpy arrays 
-     Timeindaylight_hourly_data=Timeindaylight_hourly.read(1)
-     
-    #Turn arrays into 1D vectors
-     Timeindaylight_hourly_ravel=Timeindaylight_hourly_data.ravel()
-    
-     #Group together into a matrix
-     Rasterized_FID_and_Timeindaylight_hourly=column_stack((Rasterized_segments_ravel,Timeindaylight_hourly_ravel))
-     
-     #Get rid of data where there is no FID (-999 value, or simply FID negative), i.e. keep only positive FID 
-     Rasterized_FID_and_Timeindaylight_hourly = Rasterized_FID_and_Timeindaylight_hourly[Rasterized_FID_and_Timeindaylight_hourly[:,0]>0]
-     
-     #Convert to dataframe
-     FID_TID_df=DataFrame(data=Rasterized_FID_and_Timeindaylight_hourly,columns=['FID_raster','TID'])
-     
-     #Sort values in order of increasing FID
-     FID_TID_df=FID_TID_df.sort_values(by=['FID_raster'])
-    #  print('Filterd {} pixels from data that are negative\n'.format(len(FID_TID_df[FID_TID_df['TID']<0])) )
-     FID_TID_df[FID_TID_df['TID']<0]['TID']=0
-     
-     #Calculate average TimeInDaylight (TID) for each FID
-     TID_avg_by_FID=FID_TID_df.groupby('FID_raster')['TID'].mean()
-     Timeindaylight_hourly.close()
-     return TID_avg_by_FID
-    
+        if path.isfile(output_file):
+            print("Hour of the year: ",i)
+            return self.extract_TID(output_file).values
+        return None
+
+    def compare_backends(self,hours:list[int],tolerance:float=0.05)->DataFrame:
+        """
+        Function used to validate the numpy backend against the WhiteboxTools time_in_daylight
+        tool: the average TID of each segment is calculated with both backends for the same
+        hours and compared. The numpy backend should only be used for a mosaic (or a check
+        fixture, see Validate_shading_backends.py) where the difference is within the tolerance.
+
+        Parameters
+        ----------
+        hours : list[int]
+            position of the hours in the weather dataframe (daylight hours)
+        tolerance : float
+            largest accepted difference of the average TID of a segment for one hour
+            (fraction of the hour, 0.05 is 3 minutes)
+
+        Returns
+        -------
+        DataFrame
+            largest and mean difference of the average TID of each segment (FID_raster)
+
+        """
+        if self.tile_size>0:
+            raise Exception("The backends can only be compared without tiles (shading_tile_size=0)")
+        backend=self.backend
+        try:
+            self.backend='whitebox'
+            whitebox=self.shade_hours(hours,r'\Timeindaylight_check_')
+            self.backend='numpy'
+            engine=self.shade_hours(hours,r'\Timeindaylight_check_')
+        finally:
+            self.backend=backend
+        kept=[i for i in range(len(hours)) if whitebox[i] is not None]
+        if len(kept)==0:
+            raise Exception("The WhiteboxTools time_in_daylight tool did not output any raster")
+        difference=abs(stack([engine[i] for i in kept])-stack([whitebox[i] for i in kept]))
+        comparison=DataFrame({'max_difference':nanmax(difference,axis=0),'mean_difference':nanmean(difference,axis=0)},
+                             index=Series(self.FID,name='FID_raster'))
+        print("Largest difference of the average TID of a segment: ",round(float(comparison['max_difference'].max()),4),
+              " (tolerance ",tolerance,"), mean difference: ",round(float(comparison['mean_difference'].mean()),4))
+        if comparison['max_difference'].max()>tolerance:
+            raise Exception("The numpy and WhiteboxTools shading backends differ by more than the tolerance")
+        return comparison
+
+    def get_engine(self)->shadow_engine:
+        """
+        Function used to set up the in-process shading engine for the rooftop cells of the
+        rasterized segmentation. The horizon of each azimuth sector is saved next to the 
+        mosaic (mosaic_<file_classifier>_horizon.tif) the first time and reused by the 
+        hourly, representative and annual shading afterwards. The horizon of the rooftop
+        cells is memory-mapped (mosaic_<file_classifier>_horizon_cells.npy).
+
+        Returns
+        -------
+        shadow_engine
+            shading engine with the horizon of every azimuth sector loaded
+
+        """
+        horizon_file=path.splitext(self.mosaic)[0]+'_horizon.tif'
+        return shadow_engine(self.mosaic,self.zonal.pixels,
+                             max_dist=50.0,az_fraction=15.0,horizon_file=horizon_file)
+
+    def get_cache(self)->shading_cache:
+        """
+        Function used to set up the shading cache of the rooftop cells. The cache is saved
+        next to the mosaic (mosaic_<file_classifier>_shading_cache.npz) and reused as long
+        as the mosaic, the segments and the shading parameters do not change.
+
+        Returns
+        -------
+        shading_cache
+            shading cache with the sun positions already calculated for this mosaic
+
+        """
+        if self.cache is None:
+            cache_file=path.splitext(self.mosaic)[0]+'_shading_cache.npz'
+            self.cache=shading_cache(self.get_engine(),self.zonal,self.sun_tolerance,cache_file)
+        return self.cache
+
+    def save_cache(self)->None:
+        """
+        Function used to save the shading cache of the mosaic if it was used.
+        """
+        if self.cache is not None:
+            self.cache.save()
+
+    def metadata(self)->dict:
+        """
+        Function used to describe the inputs of the shading, to check that saved results
+        were calculated with the same inputs.
+
+        Returns
+        -------
+        dict
+            inputs of the shading
+
+        """
+        return {'mosaic':self.mosaic,'mosaic_modified':path.getmtime(self.mosaic),
+                'raster_file':self.raster_file,'raster_modified':path.getmtime(self.raster_file),
+                'weather_file':self.weather_file_address,'first_hour':str(self.Weather_dataframe.index[0]),
+                'hours':len(self.Weather_dataframe),'latitude':self.latitude,'longitude':self.longitude,
+                'segments':len(self.FID),'backend':self.backend,'sun_tolerance':self.sun_tolerance}
+
+    def shading_key(self,hours:list[int])->str:
+        """
+        Function used to identify the TID results by their content: the TID only depends on
+        the mosaic, the segments, the location and the time of the hours, not on the weather
+        file or on the name of the region. Results of other weather years, or of other regions
+        using the same mosaic and segments, are reused only if all of these are the same.
+
+        Parameters
+        ----------
+        hours : list[int]
+            position of the hours of the results in the weather dataframe
+
+        Returns
+        -------
+        string
+            key of the results (hexadecimal)
+
+        """
+        inputs={'mosaic':file_checksum(self.mosaic).digest(),'raster_file':file_checksum(self.raster_file).digest(),
+                'latitude':float(self.latitude),'longitude':float(self.longitude),'UTC_offset':str(self.UTC_offset),
+                'backend':self.backend,'sun_tolerance':self.sun_tolerance}
+        times=self.Weather_dataframe.index[list(hours)]
+        if times.tz is not None:
+            times=times.tz_convert('UTC').tz_localize(None)
+        key=sha256(json.dumps(inputs,sort_keys=True).encode())
+        key.update(times.to_numpy(dtype='datetime64[ns]').tobytes())
+        return key.hexdigest()[:32]
+
+    def saved_results(self,rep_days:int=None)->tid_store:
+        """
+        Function used to find the saved TID results of the hourly shading (or of the
+        representative days). They are saved next to the mosaic under the key of their
+        inputs (mosaic_TimeInDaylight_hourly_<key>.npy), see shading_key.
+
+        Parameters
+        ----------
+        rep_days : int
+            number of representative days, None for the hourly shading
+
+        Returns
+        -------
+        tid_store
+            saved results, which may not exist yet
+
+        """
+        if rep_days is None:
+            name,hours='hourly',self.daylight
+        else:
+            name,hours='rep_'+str(rep_days),self.representative_hours(rep_days)
+        return tid_store(path.splitext(self.mosaic)[0]+'_TimeInDaylight_'+name+'_'+self.shading_key(hours)+'.npy')
+
+    def convert_legacy(self,feather:str,rep_days:int=None)->tid_store:
+        """
+        Function used to save TID results of the previous feather format (.ftr, named by
+        region) under the key of this mosaic (see saved_results). The feather files do not
+        record the mosaic, the segments or the weather file they were made with, so they are
+        never converted automatically: only convert a file known to be made with the same
+        inputs. The file is rejected if its hours or segments do not match.
+
+        Parameters
+        ----------
+        feather : string
+            TID results in the previous format (ex. TimeInDaylight_hourly_<file_classifier>.ftr)
+        rep_days : int
+            number of representative days of the results, None for the hourly shading
+
+        Returns
+        -------
+        tid_store
+            converted results
+
+        """
+        legacy=file_handle().extract_data(feather)
+        if rep_days is None:
+            #the previous hourly results have all the hours of the weather file and the FIDs 1 to n as columns
+            if len(legacy)!=len(self.Weather_dataframe) or not(legacy.index.equals(self.Weather_dataframe.index)):
+                raise Exception("The hours of "+feather+" do not match the weather file of the region")
+            if not(legacy.columns.equals(Index(arange(1,len(self.FID)+1)))):
+                raise Exception("The segments of "+feather+" do not match the rasterized segmentation of the region")
+            TID=legacy.iloc[self.daylight]
+        else:
+            if len(legacy)!=len(self.representative_hours(rep_days)):
+                raise Exception("The hours of "+feather+" do not match "+str(rep_days)+" representative days")
+            if not(legacy.columns.equals(Index(arange(len(self.FID))))):
+                raise Exception("The segments of "+feather+" do not match the rasterized segmentation of the region")
+            TID=legacy
+        saved_file=self.saved_results(rep_days)
+        saved_file.write(TID)
+        return saved_file
+
+    def __getstate__(self)->dict:
+        """
+        The shading cache is not sent to the processes of a pool, they only calculate the
+        missing sun positions.
+        """
+        state=self.__dict__.copy()
+        state['cache']=None
+        return state
+
+    def extract_TID(self,filename:str)->Series:
+        """
+        Function used to open and extract the TID information from the file outputted
+        from the TID function.
+
+        Parameters
+        ----------
+        filename : string
+            TID output file name and path.
+        
+
+        Returns
+        -------
+        TID_avg_by_FID : Series
+            Output containing all the TID information for each segement. Meant to be 
+            an input to a POA function.
+
+        """
+        #######Calculating_average_TimeInDaylight_for_rasterized_FID_hourly#####
+        with open_file(filename) as Timeindaylight_hourly:
+            #Get 2D numpy arrays and turn them into 1D vectors
+            Timeindaylight_hourly_ravel=Timeindaylight_hourly.read(1).ravel()
+        return self.average_by_FID(Timeindaylight_hourly_ravel)
+
+    def average_by_FID(self,Timeindaylight_ravel)->Series:
+        """
+        Function used to calculate the average TID of each segment (FID) of the
+        rasterized segmentation.
+
+        Parameters
+        ----------
+        Timeindaylight_ravel : ndarray
+            1D vector of the TID of all the raster cells, or only of the rooftop cells
+            (self.zonal.pixels)
+
+        Returns
+        -------
+        TID_avg_by_FID : Series
+            Output containing all the TID information for each segement.
+
+        """
+        return Series(self.zonal.mean(Timeindaylight_ravel),index=self.zonal.FID,name='TID').rename_axis('FID_raster')
+
+worker={}
+def init_worker(shading:TID,output_name:str,scratch:bool=False)->None:
+    """
+    Sets up the process calculating the shading. In a pool, each process builds its own
+    shading engine, which memory-maps the horizon of the rooftop cells saved next to the
+    horizon file (the DSM is not read), and writes the WhiteboxTools output to its own raster.
+
+    Parameters
+    ----------
+    shading : TID
+        shading object of the region
+    output_name : string
+        beginning of the name of the output raster of the WhiteboxTools backend
+    scratch : bool
+        True to add the process id to the name of the output raster
+    """
+    worker['TID']=shading
+    if shading.backend=='numpy' and shading.tile_size==0:
+        worker['cache']=shading_cache(shading.get_engine(),shading.zonal,shading.sun_tolerance)
+    suffix='_'+str(getpid()) if scratch else ''
+    worker['output_file']=shading.file_location+output_name+shading.file_classifier+suffix+'.tif'
+
+def shade_chunk(hours:list[int])->list:
+    """
+    Calculates the average TID of each segment for a group of hours with the
+    WhiteboxTools backend.
+
+    Parameters
+    ----------
+    hours : list[int]
+        position of the hours in the weather dataframe
+
+    Returns
+    -------
+    list
+        average TID of each segment for each hour
+    """
+    return [worker['TID'].shade_hour_whitebox(i,worker['output_file']) for i in hours]
+
+def evaluate_keys(keys:ndarray)->ndarray:
+    """
+    Calculates the sunlit fraction of each segment for a group of sun positions.
+
+    Parameters
+    ----------
+    keys : ndarray
+        keys of the sun positions (shading_cache.key)
+
+    Returns
+    -------
+    ndarray
+        sunlit fraction of each segment for each sun position
+    """
+    return worker['cache'].evaluate(keys)
+
+def shade_tile(task:tuple)->str:
+    """
+    Calculates the TID of the segment cells of one tile.
+
+    Parameters
+    ----------
+    task : tuple
+        position of the tile, sun positions and output file of the tile
+
+    Returns
+    -------
+    string
+        output file of the tile
+    """
+    return worker['TID'].shade_tile(*task)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Check of the numpy shading backend (tools/shadow_engine.py) against the WhiteboxTools
+time_in_daylight tool on a small DSM fixture: two flat roofs of three segments, a taller
+building and a tree shading them. The average TID of each segment is calculated with both
+backends for the daylight hours of the four representative days and the largest difference
+must be within the tolerance. The WhiteboxTools backend is the default of TimeInDaylight.py,
+run this check before using backend='numpy'. TID.compare_backends does the same check on
+the mosaic of a region.
+"""
+import os
+from types import SimpleNamespace
+from numpy import full
+from pandas import Timedelta,date_range
+from pvlib import location
+from rasterio import open as open_file
+from rasterio.transform import from_origin
+import TimeInDaylight
+
+def shading_fixture(folder:str,latitude:float=51.05,longitude:float=-114.07,UTC_offset:str='-07:00',altitude:float=1045)->SimpleNamespace:
+    """
+    Writes the DSM, the rasterized segmentation and a clear-sky weather file (NSRDB PSM3
+    format) of the fixture.
+
+    Parameters
+    ----------
+    folder : string
+        folder of the fixture files
+    latitude, longitude, altitude : float
+        location of the fixture (Calgary by default)
+    UTC_offset : string
+        UTC offset (ex. "-07:00")
+
+    Returns
+    -------
+    SimpleNamespace
+        region variables of the fixture used by TimeInDaylight.TID
+    """
+    os.makedirs(folder,exist_ok=True)
+    size=120
+    transform=from_origin(700000,5660000,1.0,1.0)
+    dsm=full((size,size),1045.0,dtype='float32')
+    segments=full((size,size),-999,dtype='int32')
+    #building with a flat roof split into a west (1) and an east (2) segment
+    dsm[40:70,30:70]+=8
+    segments[40:70,30:50]=1
+    segments[40:70,50:70]=2
+    #taller building east of the first one, its roof is segment 3
+    dsm[35:75,75:90]+=20
+    segments[35:75,75:90]=3
+    #tree south of the west segment
+    dsm[74:80,36:42]+=15
+    profile={'driver':'GTiff','height':size,'width':size,'count':1,'crs':'EPSG:32611','transform':transform}
+    mosaic=os.path.join(folder,'mosaic_fixture.tif')
+    with open_file(mosaic,'w',dtype='float32',nodata=-32768,**profile) as file:
+        file.write(dsm,1)
+    raster_file=os.path.join(folder,'fixture_rooftop_Raster.tif')
+    with open_file(raster_file,'w',dtype='int32',nodata=-999,**profile) as file:
+        file.write(segments,1)
+    offset=int(UTC_offset[:3])
+    timezone=f"Etc/GMT{-offset:+d}" if offset!=0 else "Etc/GMT"
+    weather_file=os.path.join(folder,'weather_fixture.csv')
+    times=date_range('2021-01-01',periods=8760,freq='h')
+    clearsky=location.Location(latitude,longitude,timezone,altitude).get_clearsky(times.tz_localize(timezone)+Timedelta(minutes=30))
+    with open(weather_file,'w') as file:
+        file.write('Source,Location ID,City,State,Country,Latitude,Longitude,Time Zone,Elevation,Local Time Zone\n')
+        file.write(f'NSRDB,0,-,-,-,{latitude},{longitude},{offset},{altitude},{offset}\n')
+        file.write('Year,Month,Day,Hour,Minute,GHI,DNI,DHI,Temperature,Wind Speed\n')
+        for time,(GHI,DNI,DHI) in zip(times,clearsky[['ghi','dni','dhi']].values):
+            file.write(f'{time.year},{time.month},{time.day},{time.hour},30,{GHI:.0f},{DNI:.0f},{DHI:.0f},10,2\n')
+    return SimpleNamespace(raster_file=raster_file,mosaic=mosaic,weather_file=weather_file,latitude=latitude,longitude=longitude,
+                           altitude=altitude,UTC_offset=UTC_offset,timezone=timezone,file_classifier='fixture',shading_tile_size=0)
+
+def check_backends(folder:str,tolerance:float=0.05):
+    """
+    Compares the average TID of each segment of the fixture calculated with the numpy and
+    WhiteboxTools backends (see TimeInDaylight.TID.compare_backends).
+
+    Parameters
+    ----------
+    folder : string
+        folder of the fixture files
+    tolerance : float
+        largest accepted difference of the average TID of a segment for one hour
+
+    Returns
+    -------
+    DataFrame
+        largest and mean difference of the average TID of each segment
+    """
+    region=shading_fixture(folder)
+    shading=TimeInDaylight.TID(region,folder,'Technical',backend='whitebox')
+    hours=[i for i in shading.representative_hours(4) if shading.Weather_dataframe['GHI'].iloc[i]>0]
+    return shading.compare_backends(hours,tolerance)
+
+if __name__=="__main__":
+    BASE_DIR=os.path.dirname(os.path.abspath(__file__))
+    os.chdir(BASE_DIR)
+    ####################################################
+    #Provide user input here
+    ####################################################
+    folder=os.path.join(BASE_DIR,'shading_fixture') #folder where the fixture files are written
+    tolerance=0.05 #largest accepted difference of the average TID of a segment for one hour (0.05 is 3 minutes)
+    ####################################################
+    print(check_backends(folder,tolerance))
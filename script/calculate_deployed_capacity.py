@@ -8,12 +8,11 @@ Created on Thur June  27  2024
 import numpy as np
 import TimeInDaylight
 import os
-import glob
 from tools import spatial_toolset
 import region_data
 from pandas import DataFrame, Series,ExcelWriter,read_csv,concat
 import os
-from tools import file_handle
+from tools import chunk_store
 from scipy.optimize import fsolve
 import pvlib
 import warnings
@@ -466,7 +465,8 @@ class DeployedCapacity:
             object contaning the variables needed for the hosting capacity and hourly modelling
         weighted_POA:DataFrame 
             Shaded hourly POA weighted to account for the the capacity installed vs shaded POA on
-            each segment (calculated and outputted from calculate_potential_city.py)
+            each segment (calculated and outputted from calculate_potential_city.py). The index is
+            the position of the hour in the year, hours that are not included have no generation
         temperature_coefficient:float 
             Temperature coefficient for the module
         temperature:Series
@@ -490,6 +490,7 @@ class DeployedCapacity:
         """
         ind=0
         ratio_all=[]
+        hours=weighted_POA.index
         for year in range(starting_year,len(performance_ratio[0])+starting_year):
             Pac_array=[]
             mode_ind=0
@@ -497,13 +498,13 @@ class DeployedCapacity:
                 performance_ratio_years=performance_ratio[mode_ind]
                 performance_ratio_years=Series(performance_ratio_years)
                 performance_ratio_years = performance_ratio_years.iloc[ind] / (1-hosting_capacity.degradation_rate.iloc[ind]*hosting_capacity.lifetime_years/2)
-                for bin_number in np.arange(0,10):
+                for bin_number in np.arange(0,weighted_POA.shape[1]):
                     
                     Pdc_STC_MW = capacity[ind][bin_number]*1000
                     POA = weighted_POA.iloc[:,bin_number]*1000
-                    POA.index=temperature.index
+                    POA.index=temperature.index[hours]
                     #Cell temperature
-                    Tcell = pvlib.temperature.pvsyst_cell(poa_global=POA, temp_air=temperature, wind_speed=0,
+                    Tcell = pvlib.temperature.pvsyst_cell(poa_global=POA, temp_air=temperature.iloc[hours], wind_speed=0,
                                                            u_c=hosting_capacity.u_c, u_v=hosting_capacity.u_v, 
                                                            module_efficiency =pv_module_efficiency[ind], alpha_absorption=0.9)
 
@@ -519,7 +520,8 @@ class DeployedCapacity:
                     #Apply inverter clipping
                     Pac = Pac.apply(lambda x: min(x,Pdc_STC_MW/hosting_capacity.dc_to_ac_capacity_ratio))
 
-                    Pac_array.append(Pac.values)
+                    #No generation in the hours without POA (night)
+                    Pac_array.append(Pac.reindex(temperature.index,fill_value=0).values)
                 mode_ind=mode_ind+1
             Pac_array =DataFrame(Pac_array).sum()
 
@@ -821,8 +823,10 @@ class DeployedCapacity:
 
 class SensitivityAnalysis(DeployedCapacity):
         
-    def __init__(self,region_variables:region_data=0)->None:
+    def __init__(self,region_variables:region_data=0,shading_workers:int=1,lidar_workers:int=1)->None:
         self.region_variables=region_variables
+        self.shading_workers=shading_workers
+        self.lidar_workers=lidar_workers
 
     def sensitivity_analysis(self,p_range:list,q_range:list,cost_scenarios:list,elec_cost_scenarios:list,pv_eff:list,region:str,
                              market_share_scenarios:list,pv_pr:list,bldg_scenarios:list,
@@ -864,10 +868,10 @@ class SensitivityAnalysis(DeployedCapacity):
         if mode=="grid":
             if shading_granularity=='representative':
                 rep_days=12
-                TID=self.calculate_rep_tech_potential(file_location,self.region_variables,rep_days)
+                TID=self.calculate_rep_tech_potential(file_location,self.region_variables,rep_days,mode)
                 technical_potential=calculate_technical_potential.calculate_technical_potential_rep(TID,self.region_variables,0.75,0.225,rep_days,mode)
             elif shading_granularity=='hourly':
-                TID=self.calculate_hourly_tech_potential(file_location,self.region_variables)
+                TID=self.calculate_hourly_tech_potential(file_location,self.region_variables,mode)
                 technical_potential=calculate_technical_potential.calculate_technical_potential_hourly(TID,self.region_variables,0.75,0.225,mode)
             demand=self.get_hourly_electricity_demand(hourly_demand)
             # demand=self.shift_hourly_demand(demand,region)
@@ -981,7 +985,7 @@ class SensitivityAnalysis(DeployedCapacity):
         scaling_option : bool
             option whether to scale the technical potential for the rest of the analysis or use them outputs as is. True to use coefficients to scale the output.
         """
-        self.region_variables=region_data.location(region,mode,scaling_option,cap_coefficient_shade,elec_coefficient_shade)
+        self.region_variables=region_data.location(region,mode,scaling_option,cap_coefficient_shade,elec_coefficient_shade,lidar_workers=self.lidar_workers)
         
 
     def sensitivity_analysis_all_regions(self,p_range:list,q_range:list,cost_scenarios:list,elec_cost_scenarios:list,
@@ -1041,10 +1045,11 @@ class SensitivityAnalysis(DeployedCapacity):
         graphs.clean_data()
         make_graphs.create_graphs(graphs,ending_year)
     
-    def calculate_hourly_tech_potential(self,file_location:str,region_variables:region_data)->DataFrame:
+    def calculate_hourly_tech_potential(self,file_location:str,region_variables:region_data,mode:str='grid')->DataFrame:
         """
         This function runs the shading analysis, saves it to a file and returns the result. If the saved file already exists, it loads the file and returns the output.
-        saved file name format: file_location+'//TimeInDaylight_hourly_' + region.file_classifier+'.ftr'
+        saved file name format: mosaic+'_TimeInDaylight_hourly_'+key+'.npy' (TimeInDaylight.TID.saved_results), shared by the runs with the same mosaic, segments, location and hours.
+        Hours completed by an interrupted shading run are kept in mosaic+'_TimeInDaylight_hourly_'+key+'_chunks' and the run resumes from them.
 
         Parameters
         -------
@@ -1052,29 +1057,32 @@ class SensitivityAnalysis(DeployedCapacity):
             file location of the files
         region_variables:region_data
             object containing file locations for lidar, DSM, segmentation files and region-specific variables
+        mode: str
+            mode of the analysis, used to read the weather file in the same format as the technical potential
 
         Returns
         -------
         TID: DataFrame
             returns the time in daylight results which is the shading for each segment of the rooftop for the region in question.
         """
-        file_save=file_handle()
-        saved_file=file_location+'//TimeInDaylight_hourly_' + region_variables.file_classifier+'.ftr'
+        shading=TimeInDaylight.TID(region_variables,file_location,mode,region_variables.shading_backend)
+        saved_file=shading.saved_results()
         #run shading if the saved_file has not been created yet. If it existes use the file to run the rst of the calculations
-        if not(os.path.isfile(saved_file)):
-            shading=TimeInDaylight.TID(region_variables,file_location)
+        #(results in the previous .ftr format are only used if converted explicitly with TID.convert_legacy)
+        if not(saved_file.exists()):
             print("Starting shading")
-            TID=shading.hourly()
-            file_save.write_file(TID,saved_file)
-            TID.set_index('index',inplace=True)
+            #completed hours are saved in store so an interrupted run resumes where it stopped
+            store=chunk_store(os.path.splitext(saved_file.file)[0]+'_chunks')
+            TID=shading.hourly(self.shading_workers,store.directory)
+            saved_file.write(TID)
+            store.clear()
             print("Shading completed\n")
-        else:
-            TID=file_save.extract_data(saved_file)
+        TID=saved_file.read()
         return TID
-    def calculate_rep_tech_potential(self,file_location:str,region_variables:region_data,rep_days:int)->DataFrame:
+    def calculate_rep_tech_potential(self,file_location:str,region_variables:region_data,rep_days:int,mode:str='grid')->DataFrame:
         """
         This function runs the shading analysis, saves it to a file and returns the result. If the saved file already exists, it loads the file and returns the output.
-        saved file name format: file_location+'//TimeInDaylight_hourly_' + region.file_classifier+'.ftr'
+        saved file name format: mosaic+'_TimeInDaylight_rep_'+str(rep_days)+'_'+key+'.npy' (TimeInDaylight.TID.saved_results)
 
         Parameters
         -------
@@ -1082,25 +1090,24 @@ class SensitivityAnalysis(DeployedCapacity):
             file location of the files
         region_variables:region_data
             object containing file locations for lidar, DSM, segmentation files and region-specific variables
+        mode: str
+            mode of the analysis, used to read the weather file in the same format as the technical potential
 
         Returns
         -------
         TID: DataFrame
             returns the time in daylight results which is the shading for each segment of the rooftop for the region in question.
         """
-        file_save=file_handle()
-        saved_file=file_location+'//TimeInDaylight_rep_' +str(rep_days)+'_'+ region_variables.file_classifier+'.ftr'
+        shading=TimeInDaylight.TID(region_variables,file_location,mode,region_variables.shading_backend)
+        saved_file=shading.saved_results(rep_days)
         #run shading if the saved_file has not been created yet. If it existes use the file to run the rst of the calculations
-        
-        if not(os.path.isfile(saved_file)):
-            shading=TimeInDaylight.TID(region_variables,file_location)
+        #(results in the previous .ftr format are only used if converted explicitly with TID.convert_legacy)
+        if not(saved_file.exists()):
             print("Starting shading")
-            TID=shading.representative(rep_days)
-            file_save.write_file(TID,saved_file)
-            TID.set_index('index',inplace=True)
+            TID=shading.representative(rep_days,self.shading_workers)
+            saved_file.write(TID)
             print("Shading completed\n")
-        else:
-            TID=file_save.extract_data(saved_file)
+        TID=saved_file.read()
         return TID
     
 def check_calculate_technical_files(region_variables:region_data,resolution:float|int)->None:
@@ -1116,20 +1123,29 @@ def check_calculate_technical_files(region_variables:region_data,resolution:floa
     """
 
     #If the files don't already exist for the DSM files (run_lidar), combining into a mosaic (run_mosaic), and creating the segmentation files (run_seg)
-    if len(glob.glob(region_variables.lidar+"/*.tif"))==0:
-        print("Creating DSM files...")
-        region_variables.run_lidar(resolution)
-        print("Created all DSM files\n")
-    if not(os.path.isfile(region_variables.mosaic)):
+    #with virtual_mosaic, the mosaic is a .vrt file that references the DSM files
+    region_variables.mosaic=region_variables.mosaic_file()
+    #only the DSM files that are missing or out of date are created, the mosaic is then created again
+    print("Checking DSM files...")
+    built=region_variables.run_lidar(resolution)
+    print("DSM files up to date\n")
+    #the mosaic and the segmentation are also created again when DSM files were created or when the selected lidar files changed (building_tiles_only, region_of_interest)
+    mosaic_built=built>0 or not(os.path.isfile(region_variables.mosaic)) or region_variables.selection_changed(region_variables.mosaic)
+    if mosaic_built:
         print("Starting mosaic...")
         region_variables.run_mosaic()
         print("Created mosaic\n")
-    if not(os.path.isfile(region_variables.shapefile)):
+    segmentation_built=built>0 or not(os.path.isfile(region_variables.shapefile)) or region_variables.selection_changed(region_variables.shapefile)
+    if segmentation_built:
         print("Starting segmentation...")
         region_variables.run_seg()
+        print("Finished segmentation\n")
+    #the rasterized segmentation is created again with the mosaic or the segmentation it is made from
+    if mosaic_built or segmentation_built or not(os.path.isfile(region_variables.raster_file)):
+        print("Rasterizing the segmentation...")
         spatial=spatial_toolset()
         spatial.rasterize_polygon(region_variables.mosaic,region_variables.shapefile,region_variables.raster_file,resolution)
-        print("Finished segmentation\n")                                
+        print("Rasterized the segmentation\n")                                
 
 
 
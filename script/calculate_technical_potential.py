@@ -4,14 +4,12 @@ Created on Fri Apr 30 15:58:31 2021
 
 @authors: nsalimza and egaucher
 """
-from pvlib import iotools,irradiance,solarposition,atmosphere
-from pandas import DataFrame,merge,concat, read_csv,to_datetime,DateOffset, Series
-from  geopandas import read_file
-from numpy import unique,zeros,arange,array,where
-import numpy as np
-from rasterio import open as open_file
-from itertools import chain
+from pandas import DataFrame,merge,concat,Series
+from numpy import unique,arange,where,zeros,errstate,array,ndarray,add,repeat,asarray,ones,flatnonzero
+from scipy.sparse import csr_matrix
 import re
+from os import path
+from tools import poa_engine,poa_table,file_checksum,resource_bins,coefficient_curve,weather_context,attribute_table,segment_raster
 
 
 class calculate_technical_potential_hourly:
@@ -20,7 +18,13 @@ class calculate_technical_potential_hourly:
         self.Performance_Ratio= PR
         self.TID=TID_avg_by_FID
         self.region=region
-        self.treat_dataframe()
+        #result for a unit efficiency and performance ratio, calculated by the first hourly_grid
+        self.unit_result=None
+        hour_index=self.TID.index
+        #With a memory budget (GB) the segments are processed in groups of columns and the hourly matrices are never kept in memory
+        self.memory_budget=region.memory_budget
+        if not(self.memory_budget):
+            self.treat_dataframe()
 
         #Change the slope and aspect for buildings with flat roofs
         self.unique_segments,self.rooftop_save=self.calculate_slope(region.raster_file,region.shapefile)
@@ -31,38 +35,47 @@ class calculate_technical_potential_hourly:
 
         #All segments with slopes less than or equal to 10 degrees have had their PV slope set to 10 degrees (treated as flat roofs with PV arrays oriented at 10 degrees)
         self.rooftop_save.loc[self.rooftop_save['SLOPE']==10,'Area_reduction_factor']=0.66767045856285
-        self.TID=where(self.TID<0,0,self.TID)
-        self.TID=DataFrame(self.TID)
+        if not(self.memory_budget):
+            self.TID=where(self.TID<0,0,self.TID)
+            self.TID=DataFrame(self.TID)
         #Create a new column in rooftop_for_TID with 'PV_suitable_area_m2'
         self.rooftop_save['PV_suitable_area_m2']=self.rooftop_save['Area_reduction_factor']*self.rooftop_save['AREA']
 
         self.Weather,solarposition=self.get_weather(region.weather_file,region.latitude,region.longitude,region.altitude,region.timezone,mode)
-        #Initialize an index for POA_hourly_array
-        POA_hourly_array,dni_extra=zeros((8760,len(self.unique_segments))),irradiance.get_extra_radiation(self.Weather.index)
-        
-        ind2=0
-        for ind in self.rooftop_save.index: 
-            total_irradiance = irradiance.get_total_irradiance(
-                surface_tilt=self.rooftop_save['SLOPE'][ind], surface_azimuth=self.rooftop_save['ASPECT'][ind], 
-                solar_zenith=solarposition['apparent_zenith'],
-                solar_azimuth=solarposition['azimuth'],
-                dni=self.Weather['DNI'],
-                ghi=self.Weather['GHI'], 
-                dhi=self.Weather['DHI'],
-                dni_extra=dni_extra,
-                model='haydavies')
-            POA_hourly_array[:,ind2]=total_irradiance['poa_global']/1000
-            total_irradiance=total_irradiance.reset_index()
-            self.TID.iloc[:,ind2]=self.TID.iloc[:,ind2]*total_irradiance['poa_global']/1000
-
-            ind2=ind2+1
-
-        del ind,ind2
+        #Position of the hours of the TID in the weather data, the hourly TID only has the daylight hours (GHI>0)
+        if len(hour_index)<len(self.Weather.index):
+            self.hours=self.Weather.index.get_indexer(hour_index)
+            if (self.hours<0).any():
+                raise Exception("The hours of the TID are not in the weather file")
+        else:
+            self.hours=arange(len(self.Weather.index))
+        #The POA is only calculated for the hours of the TID
+        #POA (kW/m2) of all the segments by orientation (Hay-Davies) and POA reduced by the TID
+        if self.memory_budget and not(region.orientation_resolution):
+            #with the exact orientations almost every segment has its own column, the POA of each group of segments
+            #is calculated for the hours of the TID when it is needed (shaded_chunks) instead of filling the table
+            self.table,self.engine=None,self.get_poa_engine(self.Weather,solarposition,self.hours)
+        else:
+            self.table,self.engine=self.get_poa_table(self.Weather,solarposition),None
+        del solarposition
+        if self.memory_budget:
+            #Only the sums by segment are kept, the hourly shaded POA is recalculated by group of segments when needed
+            self.source,self.TID,self.POA_hourly_energy=TID_avg_by_FID,None,None
+            self.shaded_sum,self.POA_hourly=self.segment_sums()
+            self.rooftop_save.reset_index(inplace=True, drop=True)
+            self.rooftop_save.drop(['Area_reduction_factor','FID','AREA_sum_by_building'],axis=1,inplace=True)
+            return
+        POA_hourly_array,shaded=self.table.shaded_poa(self.TID.to_numpy(dtype='float64'),self.rooftop_save['SLOPE'].values,self.rooftop_save['ASPECT'].values,self.hours,1/1000)
+        self.TID=DataFrame(shaded)
+        self.table=None
+
         #Next, we will want to assign the contents of POA_hourly_array to the POA_hourly dataframe
-        self.POA_hourly = DataFrame(POA_hourly_array,index = self.Weather.index, columns = arange(1,len(self.unique_segments)+1,1))
+        self.POA_hourly = DataFrame(POA_hourly_array,index = self.Weather.index[self.hours], columns = arange(1,len(self.unique_segments)+1,1))
 
-        del POA_hourly_array,dni_extra,total_irradiance,solarposition
+        del POA_hourly_array,shaded
         self.POA_hourly=self.POA_hourly.reset_index(drop=True)
+        #The hours of the shaded POA are labelled by their position in the year
+        self.TID.index=self.hours
         self.POA_hourly_energy=self.TID.copy()
         self.POA_hourly=self.POA_hourly.sum(axis=0)
         
@@ -70,10 +83,107 @@ class calculate_technical_potential_hourly:
 
         self.TID=self.TID.transpose()
         self.TID.reset_index(drop=True, inplace=True)
+        self.shaded_sum=self.TID.sum(axis=1)
         self.POA_hourly_energy=self.POA_hourly_energy.transpose()
         self.rooftop_save.reset_index(inplace=True, drop=True)
         self.rooftop_save.drop(['Area_reduction_factor','FID','AREA_sum_by_building'],axis=1,inplace=True)
         
+    def shaded_chunks(self):
+        """
+        Calculates the POA and the shaded POA (kW/m2) of groups of segments, used when a memory
+        budget is set. The number of segments in a group is set so that the arrays of a group
+        use about memory_budget GB. The POA of a group is calculated for the hours of the TID
+        with the exact orientations, and read from the memory-mapped POA table when the
+        orientations are rounded (orientation_resolution).
+
+        Yields
+        ------
+        tuple[int,ndarray,ndarray]
+            position of the first segment of the group, POA and shaded POA with one row per
+            hour and one column per segment
+        """
+        tilt,azimuth=self.rooftop_save['SLOPE'].values,self.rooftop_save['ASPECT'].values
+        if self.table is not None:
+            columns=self.table.index(tilt,azimuth)
+        #about 8 arrays of float64 of the size of a group are used at once (TID, POA, shaded POA and the terms of the POA)
+        step=max(1,int(self.memory_budget*1e9/(len(self.hours)*8*8)))
+        for start in range(0,len(tilt),step):
+            TID=self.source.iloc[:,start:start+step].to_numpy(dtype='float64',na_value=0)
+            TID=where(TID<0,0,TID)
+            if self.table is None:
+                #rounded to float32 like the POA table so that the results do not depend on the memory budget
+                poa=(self.engine.poa_block(tilt[start:start+step],azimuth[start:start+step]).astype('float32')*(1/1000)).astype('float64')
+            else:
+                poa=(self.table.get_values(columns[start:start+step],self.hours)*(1/1000)).astype('float64')
+            yield start,poa,TID*poa
+
+    def segment_sums(self)->tuple[Series,Series]:
+        """
+        Sums over the hours of the shaded POA and of the POA of each segment, calculated by
+        group of segments (shaded_chunks).
+
+        Returns
+        -------
+        tuple[Series,Series]
+            shaded POA sum and POA sum (POA_sum) of each segment
+        """
+        shaded_sum,poa_sum=zeros(len(self.rooftop_save)),zeros(len(self.rooftop_save))
+        for start,poa,shaded in self.shaded_chunks():
+            shaded_sum[start:start+shaded.shape[1]]=shaded.sum(axis=0)
+            poa_sum[start:start+poa.shape[1]]=poa.sum(axis=0)
+        return Series(shaded_sum),Series(poa_sum,index=arange(1,len(poa_sum)+1,1),name="POA_sum")
+
+    def get_poa_table(self,weather:DataFrame,solarposition:DataFrame)->poa_table:
+        """
+        Sets up the lookup table of the hourly POA by orientation for all the hours of the weather
+        file. The table is saved in a folder next to the weather file (weather_file_poa_table_<key>,
+        the key being the checksum of the weather file, the location, the time zone, the albedo and
+        region.orientation_resolution) and reused by the hourly, representative and annual analyses.
+
+        Parameters
+        ----------
+        weather : DataFrame
+            weather data (get_weather)
+        solarposition : DataFrame
+            solar position of each hour of the weather data (get_weather)
+
+        Returns
+        -------
+        poa_table
+            POA lookup table
+        """
+        engine=self.get_poa_engine(weather,solarposition)
+        table_file,inputs=None,None
+        if path.isfile(self.region.weather_file):
+            table_file=path.splitext(self.region.weather_file)[0]
+            inputs={'weather_file':file_checksum(self.region.weather_file).digest(),'latitude':self.region.latitude,
+                    'longitude':self.region.longitude,'altitude':self.region.altitude,'timezone':self.region.timezone,
+                    'first_hour':weather.index[0]}
+        return poa_table(engine,self.region.orientation_resolution,table_file,inputs)
+
+    def get_poa_engine(self,weather:DataFrame,solarposition:DataFrame,hours:ndarray=None)->poa_engine:
+        """
+        Sets up the POA engine (Hay-Davies) of the hours of the weather file.
+
+        Parameters
+        ----------
+        weather : DataFrame
+            weather data (get_weather)
+        solarposition : DataFrame
+            solar position of each hour of the weather data (get_weather)
+        hours : ndarray
+            position of the hours used in the weather data, all the hours if None
+
+        Returns
+        -------
+        poa_engine
+            POA engine of the hours
+        """
+        dni_extra=self.weather_context.dni_extra
+        if hours is not None:
+            weather,solarposition,dni_extra=weather.iloc[hours],solarposition.iloc[hours],dni_extra.iloc[hours]
+        return poa_engine(solarposition['apparent_zenith'],solarposition['azimuth'],weather['DNI'],weather['GHI'],weather['DHI'],dni_extra)
+
     def set_performance_ratio(self,PR:float)->None:
         """
         Sets the performance ratio in the event that the performance ratio changes between runs
@@ -107,37 +217,55 @@ class calculate_technical_potential_hourly:
         
         """
         Computes the hourly POA and calculates the PV capacity and energy using the 
-        input data from TID and set files within the function.
+        input data from TID and set files within the function. The capacity and energy
+        are scaled from the result for a unit efficiency and performance ratio (unit_potential),
+        which is only calculated once.
 
         Returns
         -------
         list
             list of calculated statistics including the PV capacity and energy,
-            the fraction of need, number of buildings, etc.
+            the fraction of need, number of buildings, etc. The hourly weighted POA
+            only has the hours of the TID (columns are the position of the hour in the year)
 
         """
-        #Create a new column with 'PV_capacity_kW' giving the PV capacity
-        
-        self.rooftop_save['PV_capacity_kW']=self.rooftop_save['PV_suitable_area_m2']*self.PV_module_efficiency
+        if self.unit_result is None:
+            self.unit_result=self.unit_potential()
+        hourly_poa_bin_weighted,capacity,electricity=self.unit_result
 
-        #PV_energy_kWh
-        TID_avg_by_FID=DataFrame(self.TID.values*self.rooftop_save['PV_capacity_kW'].to_frame().values*self.Performance_Ratio, columns=self.TID.columns, index=self.TID.index)
+        PV_capacity_GW=list(capacity*self.PV_module_efficiency)
+        PV_energy_MWh=list(electricity*self.PV_module_efficiency*self.Performance_Ratio)
+        PV_capacity_GW.append(0.0)
+        PV_energy_MWh.append(0.0)
 
-        self.rooftop_save['PV_energy_kWh']=TID_avg_by_FID.sum(axis=1)
-        del TID_avg_by_FID
-        self.rooftop_save['TID']=self.TID.sum(axis=1)
+        return hourly_poa_bin_weighted.copy(), self.Weather["Temperature"],Series(PV_capacity_GW),Series(PV_energy_MWh)
+
+    def unit_potential(self)->tuple[DataFrame,ndarray,ndarray]:
+        """
+        Calculates the PV capacity and energy by solar resource bin for a module efficiency and
+        a performance ratio of 1. The capacity is proportional to the efficiency and the energy
+        to the efficiency times the performance ratio, and the capacity-weighted POA of the bins
+        does not depend on either, so the results of any efficiency and performance ratio are
+        scaled from this one.
+
+        Returns
+        -------
+        tuple[DataFrame,ndarray,ndarray]
+            hourly weighted POA by bin, capacity (GW) by bin per unit of efficiency and
+            electricity (MWh) by bin per unit of efficiency times performance ratio
+        """
+        self.rooftop_save['PV_capacity_kW']=self.rooftop_save['PV_suitable_area_m2']
+        self.rooftop_save['PV_energy_kWh']=self.shaded_sum*self.rooftop_save['PV_capacity_kW']
+        self.rooftop_save['TID']=self.shaded_sum
         self.rooftop_save['POA_sum']=self.POA_hourly
         
-        hourly_poa_bin_weighted,PV_capacity_GW,PV_energy_MWh=self.potential_bin(self.rooftop_save,self.POA_hourly_energy)
-        self.rooftop_save.drop(['TID','PV_energy_kWh','POA_sum'],axis=1,inplace=True)
+        hourly_poa_bin_weighted,capacity,electricity=self.potential_bin(self.rooftop_save,self.POA_hourly_energy)
+        self.rooftop_save.drop(['PV_capacity_kW','TID','PV_energy_kWh','POA_sum'],axis=1,inplace=True)
 
         hourly_poa_bin_weighted=DataFrame(hourly_poa_bin_weighted).reset_index(drop=True)
-        PV_capacity_GW.append(0.0)
-        PV_energy_MWh.append(0.0)
-
-        return hourly_poa_bin_weighted, self.Weather["Temperature"],Series(PV_capacity_GW),Series(PV_energy_MWh)
+        return hourly_poa_bin_weighted,array(capacity),array(electricity)
     
-    def hourly_region(self,)->list[float]:
+    def hourly_region(self,file_location:str='')->list[float]:
         """
         Computes the hourly POA and calculates the PV capacity and energy using the 
         input data from TID, the raster and shapefile.
@@ -166,15 +294,13 @@ class calculate_technical_potential_hourly:
         
         print("Building footprint area (analysis region) in km2: ",round(self.building_area/1000/1000,2))
         #PV_energy_kWh
-        TID_avg_by_FID=DataFrame(self.TID.values*rooftop_for_TID.values*self.Performance_Ratio, columns=self.TID.columns, index=self.TID.index)
+        TID_avg_by_FID=self.shaded_sum*rooftop_for_TID['PV_capacity_kW'].values*self.Performance_Ratio
 
-        Total_PV_energy_GWh= TID_avg_by_FID.sum()
-        Total_PV_energy_GWh=Total_PV_energy_GWh.sum()/1e6
+        Total_PV_energy_GWh=TID_avg_by_FID.sum()/1e6
         
-        TID_avg_by_FID=TID_avg_by_FID.sum(axis=1)
         TID_avg_by_FID.name="PV_energy_kWh"
         rooftop['PV_energy_kWh']=TID_avg_by_FID.copy()
-        rooftop['TID']=self.TID.sum(axis=1)
+        rooftop['TID']=self.shaded_sum
         rooftop['POA_sum']=self.POA_hourly
         del TID_avg_by_FID
         rooftop['Shading derate (%)']=rooftop['TID']/rooftop['POA_sum']*100
@@ -183,7 +309,7 @@ class calculate_technical_potential_hourly:
         median_shading_loss=rooftop['Shading derate (%)'].median()
         print("Median shading derate: ", round(median_shading_loss,2))
         rooftop['Optimal_energy']=rooftop['PV_capacity_kW']*self.Performance_Ratio*rooftop['POA_sum'].max()
-        coeff_capacity_shade,coeff_elctricity_shade=self.coefficients(rooftop,self.building_area)
+        coeff_capacity_shade,coeff_elctricity_shade=self.coefficients(rooftop,self.building_area,self.region.coefficient_thresholds)
 
         area=rooftop['AREA'].sum()/1000/1000
         print('Total rooftop area', round(area,2))
@@ -216,7 +342,8 @@ class calculate_technical_potential_hourly:
             A input dataframe with the building footprint area
 
         """
-        bldg=read_file(self.region.bldg_footprint)
+        #attributes only, read from the attribute table saved next to the footprint file after the first read
+        bldg=attribute_table(self.region.bldg_footprint).read()
         bldg.reset_index(inplace=True)
         if "bldgarea" not in bldg.columns:
             # look for a column that contains "area" (case-insensitive)
@@ -251,7 +378,8 @@ class calculate_technical_potential_hourly:
             analysis.
 
         """
-        rooftop=read_file(shapefile)
+        #attributes only, read from the attribute table saved next to the shapefile after the first read
+        rooftop=attribute_table(shapefile,['FID','BUILDING','SLOPE','ASPECT','AREA']).read()
         
         #Calculate average slope for each building
         rooftop['SLOPE*AREA']=rooftop['SLOPE']*rooftop['AREA']
@@ -261,10 +389,7 @@ class calculate_technical_potential_hourly:
         
         #Dropping un-needed columns
         rooftop.drop('SLOPE*AREA', axis=1, inplace=True)
-        rooftop.drop('MAX_ELEV', axis=1, inplace=True)
         rooftop.drop('SLOPE*AREA_sum_by_BUILDING', axis=1, inplace=True)
-        rooftop.drop('geometry', axis=1, inplace=True)
-        rooftop.drop('HILLSHADE', axis=1, inplace=True)
         
         #Set slope to 10 degrees when AVG_SLOPE_BY_BUILDING is <=10
         rooftop.loc[rooftop['AVG_SLOPE_BY_BUILDING']<=10,'SLOPE']=10
@@ -274,20 +399,9 @@ class calculate_technical_potential_hourly:
         
         rooftop.drop('AVG_SLOPE_BY_BUILDING', axis=1, inplace=True)
         
-        #Importing rasterized segments and selecting only those FIDs
-        Rasterized_segments_data = open_file(filename).read(1)
-        
-        #Get 2D numpy arrays 
-        Rasterized_segments_ravel=Rasterized_segments_data.ravel() 
-        
-        #Turn arrays into 1D vectors 
-        # Rasterized_segments_ravel=Rasterized_segments_array.ravel() 
-        del Rasterized_segments_data
-        # del Rasterized_segments_array
-        #Find out which FIDs are in the rasterization of the shapefile
-        unique_segments = unique(Rasterized_segments_ravel)
+        #Find out which FIDs are in the rasterization of the shapefile (saved with the memory-mapped rasterized segments shared with the shading)
+        unique_segments=segment_raster.get(filename).unique()
         unique_segments=unique_segments[unique_segments!=-999]
-        del Rasterized_segments_ravel
         #Select only those FIDs
         rooftop_for_TID=rooftop[rooftop['FID'].isin(unique_segments)]
         
@@ -298,7 +412,8 @@ class calculate_technical_potential_hourly:
 
     def get_weather(self,weather_file: str,latitude: float,longitude: float,altitude: float,timezone:str,mode:str) -> tuple[DataFrame,DataFrame]:
         """
-        Function to read and output the weather data
+        Function to read and output the weather data. The weather data and solar position are
+        shared with the other analyses of the same weather file and location (tools.weather_context)
 
         Parameters
         ----------
@@ -321,53 +436,29 @@ class calculate_technical_potential_hourly:
             Dataframe of calculated weather conditions based on the input weather data.
 
         """
-        #Read in weather data
-        if latitude>=60 and (mode=="Market" or mode=='grid'): 
-            Weather_dataframe=read_csv(weather_file,skiprows=16)
-            Weather_dataframe.rename(columns={'ALLSKY_SFC_SW_DWN':'GHI'},inplace=True)
-            Weather_dataframe.rename(columns={'ALLSKY_SFC_SW_DNI':'DNI'},inplace=True)
-            Weather_dataframe.rename(columns={'ALLSKY_SFC_SW_DIFF':'DHI'},inplace=True)
-            Weather_dataframe.rename(columns={'T2M':'Temperature'},inplace=True)
-            Weather_dataframe['Timestamp']=to_datetime(Weather_dataframe[['YEAR','MO','DY','HR']].astype(str).agg('-'.join,axis=1),format='%Y-%m-%d-%H')
-            Weather_dataframe["Timestamp"] = Weather_dataframe["Timestamp"].dt.tz_localize(timezone)
-            Weather_dataframe["Timestamp"] += DateOffset(minutes=30)
-            # Set as index 
-            Weather_dataframe = Weather_dataframe.set_index('Timestamp')
-        
-        elif latitude>=60 and mode=="Technical": 
-            Weather_dataframe=iotools.read_epw(weather_file)[0]
-            Weather_dataframe.rename(columns={'ghi':'GHI'},inplace=True)
-            Weather_dataframe.rename(columns={'dni':'DNI'},inplace=True)
-            Weather_dataframe.rename(columns={'dhi':'DHI'},inplace=True)
-            Weather_dataframe.rename(columns={'temp_air':'Temperature'},inplace=True)
-        else:
-            Weather_dataframe=iotools.read_psm3(weather_file)[0] 
-            Weather_dataframe.rename(columns={'ghi':'GHI'},inplace=True)
-            Weather_dataframe.rename(columns={'dni':'DNI'},inplace=True)
-            Weather_dataframe.rename(columns={'dhi':'DHI'},inplace=True)
-            Weather_dataframe.rename(columns={'temp_air':'Temperature'},inplace=True)
-        
-        #Calculate the solar position
-        solpos = solarposition.get_solarposition(
-                time=Weather_dataframe.index, 
-                latitude=latitude,
-                longitude=longitude,
-                altitude=altitude,
-                temperature=Weather_dataframe["Temperature"],
-                pressure=atmosphere.alt2pres(altitude))
+        #The weather file is read and the solar position calculated once per process (and saved next to the weather file)
+        self.weather_context=weather_context.get(weather_file,latitude,longitude,altitude,timezone,weather_context.reader_for(latitude,mode))
+        Weather_dataframe,solpos=self.weather_context.frames()
         
         return Weather_dataframe,solpos
 
-    def potential_bin(self,rooftop_for_TID: DataFrame,hourly_POA:DataFrame)-> list[list[float]]:
+    def potential_bin(self,rooftop_for_TID: DataFrame,hourly_POA:DataFrame,num_bins:int=10)-> list[list[float]]:
         """
         Calculates weighted POA, weighted by the capacity to POA on each segment and summed.
+        Each segment is assigned once to its solar resource bin (tools.resource_bins) and the
+        weighted POA of all the bins is calculated with one sparse matrix product.
 
         Parameters
         ----------
         rooftop_for_TID : DataFrame
             DataFrame of all the results for each segment
         hourly_POA : DataFrame
-            DataFrame of the hourly shaded POA by segment
+            DataFrame of the hourly shaded POA by segment, with the position of the hour in the
+            year as columns (daylight hours only for the hourly TID). None to recalculate it by
+            group of segments when a memory budget is set (shaded_chunks) or from the
+            representative days (bin_profiles)
+        num_bins : int
+            number of solar resource bins (10 bins of 10% of the maximum by default)
 
         Returns
         -------
@@ -378,30 +469,51 @@ class calculate_technical_potential_hourly:
         poa_sum : list[list[float]]
             output list with the hourly shaded POA split into bins
         """
-        
-
-        weighted_poa_sum=[]
-        threshold=[0,0.1,0.2,0.3,0.4,0.5,0.6,0.7,0.8,0.9]
-        electricity=[]
-        capacity=[]
-        for percent_filter in threshold:
+        segment_sum=self.shaded_sum.values if hourly_POA is None else hourly_POA.sum(axis=1).values
 
-            poa_temp=hourly_POA.loc[(hourly_POA.sum(axis=1)>=hourly_POA.sum(axis=1).max()*percent_filter)&(hourly_POA.sum(axis=1)<hourly_POA.sum(axis=1).max()*(percent_filter+0.1))]
-            capacity_temp=rooftop_for_TID.loc[(rooftop_for_TID['TID']>=rooftop_for_TID['POA_sum'].max()*percent_filter)&(rooftop_for_TID['TID']<rooftop_for_TID['POA_sum'].max()*(percent_filter+0.1)),'PV_capacity_kW'].sum()/1000/1000
-            electricity_temp=rooftop_for_TID.loc[(rooftop_for_TID['TID']>=rooftop_for_TID['POA_sum'].max()*percent_filter)&(rooftop_for_TID['TID']<rooftop_for_TID['POA_sum'].max()*(percent_filter+0.1)),'PV_energy_kWh'].sum()/1000
-            poa_temp=hourly_POA.align(poa_temp,join='inner')[0]
-            cap_temp=rooftop_for_TID['PV_capacity_kW'].align(poa_temp,join='inner')[0]
-            weighted_poa=(poa_temp.mul(cap_temp,axis=0)).sum().div(cap_temp.sum())
-            weighted_poa.replace(np.nan,0,inplace=True)
-            capacity.append(capacity_temp)
-            electricity.append(electricity_temp)
-            weighted_poa_sum.append(weighted_poa)
+        #Capacity and electricity by bin of shaded POA relative to the maximum POA
+        bins=resource_bins(rooftop_for_TID['TID'].values,rooftop_for_TID['POA_sum'].max(),num_bins)
+        capacity=list(bins.sum(rooftop_for_TID['PV_capacity_kW'].values)/1000/1000)
+        electricity=list(bins.sum(rooftop_for_TID['PV_energy_kWh'].values)/1000)
+        #Hourly shaded POA weighted by capacity by bin of shaded POA relative to the maximum shaded POA, accumulated by group of segments
+        bins=resource_bins(segment_sum,segment_sum.max(),num_bins)
+        weighted_poa_sum=self.bin_profiles(bins,rooftop_for_TID['PV_capacity_kW'].values,hourly_POA)
 
         return weighted_poa_sum,capacity,electricity
+
+    def bin_profiles(self,bins:resource_bins,weights:ndarray,hourly_POA:DataFrame=None)->list[Series]:
+        """
+        Weighted average hourly shaded POA of each bin.
+
+        Parameters
+        ----------
+        bins : resource_bins
+            solar resource bins of the segments
+        weights : ndarray
+            weight of each segment (ex. capacity)
+        hourly_POA : DataFrame
+            hourly shaded POA by segment with the position of the hour in the year as columns.
+            None to recalculate it by group of segments (shaded_chunks)
+
+        Returns
+        -------
+        list[Series]
+            weighted average of each bin with the position of the hour in the year as index
+        """
+        if hourly_POA is None:
+            hours=self.hours
+            chunks=((start,shaded) for start,poa,shaded in self.shaded_chunks())
+        else:
+            hours=hourly_POA.columns
+            chunks=[(0,hourly_POA.values.T)]
+        weighted=bins.weighted_profiles(chunks,weights,len(hours))
+        return [Series(profile,index=hours) for profile in weighted]
     
-    def coefficients(self,rooftop_for_TID: DataFrame,building_area: float)-> list[list,list,list,list]:
+    def coefficients(self,rooftop_for_TID: DataFrame,building_area: float,num_thresholds:int=10)-> list[list,list]:
         """
-        Calculates the coefficiencts by threshold with and without shading.
+        Calculates the shaded coefficients by threshold. The segments are sorted once by
+        their shaded solar resource and the sums above each threshold are read from
+        cumulative sums, so any number of thresholds can be used.
 
         Parameters
         ----------
@@ -409,26 +521,24 @@ class calculate_technical_potential_hourly:
             dataframe with all the information by segement
         building_area : float
             total building footprint area
+        num_thresholds : int
+            number of thresholds of equal steps between 0 and 1 (10 for 0, 0.1, ..., 0.9)
         
         Returns
         -------
-        list[list,list,list,list]
-            outputs a list of 4 lists consistign of unshaded capacity coefficients,
-            shaded capacity coefficients, unshaded energy coefficients, and
-            shaded energy coefficients
-        """
-        coeff_capacity_shade=[]
-        coeff_elctricity_shade=[]
-        threshold=[0,0.1,0.2,0.3,0.4,0.5,0.6,0.7,0.8,0.9]
-        for percent_filter in threshold:
-            optimal_energy=rooftop_for_TID.loc[rooftop_for_TID['POA_sum']>=rooftop_for_TID['POA_sum'].max()*percent_filter,'Optimal_energy'].sum()/1e6
-            temp=rooftop_for_TID.loc[rooftop_for_TID['TID']>=rooftop_for_TID['POA_sum'].max()*percent_filter,'PV_suitable_area_m2'].sum()
-
-            electricity_shade=rooftop_for_TID.loc[rooftop_for_TID['TID']>=rooftop_for_TID['POA_sum'].max()*percent_filter,'PV_energy_kWh'].sum()/1e6
-            optimal_energy=rooftop_for_TID.loc[rooftop_for_TID['TID']>=rooftop_for_TID['POA_sum'].max()*percent_filter,'Optimal_energy'].sum()/1e6
-
-            coeff_capacity_shade.append([temp/building_area,percent_filter])
-            coeff_elctricity_shade.append([electricity_shade/(optimal_energy),percent_filter])
+        list[list,list]
+            outputs a list of 2 lists consisting of the shaded capacity coefficients and
+            the shaded energy coefficients with their threshold
+        """
+        threshold=coefficient_curve.thresholds(num_thresholds).tolist()
+        curve=coefficient_curve(rooftop_for_TID['TID'].values,rooftop_for_TID['POA_sum'].max())
+        area=curve.above(rooftop_for_TID['PV_suitable_area_m2'].values,threshold)
+        electricity_shade=curve.above(rooftop_for_TID['PV_energy_kWh'].values,threshold)/1e6
+        optimal_energy=curve.above(rooftop_for_TID['Optimal_energy'].values,threshold)/1e6
+        with errstate(divide='ignore',invalid='ignore'):
+            coeff_elctricity_shade=electricity_shade/optimal_energy
+        coeff_capacity_shade=[[area[i]/building_area,threshold[i]] for i in range(0,len(threshold))]
+        coeff_elctricity_shade=[[coeff_elctricity_shade[i],threshold[i]] for i in range(0,len(threshold))]
 
         return coeff_capacity_shade,coeff_elctricity_shade
     
@@ -595,26 +705,9 @@ class calculate_technical_potential_annual(calculate_technical_potential_hourly)
         
         Weather_dataframe,solpos=self.get_weather(self.region.weather_file,self.region.latitude,self.region.longitude,self.region.altitude,self.region.timezone,'Technical')
         
-        #Calculate extraterrestrial direct normal irradiance 
-        dni_extra = irradiance.get_extra_radiation(Weather_dataframe.index)
-        
-        poa_sum=[]
-
-        #Calculate plane-of-array irradiance for each rooftop segment
-        for ind in rooftop_for_TID.index: 
-            total_irradiance = irradiance.get_total_irradiance(
-                rooftop_for_TID['SLOPE'][ind], rooftop_for_TID['ASPECT'][ind], 
-                solpos['apparent_zenith'],
-                solpos['azimuth'],
-                Weather_dataframe['DNI'],
-                Weather_dataframe['GHI'], 
-                Weather_dataframe['DHI'],
-                dni_extra=dni_extra,
-                model='haydavies')
-            poa_sum.append(total_irradiance["poa_global"].sum()/1000)
-            
-        
-        rooftop_for_TID.loc[:,"POA_SUM"]=array(poa_sum)
+        #Calculate the annual plane-of-array irradiance of all the rooftop segments by orientation
+        table=self.get_poa_table(Weather_dataframe,solpos)
+        rooftop_for_TID.loc[:,"POA_SUM"]=table.poa_sum(rooftop_for_TID['SLOPE'].values,rooftop_for_TID['ASPECT'].values,1/1000)
         
         #Inputs for analysis
         #Set values for PV_module_efficiency, Performance_Ratio and Electricity_Consumption that will be used to calculate PV potential in terms of power (PV capacity) and energy
@@ -671,6 +764,8 @@ class calculate_technical_potential_rep(calculate_technical_potential_hourly):
         self.Performance_Ratio= PR
         self.TID=TID_avg_by_FID
         self.region=region
+        #result for a unit efficiency and performance ratio, calculated by the first hourly_grid
+        self.unit_result=None
         self.treat_dataframe()
 
         #Change the slope and aspect for buildings with flat roofs
@@ -688,93 +783,110 @@ class calculate_technical_potential_rep(calculate_technical_potential_hourly):
         self.rooftop_save['PV_suitable_area_m2']=self.rooftop_save['Area_reduction_factor']*self.rooftop_save['AREA']
         self.Weather,solarposition=self.get_weather(region.weather_file,region.latitude,region.longitude,region.altitude,region.timezone,mode)
         
-        #Initialize an index for POA_hourly_array
-        POA_hourly_array,dni_extra=zeros((len(self.Weather.index),len(self.unique_segments))),irradiance.get_extra_radiation(self.Weather.index)
+        table=self.get_poa_table(self.Weather,solarposition)
         solarposition.reset_index(inplace=True)
 
         self.Weather.reset_index(inplace=True)
         # solpos.reset_index(inplace=True, drop=True)
-        dni_extra.reset_index(inplace=True,drop=True)
-        ind2=0
+        #The shading is only kept for the hours of the representative days, each hour of the year is mapped to the hour of its representative day
+        self.hour_map=self.representative_map(rep_days)
+        if len(self.hour_map)!=len(self.Weather):
+            raise Exception("The representative days need a weather file of "+str(len(self.hour_map))+" hours")
+        self.hours=arange(len(self.hour_map))
+        self.rep_TID=self.TID.to_numpy(dtype='float64')
+        self.TID,self.POA_hourly_energy=None,None
+
+        #POA (kW/m2) of the orientations of the segments (Hay-Davies) for all the hours and summed by hour of the representative days
+        self.table=table
+        self.columns=table.index(self.rooftop_save['SLOPE'].values,self.rooftop_save['ASPECT'].values)
+        self.used,self.orientation=unique(self.columns,return_inverse=True)
+        self.poa=(table.get_values(self.used)*(1/1000)).astype('float64')
+        rep_poa=zeros((len(self.rep_TID),len(self.used)))
+        add.at(rep_poa,self.hour_map,self.poa)
+
+        #Shaded POA sum and POA sum of each segment
+        self.shaded_sum=Series((self.rep_TID*rep_poa[:,self.orientation]).sum(axis=0))
+        self.POA_hourly=Series(self.poa.sum(axis=0)[self.orientation],index=arange(1,len(self.unique_segments)+1,1),name="POA_sum")
+        del rep_poa
+        self.rooftop_save.reset_index(inplace=True, drop=True)
+        self.rooftop_save.drop(['Area_reduction_factor','FID','AREA_sum_by_building'],axis=1,inplace=True)
+
+    @staticmethod
+    def representative_map(rep_days:int)->ndarray:
+        """
+        Maps each hour of the year to the hour of its representative day. With 12 days each
+        month uses its own day, with 4 days the months use the day of the closest equinox or
+        solstice (December for January and February, March for March to May, etc.).
+
+        Parameters
+        ----------
+        rep_days : int
+            number of representative days, 4 or 12
+
+        Returns
+        -------
+        ndarray
+            row of the representative shading of each hour of the year
+        """
+        days=[31,28,31,30,31,30,31,31,30,31,30,31]
         if rep_days==12:
-            total_range = chain(range(480,504),range(1224,1248),range(1896,1920),range(2640,2664),
-                                range(3360,3384), range(4104,4128), range(4824,4848),range(5568,5592),
-                                range(6312,6336), range(7032,7056),range(7776,7800),range(8496,8520))
-            January=self.TID.loc[0:23]
-            February=self.TID.loc[24:47]
-            March=self.TID.loc[48:71]
-            April=self.TID.loc[72:95]
-            May=self.TID.loc[96:119]
-            June=self.TID.loc[120:143]
-            July=self.TID.loc[144:167]
-            August=self.TID.loc[168:191]
-            September=self.TID.loc[192:215]
-            October=self.TID.loc[216:239]
-            November=self.TID.loc[240:263]
-            December=self.TID.loc[264:287]
-            temp_list=[January,February,March,April,May,June,July,August,September,October,November,December]
-            weights=[1,28/31,1,30/31,1,30/31,1,1,30/31,1,30/31,1]
-            
+            month_day=arange(12)
         else:
-            total_range = chain(range(1896,1920), range(4104,4128), range(6312,6336), range(8496,8520))
-            March=self.TID.loc[0:23]
-            June=self.TID.loc[24:47]
-            September=self.TID.loc[48:71]
-            December=self.TID.loc[72:95]
-            temp_list=[December,March,March,March,June,June,June,September,September,September,December,December]
-
-        TID_avg_by_FID2=[]
-        index=1
-        for month in temp_list:
-            if index==1:
-                for i in range(1,32):
-                    if i==1:
-                        TID_avg_by_FID2=month.copy()
-                    else:
-                        TID_avg_by_FID2=concat([TID_avg_by_FID2,month])
-            elif index==3 or index==5 or index==7 or index==8 or index==10 or index==12:
-                for i in range(1,32):
-                    TID_avg_by_FID2=concat([TID_avg_by_FID2,month])
-            elif index==2:
-                for i in range(1,29):
-                    TID_avg_by_FID2=concat([TID_avg_by_FID2,month])
-            elif index==4 or index==6 or index==9 or index==11:
-                for i in range(1,31):
-                    TID_avg_by_FID2=concat([TID_avg_by_FID2,month])
-            index=index+1
-        self.TID=TID_avg_by_FID2.reset_index(drop=True)
-
-        for ind in self.rooftop_save.index: 
-            total_irradiance = irradiance.get_total_irradiance(
-                self.rooftop_save['SLOPE'][ind], self.rooftop_save['ASPECT'][ind], 
-                solarposition['apparent_zenith'],
-                solarposition['azimuth'],
-                self.Weather['DNI'],
-                self.Weather['GHI'], 
-                self.Weather['DHI'],
-                dni_extra=dni_extra,
-                model='haydavies')
-            POA_hourly_array[:,ind2]=total_irradiance['poa_global'].copy()/1000
-            total_irradiance=total_irradiance.reset_index()
-            self.TID.iloc[:,ind2]=self.TID.iloc[:,ind2]*total_irradiance['poa_global']/1000
-        
-            ind2=ind2+1
-
-        del ind,ind2
-        #Next, we will want to assign the contents of POA_hourly_array to the POA_hourly dataframe
-        self.POA_hourly = DataFrame(POA_hourly_array,index = self.Weather.index, columns = arange(1,len(self.unique_segments)+1,1))
-        self.POA_hourly=self.POA_hourly.reset_index(drop=True)
-        self.POA_hourly_energy=self.TID.copy()
-        self.POA_hourly=self.POA_hourly.sum(axis=0)
-        
-        self.POA_hourly.name="POA_sum"
-        del POA_hourly_array
+            month_day=array([3,0,0,0,1,1,1,2,2,2,3,3])
+        day_map=repeat(month_day,days)
+        return (day_map[:,None]*24+arange(24)).ravel()
 
-        self.TID=self.TID.transpose()
-        self.TID.reset_index(drop=True, inplace=True)
-        self.POA_hourly_energy=self.POA_hourly_energy.transpose()
-        self.rooftop_save.reset_index(inplace=True, drop=True)
-        self.rooftop_save.drop(['Area_reduction_factor','FID','AREA_sum_by_building'],axis=1,inplace=True)
+    def full_year(self)->DataFrame:
+        """
+        Hourly shaded POA of each segment for all the hours of the year, expanded from the
+        representative days. Only needed to export the hourly values, the analysis uses the
+        representative days directly.
+
+        Returns
+        -------
+        DataFrame
+            shaded POA (kW/m2) with one row per segment and one column per hour
+        """
+        return DataFrame((self.rep_TID[self.hour_map]*self.poa[:,self.orientation]).T)
+
+    def bin_profiles(self,bins:resource_bins,weights:ndarray,hourly_POA:DataFrame=None)->list[Series]:
+        """
+        Weighted average hourly shaded POA of each bin, calculated from the representative days.
+        The segments of a bin with the same orientation share their hourly POA, so their weighted
+        shading is summed by hour of the representative days first and only multiplied by the
+        POA of each hour of the year after.
+
+        Parameters
+        ----------
+        bins : resource_bins
+            solar resource bins of the segments
+        weights : ndarray
+            weight of each segment (ex. capacity)
+        hourly_POA : DataFrame
+            not used, the hourly shaded POA is not kept for the representative days
+
+        Returns
+        -------
+        list[Series]
+            weighted average of each bin with the position of the hour in the year as index
+        """
+        weights=asarray(weights,dtype='float64')
+        segments=bins.segments
+        #(bin, orientation) of the segments in a bin
+        pairs,pair=unique(bins.bin[segments]*len(self.used)+self.orientation[segments],return_inverse=True)
+        matrix=csr_matrix((weights[segments],(pair,segments)),shape=(len(pairs),len(weights)))
+        weighted=matrix@self.rep_TID.T
+        #sum of the pairs by bin
+        by_bin=csr_matrix((ones(len(pairs)),(arange(len(pairs)),pairs//len(self.used))),shape=(len(pairs),bins.num_bins))
+        poa=self.poa[:,pairs%len(self.used)]
+        profiles=zeros((bins.num_bins,len(self.hour_map)))
+        for row in range(0,len(self.rep_TID)):
+            hours=flatnonzero(self.hour_map==row)
+            profiles[:,hours]=(by_bin.T@(poa[hours]*weighted[:,row]).T)
+        with errstate(divide='ignore',invalid='ignore'):
+            profiles=profiles/bins.sum(weights)[:,None]
+        profiles[profiles!=profiles]=0
+        return [Series(profile,index=self.hours) for profile in profiles]
 
     def rep(self) -> list[float]:
         """
@@ -796,15 +908,13 @@ class calculate_technical_potential_rep(calculate_technical_potential_hourly):
         
         print("Building footprint area (analysis region) in km2: ",round(self.building_area/1000/1000,2))
         #PV_energy_kWh
-        TID_avg_by_FID=DataFrame(self.TID.values*rooftop_for_TID.values*self.Performance_Ratio, columns=self.TID.columns, index=self.TID.index)
+        TID_avg_by_FID=self.shaded_sum*rooftop_for_TID['PV_capacity_kW'].values*self.Performance_Ratio
 
-        Total_PV_energy_GWh= TID_avg_by_FID.sum()
-        Total_PV_energy_GWh=Total_PV_energy_GWh.sum()/1e6
+        Total_PV_energy_GWh=TID_avg_by_FID.sum()/1e6
         
-        TID_avg_by_FID=TID_avg_by_FID.sum(axis=1)
         TID_avg_by_FID.name="PV_energy_kWh"
         rooftop['PV_energy_kWh']=TID_avg_by_FID.copy()
-        rooftop['TID']=self.TID.sum(axis=1)
+        rooftop['TID']=self.shaded_sum
         rooftop['POA_sum']=self.POA_hourly
         del TID_avg_by_FID
         rooftop['Shading derate (%)']=rooftop['TID']/rooftop['POA_sum']*100
@@ -813,7 +923,7 @@ class calculate_technical_potential_rep(calculate_technical_potential_hourly):
         median_shading_loss=rooftop['Shading derate (%)'].median()
         print("Median shading derate: ", round(median_shading_loss,2))
         rooftop['Optimal_energy']=rooftop['PV_capacity_kW']*self.Performance_Ratio*rooftop['POA_sum'].max()
-        coeff_capacity_shade,coeff_elctricity_shade=self.coefficients(rooftop,self.building_area)
+        coeff_capacity_shade,coeff_elctricity_shade=self.coefficients(rooftop,self.building_area,self.region.coefficient_thresholds)
 
         area=rooftop['AREA'].sum()/1000/1000
         print('Total rooftop area', round(area,2))
@@ -838,21 +948,4 @@ class calculate_technical_potential_rep(calculate_technical_potential_hourly):
         list[float]
             returns a list of the total pv capacity and energy generation
         """
-        self.rooftop_save['PV_capacity_kW']=self.rooftop_save['PV_suitable_area_m2']*self.PV_module_efficiency
-
-        #PV_energy_kWh
-        TID_avg_by_FID=DataFrame(self.TID.values*self.rooftop_save['PV_capacity_kW'].to_frame().values*self.Performance_Ratio, columns=self.TID.columns, index=self.TID.index)
-
-        self.rooftop_save['PV_energy_kWh']=TID_avg_by_FID.sum(axis=1)
-        del TID_avg_by_FID
-        self.rooftop_save['TID']=self.TID.sum(axis=1)
-        self.rooftop_save['POA_sum']=self.POA_hourly
-        
-        hourly_poa_bin_weighted,PV_capacity_GW,PV_energy_MWh=self.potential_bin(self.rooftop_save,self.POA_hourly_energy)
-        self.rooftop_save.drop(['TID','PV_energy_kWh','POA_sum'],axis=1,inplace=True)
-
-        hourly_poa_bin_weighted=DataFrame(hourly_poa_bin_weighted).reset_index(drop=True)
-        PV_capacity_GW.append(0.0)
-        PV_energy_MWh.append(0.0)
-
-        return hourly_poa_bin_weighted, self.Weather["Temperature"],Series(PV_capacity_GW),Series(PV_energy_MWh)
+        return self.hourly_grid()
@@ -1,6 +1,45 @@
 import Lidar
 import Segmentation
-from pandas import Series
+from tools import tile_index
+from pandas import Series,read_csv
+from numpy import array,searchsorted
+from os import path
+import json
+
+def read_bool(value:str)->bool:
+    """
+    Parameters
+    ----------
+    value : string
+        value of a setting (ex. True, False, 1, 0)
+
+    Returns
+    -------
+    bool
+        True for true, yes or 1 (any case)
+    """
+    return value.strip().lower() in ['true','yes','1']
+
+def read_region(value:str)->tuple|str|None:
+    """
+    Parameters
+    ----------
+    value : string
+        region of interest: a bounding box (min x, min y, max x, max y), a vector file or None
+
+    Returns
+    -------
+    tuple, string or None
+        bounding box, vector file or None for the whole folder
+    """
+    value=value.strip()
+    if value=='' or value=='None':
+        return None
+    bounds=value.strip('()[]').split(',')
+    try:
+        return tuple(float(bound) for bound in bounds) if len(bounds)==4 else value
+    except ValueError:
+        return value
 
 class location:
     """
@@ -8,13 +47,30 @@ class location:
     latitude/longitude, timezone, etc.
 
     """
-    def __init__(self,file_name:str='',mode:str='',scaling_option:bool=True,cap_coefficient_shade:list=[],elec_coefficient_shade:list=[],*args:any):
+    #optional settings of a region, read by name from the batch input file (see read_settings)
+    settings={'shading_tile_size':int,'orientation_resolution':float,'memory_budget':float,'coefficient_thresholds':int,
+              'virtual_mosaic':read_bool,'building_tiles_only':read_bool,'tile_margin':float,'region_of_interest':read_region,
+              'shading_backend':str}
+
+    def __init__(self,file_name:str='',mode:str='',scaling_option:bool=True,cap_coefficient_shade:list=[],elec_coefficient_shade:list=[],*args:any,lidar_workers:int=1):
         self.cap_coefficient_shade=cap_coefficient_shade
         self.elec_coefficient_shade=elec_coefficient_shade   
         self.file_path='batch_inputs'
         self.mosaic=''
         self.raster_file=''
         self.shapefile=''
+        #default values of the optional settings, which can be changed in the batch input file (see read_settings)
+        self.shading_tile_size=0 #size in cells of the tiles used for the shading analysis of large mosaics, 0 to use the whole mosaic
+        self.orientation_resolution=0 #the tilt and azimuth of the segments are rounded to this value (degrees) to share the POA of close orientations, 0 to use the exact orientations
+        self.memory_budget=0 #memory (GB) used for the hourly POA of a group of segments in the hourly technical potential, 0 to keep the hourly matrices of all the segments in memory
+        self.virtual_mosaic=False #combine the DSM files into a virtual mosaic (.vrt next to the mosaic) instead of copying them into one .tif file
+        self.building_tiles_only=False #only use the lidar files that intersect the building footprints (within tile_margin) for the DSM, mosaic and segmentation
+        self.tile_margin=0 #distance (in the units of the lidar files) around each lidar file within which a building selects the file, to keep the files that can shade the buildings
+        self.region_of_interest=None #only use the lidar files within this bounding box (min x, min y, max x, max y) or polygon (vector file), None for the whole folder
+        self.coefficient_thresholds=10 #number of thresholds of the shaded capacity and electricity coefficients (10 for 0, 0.1, ..., 0.9)
+        self.shading_backend='whitebox' #shading backend of TimeInDaylight.py: whitebox (WhiteboxTools time_in_daylight) or numpy (experimental, tools/shadow_engine.py)
+        self.selected_tiles=None
+        self.lidar_workers=lidar_workers #number of processes creating the DSM files of the LAS files at once
         if mode=='Technical':
             self.technical_potential(file_name,args)
         elif mode=='Market':
@@ -25,6 +81,7 @@ class location:
             self.grid(file_name,args)
         else:
             raise Exception("Not a valid mode of operation. Options include: Technical, Market, or grid")
+        self.check_settings()
 
     def technical_potential(self,file_name:str='',*args:any)->None:
         """
@@ -64,6 +121,7 @@ class location:
                     self.UTC_offset=lines[5].split('=')[1].replace('\n','').strip()
                     self.altitude=float(lines[6].split('=')[1].replace('\n','').strip())
                     self.file_classifier=lines[7].split('=')[1].replace('\n','').strip()
+                    self.read_settings(lines[8:])
             except FileNotFoundError:
                 print(f"Error: The file '{file_name}' was not found.")
             except Exception as e:
@@ -179,6 +237,7 @@ class location:
                     self.historical_capacity=float(lines[8].split('=')[1].replace('\n','').strip())/1000
                     self.ground_floor_res=float(lines[10].split('=')[1].replace('\n','').strip())
                     self.ground_floor_com=float(lines[11].split('=')[1].replace('\n','').strip())
+                    self.read_settings(lines[12:])
             except FileNotFoundError:
                 print(f"Error: The file '{file_name}' was not found.")
             except Exception as e:
@@ -256,7 +315,7 @@ class location:
                     self.daily_insolation=float(lines[9].split('=')[1].replace('\n','').strip())
                     self.historical_capacity=float(lines[8].split('=')[1].replace('\n','').strip())/1000
                     self.division_res_bldgs=float(lines[10].split('=')[1].replace('\n','').strip())
-
+                    self.read_settings(lines[11:])
             except FileNotFoundError:
                 print(f"Error: The file '{file_name}' was not found.")
             except Exception as e:
@@ -288,10 +347,42 @@ class location:
             self.timezone ="Etc/GMT"
         self.construct_files=Lidar.DSM_files()
 
-    def run_lidar(self,resolution: float|int=1,onefile:bool=False,file=None,out=None)->None:
+    def read_settings(self,lines:list[str])->None:
+        """
+        Reads the optional settings of the region from the lines of the batch input file that follow
+        its inputs, one setting per line by name (ex. memory_budget= 4). The settings that are not
+        listed keep their default value.
+
+        Parameters
+        ----------
+        lines: list[str]
+            lines of the batch input file after the inputs of the region
+        """
+        for line in lines:
+            if line.strip()=='':
+                continue
+            name,value=[text.strip() for text in line.split('=',1)]
+            if name not in self.settings:
+                raise Exception("Not a valid setting: "+name+". Options include: "+', '.join(self.settings))
+            setattr(self,name,self.settings[name](value))
+
+    def check_settings(self)->None:
+        """
+        Checks the settings of the region before the analysis starts.
+        """
+        if self.shading_backend not in ['whitebox','numpy']:
+            raise Exception("Not a valid shading_backend: "+str(self.shading_backend)+". Options include: whitebox or numpy")
+        if self.shading_tile_size>0 and self.shading_backend!='numpy':
+            raise Exception("shading_tile_size is only available with the numpy shading backend. Add shading_backend= numpy or remove shading_tile_size")
+        if self.virtual_mosaic and self.shading_backend!='numpy':
+            raise Exception("The WhiteboxTools shading backend cannot read the virtual mosaic (.vrt). Add shading_backend= numpy or remove virtual_mosaic "
+                            "(region_data.export_mosaic copies an existing virtual mosaic to a .tif file)")
+
+    def run_lidar(self,resolution: float|int=1,onefile:bool=False,file=None,out=None)->int:
         """
         Function used to create the digital surface models (DSM) files from las files
-        either from only one file or all files within a folder.
+        either from only one file or all files within a folder. For a folder, only the
+        DSM files that are missing or out of date are created (see DSM_files.DSM_tiles).
 
         Parameters
         ----------
@@ -302,13 +393,19 @@ class location:
         file: string
             file location for the output DSM files. File location is required if onefile is True or if the
             required folder is not the same as definied for the location.
+
+        Returns
+        -------
+        int
+            number of DSM files created
         """
         
         if onefile:
             self.construct_files.DSM_one(file,resolution,out)
+            return 1
         else:
             file = self.lidar
-            self.construct_files.DSM(file,resolution)
+            return self.construct_files.DSM_tiles(file,resolution,self.lidar_workers,self.lidar_tiles())
             
     def run_seg(self,onefile:bool=False,input_file:bool=False)->None:
             """
@@ -331,16 +428,127 @@ class location:
                 Segmentation.one_tile(input_file,bldg_footprint,shapefile)
             else:
                 directory= self.lidar
+                tiles=self.lidar_tiles()
+                if tiles is not None:
+                    directory=Segmentation.tile_folder(directory,tiles)
                 Segmentation.all_tiles(directory,bldg_footprint,shapefile)
+                self.save_selection(shapefile)
 
     def run_mosaic(self)->None:
         """
         Combines all raster files (.tif) into one file, creating a "mosaic" file of the different tiles.
+        With virtual_mosaic, the mosaic is a virtual mosaic (.vrt) that references the DSM files.
         """
         directory= self.lidar
-        output_file=self.mosaic
-        self.construct_files.mosaic(directory,output_file)
+        output_file=self.mosaic_file()
+        tiles=self.lidar_tiles()
+        inputs=None if tiles is None else [path.splitext(tile)[0]+'.tif' for tile in tiles]
+        if self.virtual_mosaic:
+            self.mosaic=output_file
+            self.construct_files.virtual_mosaic(directory,output_file,inputs)
+        else:
+            self.construct_files.mosaic(directory,output_file,inputs)
+        self.save_selection(output_file)
+
+    def mosaic_file(self)->str:
+        """
+        Returns
+        -------
+        str
+            mosaic used by the analysis: the mosaic with the extension .vrt with virtual_mosaic,
+            the mosaic otherwise
+        """
+        if self.virtual_mosaic:
+            return path.splitext(self.mosaic)[0]+'.vrt'
+        return self.mosaic
+
+    def export_mosaic(self,output_file:str)->None:
+        """
+        Copies the virtual mosaic to one .tif file (ex. mosaic_<file_classifier>.tif).
+
+        Parameters
+        ----------
+        output_file: str
+            the location of the mosaic file output with file extension .tif
+        """
+        self.construct_files.export_mosaic(self.mosaic_file(),output_file)
     
+    def lidar_tiles(self)->list[str]|None:
+        """
+        Lidar files used for the DSM, mosaic and segmentation: the files that intersect the
+        building footprints (if building_tiles_only) and the region of interest, found with
+        the bounds in the header of each lidar file. The selection is only done once.
+
+        Returns
+        -------
+        list[str] or None
+            selected lidar files, None to use all the files of the folder
+        """
+        if not(self.building_tiles_only) and self.region_of_interest is None:
+            return None
+        if self.selected_tiles is None:
+            index=tile_index(self.lidar,self.lidar_workers)
+            self.selected_tiles=index.select(self.bldg_footprint if self.building_tiles_only else None,self.region_of_interest,self.tile_margin)
+        if len(self.selected_tiles)==0:
+            raise Exception("No lidar file of "+self.lidar+" intersects the building footprints (building_tiles_only) and the region of interest. "
+                            "Check that they are in the coordinate system of the lidar files")
+        return self.selected_tiles
+
+    def selection_file(self,output_file:str)->str:
+        """
+        Parameters
+        ----------
+        output_file: str
+            mosaic or segmentation shapefile
+
+        Returns
+        -------
+        str
+            file where the lidar files used to create the output are saved (ex. mosaic_<file_classifier>_tiles.json)
+        """
+        return path.splitext(output_file)[0]+'_tiles.json'
+
+    def save_selection(self,output_file:str)->None:
+        """
+        Saves the names of the lidar files used to create the mosaic or the segmentation (None
+        for all the files of the folder) next to it.
+
+        Parameters
+        ----------
+        output_file: str
+            mosaic or segmentation shapefile
+        """
+        tiles=self.lidar_tiles()
+        with open(self.selection_file(output_file),'w') as file:
+            json.dump({'tiles':None if tiles is None else [path.basename(tile) for tile in tiles]},file,indent=1)
+
+    def selection_changed(self,output_file:str)->bool:
+        """
+        Checks whether the mosaic or the segmentation was created from other lidar files than
+        the current selection (ex. after changing building_tiles_only or region_of_interest).
+        An output without a saved selection was created from all the files of the folder.
+
+        Parameters
+        ----------
+        output_file: str
+            mosaic or segmentation shapefile
+
+        Returns
+        -------
+        bool
+            True if the output must be created again
+        """
+        tiles=self.lidar_tiles()
+        tiles=None if tiles is None else [path.basename(tile) for tile in tiles]
+        saved=None
+        if path.isfile(self.selection_file(output_file)):
+            try:
+                with open(self.selection_file(output_file),'r') as file:
+                    saved=json.load(file)['tiles']
+            except (ValueError,KeyError):
+                return True
+        return saved!=tiles
+
     def run_lidar_thin(self,resolution_thin:float|int=1/5)->None:
         """
         Reduce the resolution of the lidar files (.las) within a grid pattern.
@@ -410,4 +618,26 @@ class location:
         """
         self.elec_res=electricity*self.division_res_bldgs
         self.elec_com=electricity*(1-self.division_res_bldgs)
-        
\ No newline at end of file
+        
+    def load_coefficients(self,file:str,thresholds:list=[0,0.1,0.2,0.3,0.4,0.5,0.6,0.7,0.8,0.9])->None:
+        """
+        This function sets the shaded capacity and electricity coefficients from the table of
+        coefficients (Coefs_<file_classifier>.csv) written by the detailed analysis of a region.
+        The coefficient of each threshold is the one of the largest threshold of the table at or
+        below it, so a table of any number of thresholds can be used.
+
+        Parameters
+        ----------
+        file: str
+            coefficient table with the columns Threshold, Capacity Coefficient - Shaded and
+            Electricity Coefficient - Shaded
+        thresholds: list
+            thresholds of the coefficients (fraction of the maximum annual POA)
+        
+        """
+        table=read_csv(file).sort_values('Threshold')
+        rows=searchsorted(table['Threshold'].values,array(thresholds)+1e-9,side='right')-1
+        if (rows<0).any():
+            raise Exception("The coefficient table does not include the threshold "+str(min(thresholds)))
+        self.cap_coefficient_shade=table['Capacity Coefficient - Shaded'].values[rows].tolist()
+        self.elec_coefficient_shade=table['Electricity Coefficient - Shaded'].values[rows].tolist()
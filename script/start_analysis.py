@@ -3,18 +3,17 @@ import calculate_deployed_capacity
 import TimeInDaylight
 import region_data
 import calculate_technical_potential
-from tools import file_handle
+from tools import chunk_store
 import os
 import hosting_capacity_variables
 import scenarios 
-import glob
 from tools import spatial_toolset
 from writing_output import print_results, write_output_file
 
 def calculate_one_region_grid(region:str,file_location:str,resolution:int|float,hosting_capacity:hosting_capacity_variables,
                                 mode:str,p_range:list[float],q_range:list[float],hourly_demand:str,annual_demand:str,starting_year:int,
                                 ending_year:int,scaling_option:bool,shading_granularity:str='hourly',
-                                cap_coefficient_shade:list=[],elec_coefficient_shade:list=[])->None:
+                                cap_coefficient_shade:list=[],elec_coefficient_shade:list=[],shading_workers:int=1,lidar_workers:int=1)->None:
     """
     Setups and runs the detailed (Grid) analysis on an hourly basis.
 
@@ -42,16 +41,20 @@ def calculate_one_region_grid(region:str,file_location:str,resolution:int|float,
         option whether to scale the technical potential for the rest of the analysis or use them outputs as is. True to use coefficients to scale the output.
     cap_coefficient_shade,elec_coefficient_shade : list
         list of the input coefficients for the capacity and energy, including the shading.
+    shading_workers : int
+        number of processes used to calculate the shading
+    lidar_workers : int
+        number of processes used to create the DSM files of the lidar files
     """
-    region_variables = region_data.location(region,mode,scaling_option,cap_coefficient_shade,elec_coefficient_shade)
+    region_variables = region_data.location(region,mode,scaling_option,cap_coefficient_shade,elec_coefficient_shade,lidar_workers=lidar_workers)
     #output/input file locations
     #user can change to the desired location of the outputs/inputs below, if needed
     region_variables.mosaic=file_location+r'\mosaic_'+region_variables.file_classifier+'.tif' #file name location of the output mosaic file
     region_variables.raster_file=file_location+'\\'+region_variables.file_classifier+'_rooftop_Raster.tif' #file name location of the output rasterized shapefile
     region_variables.shapefile=file_location+'\\'+region_variables.file_classifier+'_rooftop.shp' #file name location of the output shapefile from the segmentation
     
-    calculate_deployed_capacity.check_calculate_technical_files(file_location,region_variables)
-    analysis=calculate_deployed_capacity.SensitivityAnalysis(region_variables)
+    calculate_deployed_capacity.check_calculate_technical_files(region_variables,resolution)
+    analysis=calculate_deployed_capacity.SensitivityAnalysis(region_variables,shading_workers)
     bldg_scenarios,cost_scenarios,elec_cost_scenarios,pv_eff,pv_pr,market_share_scenarios=set_up_scenarios()
     time=list(range(0,len(bldg_scenarios[0][0])))
     time=np.array(time, dtype='float32')
@@ -63,7 +66,7 @@ def calculate_one_region_grid(region:str,file_location:str,resolution:int|float,
 def calculate_all_regions_grid(file_location:str,resolution:int|float,mode:str,p_range:list[float],q_range:list[float],regions:list[str],
                                  hosting_capacity:hosting_capacity_variables,hourly_demand:list[str],annual_demand:list[str],starting_year:int,
                                  ending_year:int,scaling_option:bool,shading_granularity:str='hourly'
-                                 ,cap_coefficient_shade:list=[],elec_coefficient_shade:list=[])->None:
+                                 ,cap_coefficient_shade:list=[],elec_coefficient_shade:list=[],shading_workers:int=1,lidar_workers:int=1)->None:
     """
     Setups and runs the provincial run with hosting capacity. This method will runs all regions and territories in Canada.
 
@@ -93,12 +96,16 @@ def calculate_all_regions_grid(file_location:str,resolution:int|float,mode:str,p
         option whether to scale the technical potential for the rest of the analysis or use them outputs as is. True to use coefficients to scale the output.
     cap_coefficient_shade,elec_coefficient_shade : list
         list of the input coefficients for the capacity and energy, including the shading.
+    shading_workers : int
+        number of processes used to calculate the shading
+    lidar_workers : int
+        number of processes used to create the DSM files of the lidar files
     """
 
     bldg_scenarios,cost_scenarios,elec_cost_scenarios,pv_eff,pv_pr,market_share_scenarios=set_up_scenarios()
     time=list(range(0,len(bldg_scenarios[0][0])))
     time=np.array(time, dtype='float32')
-    analysis=calculate_deployed_capacity.SensitivityAnalysis()
+    analysis=calculate_deployed_capacity.SensitivityAnalysis(shading_workers=shading_workers,lidar_workers=lidar_workers)
     analysis.sensitivity_analysis_all_regions(p_range,q_range,cost_scenarios,elec_cost_scenarios,pv_eff,market_share_scenarios,
                                                 pv_pr,bldg_scenarios,file_location,starting_year,ending_year,time,mode,regions,annual_demand,
                                                 cap_coefficient_shade,elec_coefficient_shade,hourly_demand,shading_granularity,
@@ -164,9 +171,10 @@ def market_all(file_location:str,starting_year:int,p_range:list[float],q_range:l
                                                 pv_pr,bldg_scenarios,file_location,starting_year,ending_year,time,mode,regions,
                                                 annual_demand,cap_coefficient_shade,elec_coefficient_shade)
 
-def hourly_region(file_location:str,region: region_data,PR:float,eff:float,mode:str)->list[float]:
+def hourly_region(file_location:str,region: region_data,PR:float,eff:float,mode:str,shading_workers:int=1)->list[float]:
     """
     Setups and runs the detailed (Technical) analysis on an hourly basis.
+    The shading is resumed from the completed hours of an interrupted run if they were saved.
 
     Parameters
     ----------
@@ -180,24 +188,28 @@ def hourly_region(file_location:str,region: region_data,PR:float,eff:float,mode:
         module electrical effciency of the PV system
     mode : str
         'Technical', 'Market', or 'grid' mode. The input for this function should be 'Technical'
+    shading_workers : int
+        number of processes used to calculate the shading
     
     Returns
     ----------
     data : list
         list of the results
     """
-    file_save=file_handle()
-    saved_file=file_location+r'\TimeInDaylight_hourly_' + region.file_classifier+'.ftr'
+    shading=TimeInDaylight.TID(region,file_location,mode,region.shading_backend)
+    #the saved results are identified by the mosaic, segments, location and hours, so they are shared by other weather files and regions with the same inputs
+    saved_file=shading.saved_results()
     #run shading if the saved_file has not been created yet. If it existes use the file to run the rst of the calculations
-    if not(os.path.isfile(saved_file)):
-        shading=TimeInDaylight.TID(region,file_location)
+    #(results in the previous .ftr format are only used if converted explicitly with TID.convert_legacy)
+    if not(saved_file.exists()):
         print("Starting shading")
-        TID=shading.hourly()
-        file_save.write_file(TID,saved_file)
-        TID.set_index('index',inplace=True)
+        #completed hours are saved in store so an interrupted run resumes where it stopped
+        store=chunk_store(os.path.splitext(saved_file.file)[0]+'_chunks')
+        TID=shading.hourly(shading_workers,store.directory)
+        saved_file.write(TID)
+        store.clear()
         print("Shading completed\n")
-    else:
-        TID=file_save.extract_data(saved_file)
+    TID=saved_file.read()
     
     technical_potential=calculate_technical_potential.calculate_technical_potential_hourly(TID,region,PR,eff,mode)
     data=technical_potential.hourly_region(file_location)
@@ -224,13 +236,13 @@ def annual_analysis(region: region_data,file_location: str,performance_ratio,mod
     data : list
         list of the results
     """
-    shading=TimeInDaylight.TID(region,file_location)
+    shading=TimeInDaylight.TID(region,file_location,'Technical',region.shading_backend)
     TID=shading.annual()
     technical_potential=calculate_technical_potential.calculate_technical_potential_annual(TID,region,performance_ratio,module_efficiency)
     data=technical_potential.annual()
     return data
 
-def rep_analysis(rep_days: int,region: region_data,file_location: list,performance_ratio,module_efficiency)->list[float]:
+def rep_analysis(rep_days: int,region: region_data,file_location: list,performance_ratio,module_efficiency,shading_workers:int=1)->list[float]:
     """
     Set ups and runs the detailed (Technical) analysis for either 12 or 4 representative days during the year. 12 days will use one day per month. 4 days will use the equinox days.
     
@@ -246,29 +258,24 @@ def rep_analysis(rep_days: int,region: region_data,file_location: list,performan
         inputted performance ratio for the module
     module_efficiency:float
         inputted module efficiency
+    shading_workers : int
+        number of processes used to calculate the shading
 
     Returns
     ----------
     data : list
         list of the results
     """
-    file_save=file_handle()
-    if rep_days==12:
-        saved_file=file_location+r'\TimeInDaylight_rep_12_' + region.file_classifier+'.ftr'
-    else:
-        saved_file=file_location+r'\TimeInDaylight_rep_4_' + region.file_classifier+'.ftr'
-        
-    if not(os.path.isfile(saved_file)):
-        shading=TimeInDaylight.TID(region,file_location)
+    shading=TimeInDaylight.TID(region,file_location,'Technical',region.shading_backend)
+    saved_file=shading.saved_results(rep_days)
+    if not(saved_file.exists()):
         print("Starting shading")
-        TID=shading.representative(rep_days)
-        file_save.write_file(TID,saved_file)
-        TID.set_index('index',inplace=True)
+        TID=shading.representative(rep_days,shading_workers)
+        saved_file.write(TID)
         print("Shading completed\n")
-    else:
-        TID=file_save.extract_data(saved_file)
-    technical_potential=calculate_technical_potential.calculate_technical_potential_rep(TID,region,performance_ratio,module_efficiency)
-    data=technical_potential.rep(rep_days)
+    TID=saved_file.read()
+    technical_potential=calculate_technical_potential.calculate_technical_potential_rep(TID,region,performance_ratio,module_efficiency,rep_days,'Technical')
+    data=technical_potential.rep()
     return data
 
 def set_up_scenarios()->list:
@@ -297,7 +304,7 @@ def set_up_scenarios()->list:
     return bldg_scenarios,cost_scenarios,elec_cost_scenarios,pv_eff,pv_pr,market_share_scenarios
 
 def run_detailed(file_location:str,mode:str,shading_granularity:str,resolution:int|float,region_name:list[str],performance_ratio:float,
-                 module_efficiency:float):
+                 module_efficiency:float,shading_workers:int=1,lidar_workers:int=1):
     """
     This function starts the analysis for the detailed, technical potential, option and outputs the results.
 
@@ -317,10 +324,14 @@ def run_detailed(file_location:str,mode:str,shading_granularity:str,resolution:i
         inputted performance ratio for the module
     module_efficiency:float
         inputted module efficiency
+    shading_workers : int
+        number of processes used to calculate the shading
+    lidar_workers : int
+        number of processes used to create the DSM files of the lidar files
     """
 
     for name in region_name:
-        region_variables = region_data.location(name,mode)
+        region_variables = region_data.location(name,mode,lidar_workers=lidar_workers)
         region_variables.mosaic=file_location+r'\mosaic_'+region_variables.file_classifier+'.tif' #file name location of the output mosaic file
         region_variables.raster_file=file_location+'\\'+region_variables.file_classifier+'_rooftop_Raster.tif' #file name location of the output rasterized shapefile
         region_variables.shapefile=file_location+'\\'+region_variables.file_classifier+'_rooftop.shp' #file name location of the output shapefile from the segmentation
@@ -332,9 +343,9 @@ def run_detailed(file_location:str,mode:str,shading_granularity:str,resolution:i
             
         elif shading_granularity=='representative':
             rep_days=12
-            data=rep_analysis(rep_days,region_variables,file_location,performance_ratio,module_efficiency)
+            data=rep_analysis(rep_days,region_variables,file_location,performance_ratio,module_efficiency,shading_workers)
         elif shading_granularity=='hourly':
-            data=hourly_region(file_location,region_variables,performance_ratio,module_efficiency,mode)
+            data=hourly_region(file_location,region_variables,performance_ratio,module_efficiency,mode,shading_workers)
 
         print_results(data,region_variables) 
         write_output_file(data,file_location,region_variables)
@@ -353,18 +364,27 @@ def check_calculate_technical_files(region_variables:region_data,resolution:floa
     """
 
     #If the files don't already exist for the DSM files (run_lidar), combining into a mosaic (run_mosaic), and creating the segmentation files (run_seg)
-    if len(glob.glob(region_variables.lidar+"/*.tif"))==0:
-        print("Creating DSM files...")
-        region_variables.run_lidar(resolution)
-        print("Created all DSM files\n")
-    if not(os.path.isfile(region_variables.mosaic)):
+    #with virtual_mosaic, the mosaic is a .vrt file that references the DSM files
+    region_variables.mosaic=region_variables.mosaic_file()
+    #only the DSM files that are missing or out of date are created, the mosaic is then created again
+    print("Checking DSM files...")
+    built=region_variables.run_lidar(resolution)
+    print("DSM files up to date\n")
+    #the mosaic and the segmentation are also created again when DSM files were created or when the selected lidar files changed (building_tiles_only, region_of_interest)
+    mosaic_built=built>0 or not(os.path.isfile(region_variables.mosaic)) or region_variables.selection_changed(region_variables.mosaic)
+    if mosaic_built:
         print("Starting mosaic...")
         region_variables.run_mosaic()
         print("Created mosaic\n")
-    if not(os.path.isfile(region_variables.shapefile)):
+    segmentation_built=built>0 or not(os.path.isfile(region_variables.shapefile)) or region_variables.selection_changed(region_variables.shapefile)
+    if segmentation_built:
         print("Starting segmentation...")
         region_variables.run_seg()
+        print("Finished segmentation\n")
+    #the rasterized segmentation is created again with the mosaic or the segmentation it is made from
+    if mosaic_built or segmentation_built or not(os.path.isfile(region_variables.raster_file)):
+        print("Rasterizing the segmentation...")
         spatial=spatial_toolset()
         spatial.rasterize_polygon(region_variables.mosaic,region_variables.shapefile,region_variables.raster_file,resolution)
-        print("Finished segmentation\n")                                
+        print("Rasterized the segmentation\n")                                
 
@@ -1,3 +1,19 @@
 from .file_handle import file_handle as file_handle
 from .lidar_functions import lidar_functions as lidar_functions
-from .spatial_toolset import spatial_toolset as spatial_toolset
\ No newline at end of file
+from .spatial_toolset import spatial_toolset as spatial_toolset
+from .shadow_engine import shadow_engine as shadow_engine
+from .zonal_index import zonal_index as zonal_index
+from .shading_cache import shading_cache as shading_cache
+from .chunk_store import chunk_store as chunk_store
+from .tid_store import tid_store as tid_store
+from .file_checksum import file_checksum as file_checksum
+from .poa_engine import poa_engine as poa_engine
+from .poa_table import poa_table as poa_table
+from .resource_bins import resource_bins as resource_bins
+from .coefficient_curve import coefficient_curve as coefficient_curve
+from .weather_context import weather_context as weather_context
+from .attribute_table import attribute_table as attribute_table
+from .segment_raster import segment_raster as segment_raster
+from .tile_manifest import tile_manifest as tile_manifest
+from .las_header import las_header as las_header
+from .tile_index import tile_index as tile_index
\ No newline at end of file
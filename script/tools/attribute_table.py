@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Attribute table of a vector file (ex. the segments or the building footprints) without the
+geometries. Reading a large shapefile with its geometries is slow, while the analysis only
+needs a few columns, so the columns are read once without the geometries and saved next to
+the file as a Parquet table (file_attributes_<key>.parquet). Later reads only load that table.
+"""
+import json
+from hashlib import sha256
+from pandas import DataFrame,read_parquet
+from geopandas import read_file
+from os import path,replace
+from .file_checksum import file_checksum
+
+class attribute_table:
+    def __init__(self,file:str,columns:list=None)->None:
+        """
+        Parameters
+        ----------
+        file : string
+            vector file (ex. .shp)
+        columns : list
+            columns of the attribute table that are kept, all the columns if None
+        """
+        self.file=file
+        self.columns=columns
+        #the attributes of a shapefile are in the .dbf file, the geometries can change without changing them
+        source=path.splitext(file)[0]+'.dbf'
+        if not(path.isfile(source)):
+            source=file
+        key=json.dumps([file_checksum(source).digest(),columns])
+        self.table_file=path.splitext(file)[0]+'_attributes_'+sha256(key.encode()).hexdigest()[:16]+'.parquet'
+
+    def read(self)->DataFrame:
+        """
+        Reads the attribute table from the saved table if it exists, from the vector file
+        otherwise (and saves it).
+
+        Returns
+        -------
+        DataFrame
+            attribute table with one row per feature, in the order of the vector file
+        """
+        if path.isfile(self.table_file):
+            return read_parquet(self.table_file)
+        print("Reading the attributes of ",self.file)
+        table=DataFrame(read_file(self.file,columns=self.columns,ignore_geometry=True))
+        if self.columns is not None:
+            table=table[self.columns]
+        try:
+            table.to_parquet(self.table_file+'.tmp',index=False)
+            #the table is only visible once it is complete
+            replace(self.table_file+'.tmp',self.table_file)
+        except OSError:
+            print("Could not save the attribute table ",self.table_file)
+        return table
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+On-disk store of the hourly shading results of a run. Each group of completed hours
+is saved in its own file and listed in a manifest, so that a run stopped part way can
+be resumed from the last completed hours instead of starting over.
+"""
+import json
+from numpy import concatenate,load,ndarray,save,zeros
+from os import makedirs,path,replace
+from shutil import rmtree
+
+class chunk_store:
+    def __init__(self,directory:str)->None:
+        """
+        Parameters
+        ----------
+        directory : string
+            folder of the store, created if it does not exist
+        """
+        self.directory=directory
+        self.manifest_file=path.join(directory,'manifest.json')
+        self.manifest={'metadata':{},'chunks':[]}
+
+    def open(self,metadata:dict)->list[int]:
+        """
+        Opens the store for a run. The completed hours are kept if the store was made with
+        the same metadata (inputs of the run), otherwise the store is emptied.
+
+        Parameters
+        ----------
+        metadata : dict
+            description of the inputs of the run (must be JSON serializable)
+
+        Returns
+        -------
+        list[int]
+            hours already completed
+        """
+        if path.isfile(self.manifest_file):
+            with open(self.manifest_file,'r') as file:
+                self.manifest=json.load(file)
+            if self.manifest['metadata']!=json.loads(json.dumps(metadata)):
+                print("Inputs changed since the shading results in ",self.directory," were saved, starting over")
+                self.clear()
+        if not(path.isfile(self.manifest_file)):
+            makedirs(self.directory,exist_ok=True)
+            self.manifest={'metadata':metadata,'chunks':[]}
+            self.write_manifest()
+        return [hour for chunk in self.manifest['chunks'] for hour in chunk['hours']]
+
+    def append(self,hours:list[int],values:ndarray)->None:
+        """
+        Saves a group of completed hours. The manifest is only updated once the values are
+        written so that an interrupted write is ignored when resuming.
+
+        Parameters
+        ----------
+        hours : list[int]
+            position of the hours in the weather dataframe
+        values : ndarray
+            results with one row per hour
+        """
+        filename='chunk_'+str(len(self.manifest['chunks'])).zfill(5)+'.npy'
+        save(path.join(self.directory,filename),values.astype('float32'))
+        self.manifest['chunks'].append({'file':filename,'hours':[int(hour) for hour in hours]})
+        self.write_manifest()
+
+    def read(self)->tuple[list[int],ndarray]:
+        """
+        Reads all the completed hours.
+
+        Returns
+        -------
+        tuple[list[int],ndarray]
+            position of the hours in the weather dataframe and results with one row per hour
+        """
+        hours=[hour for chunk in self.manifest['chunks'] for hour in chunk['hours']]
+        if len(hours)==0:
+            return hours,zeros((0,0),dtype='float32')
+        return hours,concatenate([load(path.join(self.directory,chunk['file'])) for chunk in self.manifest['chunks']])
+
+    def write_manifest(self)->None:
+        """
+        Writes the manifest (replaced in one step so it is never left half written).
+        """
+        with open(self.manifest_file+'.tmp','w') as file:
+            json.dump(self.manifest,file)
+        replace(self.manifest_file+'.tmp',self.manifest_file)
+
+    def clear(self)->None:
+        """
+        Deletes the store.
+        """
+        rmtree(self.directory,ignore_errors=True)
+        self.manifest={'metadata':{},'chunks':[]}
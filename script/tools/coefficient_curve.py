@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Sums over the rooftop segments above a solar resource threshold, for any number of
+thresholds. The segments are sorted once by solar resource and the sums above every
+threshold are read from cumulative sums, so a curve of 1000 thresholds costs about the
+same as a curve of 10.
+"""
+from numpy import arange,asarray,concatenate,cumsum,flatnonzero,ndarray,searchsorted,zeros
+
+class coefficient_curve:
+    def __init__(self,resource:ndarray,maximum:float)->None:
+        """
+        Parameters
+        ----------
+        resource : ndarray
+            solar resource of each segment (ex. annual shaded POA)
+        maximum : float
+            resource of a threshold of 1 (ex. maximum annual unshaded POA)
+        """
+        resource=asarray(resource,dtype='float64')
+        #segments sorted by resource, segments without a resource (nan) are never above a threshold
+        self.segments=flatnonzero(resource==resource)
+        self.segments=self.segments[resource[self.segments].argsort(kind='stable')]
+        self.resource=resource[self.segments]
+        self.maximum=maximum
+
+    @staticmethod
+    def thresholds(num_thresholds:int=10)->ndarray:
+        """
+        Thresholds of equal steps between 0 and 1 (ex. 0, 0.1, ..., 0.9 for 10 thresholds).
+
+        Parameters
+        ----------
+        num_thresholds : int
+            number of thresholds
+
+        Returns
+        -------
+        ndarray
+            thresholds as a fraction of the maximum
+        """
+        return arange(num_thresholds)/num_thresholds
+
+    def above(self,values:ndarray,thresholds:ndarray)->ndarray:
+        """
+        Sum of a value over the segments with a resource at or above each threshold.
+
+        Parameters
+        ----------
+        values : ndarray
+            value of each segment (ex. PV suitable area)
+        thresholds : ndarray
+            thresholds as a fraction of the maximum
+
+        Returns
+        -------
+        ndarray
+            sum for each threshold
+        """
+        values=asarray(values,dtype='float64')[self.segments]
+        #sum of the segments from the position of the first segment at or above the threshold to the end
+        remaining=concatenate([cumsum(values[::-1])[::-1],zeros(1)])
+        return remaining[searchsorted(self.resource,self.maximum*asarray(thresholds),side='left')]
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Checksum (SHA-256) of the content of an input file such as the mosaic. Hashing a large
+mosaic takes a while, so the checksum is saved next to the file (<file>.sha256.json)
+with its size and modification time and only recalculated when the file changes.
+"""
+import json
+from hashlib import sha256
+from os import path,replace,stat
+
+class file_checksum:
+    def __init__(self,file:str,block_size:int=2**24)->None:
+        """
+        Parameters
+        ----------
+        file : string
+            file to hash
+        block_size : int
+            number of bytes read at once
+        """
+        self.file=file
+        self.block_size=block_size
+        self.checksum_file=file+'.sha256.json'
+
+    def digest(self)->str:
+        """
+        Checksum of the file, read from the saved checksum if the file did not change.
+
+        Returns
+        -------
+        string
+            SHA-256 of the content of the file (hexadecimal)
+        """
+        status=stat(self.file)
+        signature={'size':status.st_size,'modified':status.st_mtime_ns}
+        if path.isfile(self.checksum_file):
+            try:
+                with open(self.checksum_file,'r') as file:
+                    saved=json.load(file)
+                if saved['size']==signature['size'] and saved['modified']==signature['modified']:
+                    return saved['sha256']
+            except (ValueError,KeyError):
+                pass
+        print("Calculating the checksum of ",self.file)
+        digest=sha256()
+        with open(self.file,'rb') as file:
+            for block in iter(lambda:file.read(self.block_size),b''):
+                digest.update(block)
+        signature['sha256']=digest.hexdigest()
+        #the checksum cannot be saved next to a read-only file, it is then calculated every time
+        try:
+            with open(self.checksum_file+'.tmp','w') as file:
+                json.dump(signature,file)
+            replace(self.checksum_file+'.tmp',self.checksum_file)
+        except OSError:
+            pass
+        return signature['sha256']
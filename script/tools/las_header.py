@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Reader of the public header of a LAS or LAZ (LiDAR) file. The bounds, the number of points,
+the point format and the coordinate reference system are read straight from the first bytes
+of the file and its variable length records (VLR), without reading the points, so thousands
+of files can be surveyed in seconds. The header of a LAZ file is the same as a LAS file.
+"""
+import struct
+from os import path
+
+class las_header:
+    #record ids of the coordinate reference system in the VLRs (LASF_Projection)
+    geokeys_record=34735
+    wkt_record=2112
+
+    def __init__(self,file:str)->None:
+        """
+        Parameters
+        ----------
+        file : string
+            LAS or LAZ file
+        """
+        self.file=file
+        with open(file,'rb') as las:
+            header=las.read(375)
+            if len(header)<227 or header[:4]!=b'LASF':
+                raise Exception("Not a valid LAS file: "+file)
+            self.version=str(header[24])+'.'+str(header[25])
+            header_size,point_offset,num_vlrs=struct.unpack_from('<HII',header,94)
+            #the two highest bits of the point format are set in LAZ files
+            self.point_format=header[104]&0x3F
+            self.compressed=header[104]>=128 or path.splitext(file)[1].lower()=='.laz'
+            self.point_length,self.num_points=struct.unpack_from('<HI',header,105)
+            #LAS 1.4 files have a 64 bit number of points (the 32 bit number is 0 above 2^32 points)
+            if header[25]>=4 and len(header)>=255:
+                self.num_points=max(self.num_points,struct.unpack_from('<Q',header,247)[0])
+            self.scale=struct.unpack_from('<3d',header,131)
+            self.offset=struct.unpack_from('<3d',header,155)
+            max_x,min_x,max_y,min_y,max_z,min_z=struct.unpack_from('<6d',header,179)
+            self.bounds=(min_x,min_y,max_x,max_y)
+            self.elevation=(min_z,max_z)
+            las.seek(header_size)
+            self.epsg,self.wkt=self.read_crs(las,num_vlrs,point_offset)
+
+    def read_crs(self,las,num_vlrs:int,point_offset:int)->tuple:
+        """
+        Reads the coordinate reference system from the VLRs: the EPSG code of the GeoTIFF keys
+        (point formats 0 to 5) or the WKT (point formats 6 to 10).
+
+        Parameters
+        ----------
+        las : file
+            LAS file opened at the first VLR
+        num_vlrs : int
+            number of VLRs
+        point_offset : int
+            position of the first point, the VLRs are before it
+
+        Returns
+        -------
+        tuple
+            (EPSG code or None, WKT or None)
+        """
+        epsg,wkt=None,None
+        for i in range(num_vlrs):
+            if las.tell()+54>point_offset:
+                break
+            record=las.read(54)
+            if len(record)<54:
+                break
+            user=record[2:18].split(b'\0')[0]
+            record_id,length=struct.unpack_from('<HH',record,18)
+            data=las.read(length)
+            if user!=b'LASF_Projection':
+                continue
+            if record_id==self.wkt_record:
+                wkt=data.split(b'\0')[0].decode('utf-8','replace')
+            elif record_id==self.geokeys_record and len(data)>=8:
+                num_keys=struct.unpack_from('<H',data,6)[0]
+                for key in range(min(num_keys,len(data)//8-1)):
+                    key_id,location,count,value=struct.unpack_from('<4H',data,8+8*key)
+                    #projected (3072) or geographic (2048) coordinate system stored in the key itself
+                    if location==0 and (key_id==3072 or (key_id==2048 and epsg is None)):
+                        epsg=value
+        if epsg is None and wkt is not None:
+            #the last authority of a WKT is the one of the whole coordinate system
+            authority=wkt.rfind('AUTHORITY["EPSG","')
+            if authority>=0:
+                code=wkt[authority+18:].split('"')[0]
+                epsg=int(code) if code.isdigit() else None
+        return epsg,wkt
+
+    def density(self)->float:
+        """
+        Returns
+        -------
+        float
+            average number of points per square unit of the bounds (ex. points/m2), 0 if the
+            bounds have no area
+        """
+        area=(self.bounds[2]-self.bounds[0])*(self.bounds[3]-self.bounds[1])
+        return self.num_points/area if area>0 else 0.0
+
+    @classmethod
+    def summary(cls,file:str)->dict:
+        """
+        Summary of the header of a file, used to survey a folder in parallel.
+
+        Parameters
+        ----------
+        file : string
+            LAS or LAZ file
+
+        Returns
+        -------
+        dict
+            file name, version, point format, number of points, bounds, EPSG code and density
+        """
+        header=cls(file)
+        return {'file':path.basename(file),'version':header.version,'point_format':header.point_format,
+                'compressed':header.compressed,'num_points':header.num_points,
+                'min_x':header.bounds[0],'min_y':header.bounds[1],'max_x':header.bounds[2],'max_y':header.bounds[3],
+                'min_z':header.elevation[0],'max_z':header.elevation[1],'epsg':header.epsg,
+                'density':header.density()}
@@ -8,12 +8,13 @@ This code is derived from the Whitebox Tools examples page here: https://www.whi
 for functions total_num_files, find_laz_files, laz2las and parallelize_zip
 """
 
-import os, subprocess
+import os, subprocess, time
 import multiprocessing as mp 
 from pandas import DataFrame
 from bs4 import BeautifulSoup as bs
 import glob
 from WBT.whitebox_tools import WhiteboxTools
+from .las_header import las_header
 wbt = WhiteboxTools()
 wbt.set_verbose_mode(False)
 
@@ -72,6 +73,7 @@ class lidar_functions:
 
         """
         files = os.listdir(input_dir)
+        processed_files = set(processed_files)
         file_names = []
         for f in files:
             if f.endswith(".laz") and f not in processed_files: # Only select file names that end with .laz and have not already been selected
@@ -103,41 +105,51 @@ class lidar_functions:
         Tile_name = os.path.join(input_dir, in_files_list) # Creates the full path name  of the .laz tile of interest
         LAZ_tile_name = in_files_list
         output_las_file = out_dir + '/'+ LAZ_tile_name.replace(".laz", ".las") # Creates the output file ending with .las
+        temp_las_file = output_las_file.replace(".las", "_temp.las") # The output only appears once complete, an interrupted conversion is done again
         print("Processing LAZ to LAS for {}".format(LAZ_tile_name))
-        args = [laszip_exe, Tile_name, "-o", output_las_file] # Execute laszip tool
+        args = [laszip_exe, Tile_name, "-o", temp_las_file] # Execute laszip tool
         proc = subprocess.Popen(args, shell=False)
         proc.communicate() # Wait for las zip to finish executing
+        if proc.returncode != 0 or not(os.path.isfile(temp_las_file)):
+            raise Exception("laszip could not convert "+Tile_name)
+        os.replace(temp_las_file, output_las_file)
         return output_las_file
 
-    def laz2las(self)->None:
+    def laz2las(self,workers:int=None)->None:
         """
-        Function to convert laz files to las files in a specified directory
+        Function to convert laz files to las files in a specified directory.
+        The directory is listed once and the files are sent one at a time to a pool of processes,
+        so a slow file never holds back the others. Files with a las file more recent than the
+        laz file are skipped, so an interrupted conversion resumes.
+
+        Parameters
+        ----------
+        workers : int
+            number of files converted at once, the number of cores of the CPU if None
 
         """
         input_LAZ_dir = self.directory+self.city+ "/LAZ files"  
-        num_batch_file = 8 # Number of laz files to be used at a time: change this to how many files you want per batch (make sure it is less than or equal to the total number of .las files to be converted) 
-        pool = mp.Pool(mp.cpu_count()) # Multi-threaded command, counts number of cores user's CPU has
-
-        processed_files = [] 
-        
-        total_files = self.total_num_files(input_LAZ_dir) # Gets the total number of files 
-        flag = True # flag argument, this block of code will execute as long as true
-        while flag:
-            laz_file_names = self.find_laz_files(input_LAZ_dir, processed_files, num_batch_file) # Call function to get laz files
-            if len(laz_file_names) >= 1: # Has to be zero or less than/equal to 1 in order to account for when only 1 file left 
-                in_list = ""
-                for i in range(len(laz_file_names)): # Go through files in directory to be used as the input files
-                    if i < len(laz_file_names)-1:
-                        in_list += f"{laz_file_names[i]};"
-                    else:
-                        in_list += f"{laz_file_names[i]}"
-                    processed_files.append(laz_file_names[i])
-
-                pool.map(self.parallelize_zip, laz_file_names) # Calls the parallelizing function on .LAZ to convert to .LAS
-                print("Number of completed files {} of {}\n".format(len(processed_files), len(total_files)))
-            
+        out_dir = self.directory+self.city+ "/LAS files" 
+        laz_file_names = []
+        skipped = 0
+        for entry in os.scandir(input_LAZ_dir): # Only select file names that end with .laz
+            if not(entry.is_file()) or not(entry.name.endswith(".laz")):
+                continue
+            output_las_file = out_dir + '/'+ entry.name.replace(".laz", ".las")
+            if os.path.isfile(output_las_file) and os.path.getmtime(output_las_file) >= entry.stat().st_mtime:
+                skipped += 1
             else:
-                flag = False
+                laz_file_names.append(entry.name)
+        print("{} LAZ files to convert, {} already converted".format(len(laz_file_names), skipped))
+        if len(laz_file_names) == 0:
+            return
+        start = time.time()
+        size = 0
+        with mp.Pool(mp.cpu_count() if workers is None else workers) as pool: # Multi-threaded command, counts number of cores user's CPU has
+            for completed, output_las_file in enumerate(pool.imap_unordered(self.parallelize_zip, laz_file_names), 1): # Calls the parallelizing function on .LAZ to convert to .LAS
+                size += os.path.getsize(output_las_file)
+                elapsed = time.time()-start
+                print("Number of completed files {} of {} ({:.2f} files/s, {:.1f} MB/s of LAS)\n".format(completed, len(laz_file_names), completed/elapsed, size/2**20/elapsed))
 
     def fix_las_QGIS(self,filename:str)->None:
         """
@@ -200,6 +212,41 @@ class lidar_functions:
         html_location=self.directory+self.city+'/*.html'
         self.extract(html_location,output_density)
     
+    def header_survey(self,output_location:str,workers:int=None)->DataFrame:
+        """
+        This function reads the header of each LAS and LAZ file in parallel (las_header.py)
+        and summarizes the bounds, number of points, point format, coordinate reference
+        system (EPSG code) and point cloud density of each file in one table. Only the
+        headers are read, so it is much faster than run_lidar_info.
+
+        Parameters
+        ----------
+        output_location : string
+            output file (.parquet, or .xlsx/.csv)
+        workers : int
+            number of files read at once, the number of cores of the CPU if None
+
+        Returns
+        -------
+        DataFrame
+            summary with one row per file
+        """
+        input_dir = self.directory+self.city+ '/LAS files'
+        files = sorted(entry.path for entry in os.scandir(input_dir) if entry.is_file() and entry.name.lower().endswith(('.las','.laz')))
+        start = time.time()
+        with mp.Pool(mp.cpu_count() if workers is None else workers) as pool:
+            summary = DataFrame(pool.map(las_header.summary, files, chunksize=64), columns=['file','version','point_format','compressed','num_points',
+                'min_x','min_y','max_x','max_y','min_z','max_z','epsg','density'])
+        summary['epsg'] = summary['epsg'].astype('Int64')
+        print("Read the header of {} files in {:.1f} s".format(len(files), time.time()-start))
+        if output_location.endswith('.parquet'):
+            summary.to_parquet(output_location, index=False)
+        elif output_location.endswith('.csv'):
+            summary.to_csv(output_location, index=False)
+        else:
+            summary.to_excel(output_location, header=True, index=None)
+        return summary
+
     def extract(self,html_location:str,output_location:str)->None:
         """
         This function exctract data from htmls, specifically it extracts 
@@ -237,7 +284,7 @@ if __name__=="__main__":
     city='Calgary'
     directories='C:/Users/username/'
     laszip_location=r"C:\Users\username\Laz2Las\laszip.exe" #should be downloaded from https://rapidlasso.com/lastools/
-    output_density=r'C:\Users\username\density.xlsx' #output file only
+    output_density=r'C:\Users\username\density.parquet' #output file only
     converter=lidar_functions(city,directories,laszip_location)
     converter.laz2las()
-    converter.run_lidar_info(output_density)
+    converter.header_survey(output_density) #run_lidar_info(output_density) for the full WhiteboxTools reports (.xlsx output)
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Plane of array (POA) irradiance of many segments at once. Same model as
+pvlib.irradiance.get_total_irradiance with model='haydavies' and the default albedo,
+calculated as one hours x segments array (in chunks of segments) instead of one call
+per segment.
+"""
+from numpy import asarray,clip,cos,maximum,nansum,ndarray,radians,sin,zeros
+from pandas import Series
+
+class poa_engine:
+    def __init__(self,solar_zenith:Series,solar_azimuth:Series,dni:Series,ghi:Series,dhi:Series,dni_extra:Series,
+                 albedo:float=0.25,chunk_size:int=10**7)->None:
+        """
+        Parameters
+        ----------
+        solar_zenith : Series
+            apparent solar zenith of each hour in degrees
+        solar_azimuth : Series
+            solar azimuth of each hour in degrees east of north
+        dni, ghi, dhi : Series
+            direct normal, global horizontal and diffuse horizontal irradiance of each hour (W/m2)
+        dni_extra : Series
+            extraterrestrial direct normal irradiance of each hour (W/m2)
+        albedo : float
+            ground reflectance
+        chunk_size : int
+            maximum number of values calculated at once (hours times segments)
+        """
+        zenith=radians(asarray(solar_zenith,dtype='float64'))
+        self.solar_azimuth=radians(asarray(solar_azimuth,dtype='float64'))[:,None]
+        self.cos_zenith=cos(zenith)[:,None]
+        self.sin_zenith=sin(zenith)[:,None]
+        self.dni=asarray(dni,dtype='float64')[:,None]
+        self.ghi=asarray(ghi,dtype='float64')[:,None]
+        self.dhi=asarray(dhi,dtype='float64')[:,None]
+        #anisotropy index and horizontal beam projection of the Hay-Davies model
+        self.AI=self.dni/asarray(dni_extra,dtype='float64')[:,None]
+        self.horizontal=maximum(self.cos_zenith,0.01745)
+        self.albedo=albedo
+        self.chunk_size=chunk_size
+
+    def poa_block(self,tilt:ndarray,azimuth:ndarray)->ndarray:
+        """
+        POA irradiance of a group of segments.
+
+        Parameters
+        ----------
+        tilt, azimuth : ndarray
+            tilt and azimuth (degrees east of north) of each segment
+
+        Returns
+        -------
+        ndarray
+            POA irradiance (W/m2) with one row per hour and one column per segment
+        """
+        tilt=radians(asarray(tilt,dtype='float64'))
+        azimuth=radians(asarray(azimuth,dtype='float64'))
+        cos_tilt=cos(tilt)
+        projection=clip(cos_tilt*self.cos_zenith+sin(tilt)*self.sin_zenith*cos(self.solar_azimuth-azimuth),-1,1)
+        #beam
+        poa=maximum(self.dni*projection,0)
+        #sky diffuse (isotropic and circumsolar)
+        poa+=maximum(self.dhi*(1-self.AI)*(0.5*(1+cos_tilt)),0)
+        poa+=maximum(self.dhi*(self.AI*(maximum(projection,0)/self.horizontal)),0)
+        #ground reflected
+        poa+=self.ghi*(self.albedo*(1-cos_tilt)*0.5)
+        return poa
+
+    def poa(self,tilt:ndarray,azimuth:ndarray,scale:float=1.0,dtype:str='float64')->ndarray:
+        """
+        POA irradiance of all the segments, calculated in chunks of segments.
+
+        Parameters
+        ----------
+        tilt, azimuth : ndarray
+            tilt and azimuth (degrees east of north) of each segment
+        scale : float
+            factor applied to the irradiance (ex. 1/1000 for kW/m2)
+        dtype : string
+            data type of the output
+
+        Returns
+        -------
+        ndarray
+            POA irradiance with one row per hour and one column per segment
+        """
+        tilt,azimuth=asarray(tilt),asarray(azimuth)
+        output=zeros((len(self.dni),len(tilt)),dtype=dtype)
+        step=max(1,self.chunk_size//max(1,len(self.dni)))
+        for start in range(0,len(tilt),step):
+            output[:,start:start+step]=self.poa_block(tilt[start:start+step],azimuth[start:start+step])*scale
+        return output
+
+    def shaded_poa(self,TID:ndarray,tilt:ndarray,azimuth:ndarray,scale:float=1.0)->tuple[ndarray,ndarray]:
+        """
+        POA irradiance of all the segments and the POA reduced by the time in daylight (TID),
+        calculated in chunks of segments.
+
+        Parameters
+        ----------
+        TID : ndarray
+            time in daylight with one row per hour and one column per segment
+        tilt, azimuth : ndarray
+            tilt and azimuth (degrees east of north) of each segment
+        scale : float
+            factor applied to the irradiance (ex. 1/1000 for kW/m2)
+
+        Returns
+        -------
+        tuple[ndarray,ndarray]
+            POA and shaded POA with one row per hour and one column per segment
+        """
+        tilt,azimuth=asarray(tilt),asarray(azimuth)
+        poa,shaded=zeros((len(self.dni),len(tilt))),zeros((len(self.dni),len(tilt)))
+        step=max(1,self.chunk_size//max(1,len(self.dni)))
+        for start in range(0,len(tilt),step):
+            poa[:,start:start+step]=self.poa_block(tilt[start:start+step],azimuth[start:start+step])*scale
+            shaded[:,start:start+step]=TID[:,start:start+step]*poa[:,start:start+step]
+        return poa,shaded
+
+    def poa_sum(self,tilt:ndarray,azimuth:ndarray,scale:float=1.0)->ndarray:
+        """
+        Sum over the hours of the POA irradiance of each segment (hours without irradiance
+        data are skipped), without keeping the hourly values.
+
+        Parameters
+        ----------
+        tilt, azimuth : ndarray
+            tilt and azimuth (degrees east of north) of each segment
+        scale : float
+            factor applied to the irradiance (ex. 1/1000 for kWh/m2)
+
+        Returns
+        -------
+        ndarray
+            POA sum of each segment
+        """
+        tilt,azimuth=asarray(tilt),asarray(azimuth)
+        output=zeros(len(tilt))
+        step=max(1,self.chunk_size//max(1,len(self.dni)))
+        for start in range(0,len(tilt),step):
+            output[start:start+step]=nansum(self.poa_block(tilt[start:start+step],azimuth[start:start+step]),axis=0)*scale
+        return output
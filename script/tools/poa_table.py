@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Lookup table of the hourly plane of array (POA) irradiance by orientation. Many segments
+share the same orientation (all flat roofs are set to a tilt of 10 degrees facing south),
+so the POA of each unique orientation is calculated once for all the hours of the weather
+file. The tilt and azimuth can also be rounded to a resolution to share more orientations. The segments are then mapped to
+their orientation by index. The table can be saved in a folder next to the weather file and reused
+by the Technical, grid and representative analyses of the same location. The folder is named after
+the location, weather, albedo and resolution of the table, and the orientations added by each run are
+appended as a new pair of files so the columns already saved are never rewritten.
+"""
+from numpy import (arange,asarray,concatenate,empty,flatnonzero,isin,load,mod,nansum,ndarray,rint,
+                   save,searchsorted,unique,zeros)
+from hashlib import sha256
+from os import listdir,makedirs,path,remove,replace
+import json
+from .poa_engine import poa_engine
+
+class poa_table:
+    def __init__(self,engine:poa_engine,resolution:float=0,prefix:str=None,inputs:dict=None)->None:
+        """
+        Parameters
+        ----------
+        engine : poa_engine
+            POA engine of all the hours of the weather file
+        resolution : float
+            the tilt and azimuth are rounded to a multiple of this value, in degrees. The exact
+            orientations are used with 0 (only identical orientations share a column)
+        prefix : string
+            beginning of the name of the folder where the table is saved (ex. the weather file
+            without its extension). The folder is <prefix>_poa_table_<key>, the key being the
+            checksum of the inputs, the albedo, the resolution and the number of hours. The table
+            is kept in memory only if None.
+        inputs : dict
+            description of the weather and location used to check the saved table (ex. checksum
+            of the weather file, latitude, longitude, time zone)
+        """
+        if not(0<=resolution<=360):
+            raise Exception("Not a valid orientation resolution. It should be between 0 (exact orientations) and 360 degrees")
+        self.engine=engine
+        self.resolution=resolution
+        self.inputs={} if inputs is None else {key:str(value) for key,value in inputs.items()}
+        #description of the table, saved in the folder (table.json) and checked when the table is loaded
+        self.header={'inputs':self.inputs,'albedo':float(engine.albedo),'resolution':float(resolution),'hours':len(engine.dni)}
+        self.directory=None
+        if prefix is not None:
+            key=sha256(json.dumps(self.header,sort_keys=True).encode()).hexdigest()[:16]
+            self.directory=prefix+'_poa_table_'+key
+        #float32 POA (W/m2) of the orientations added at once (one row per orientation and one column per hour,
+        #memory-mapped when saved) and position of the first orientation of each chunk in the table
+        self.chunks=[]
+        self.offsets=zeros(1,dtype='int64')
+        #sorted keys of the orientations in the table (tilt+1j*azimuth) and position of each key in the table
+        self.keys=zeros(0,dtype='complex128')
+        self.position=zeros(0,dtype='int64')
+        if self.directory is not None and self.check_directory():
+            self.load()
+
+    def key(self,tilt:ndarray,azimuth:ndarray)->ndarray:
+        """
+        Key of the orientations, a complex number made of the tilt (real part) and the azimuth
+        between 0 and 360 (imaginary part), rounded to the resolution. The keys are sorted by
+        tilt then azimuth.
+
+        Parameters
+        ----------
+        tilt, azimuth : ndarray
+            tilt and azimuth (degrees east of north) of each segment
+
+        Returns
+        -------
+        ndarray
+            key of each orientation
+        """
+        tilt,azimuth=asarray(tilt,dtype='float64'),mod(asarray(azimuth,dtype='float64'),360)
+        if self.resolution>0:
+            tilt=rint(tilt/self.resolution)*self.resolution
+            azimuth=mod(rint(azimuth/self.resolution),round(360/self.resolution))*self.resolution
+        return tilt+1j*azimuth
+
+    def index(self,tilt:ndarray,azimuth:ndarray)->ndarray:
+        """
+        Calculates the orientations that are not in the table and finds the column of the
+        table of each segment.
+
+        Parameters
+        ----------
+        tilt, azimuth : ndarray
+            tilt and azimuth (degrees east of north) of each segment
+
+        Returns
+        -------
+        ndarray
+            column of the table of each segment
+        """
+        keys=self.key(tilt,azimuth)
+        missing=unique(keys)
+        missing=missing[~isin(missing,self.keys)]
+        if len(missing)>0:
+            print("Orientations calculated: ",len(missing)," of ",len(missing)+len(self.keys))
+            values=self.engine.poa(missing.real,missing.imag,dtype='float32').T.copy()
+            if self.directory is not None:
+                values=self.save(missing,values)
+            self.add(missing,values)
+        return self.position[searchsorted(self.keys,keys)]
+
+    def add(self,keys:ndarray,values:ndarray)->None:
+        """
+        Adds a chunk of orientations to the table.
+
+        Parameters
+        ----------
+        keys : ndarray
+            keys of the orientations (not already in the table)
+        values : ndarray
+            float32 POA with one row per orientation and one column per hour
+        """
+        self.chunks.append(values)
+        position=concatenate([self.position,arange(self.offsets[-1],self.offsets[-1]+len(keys))])
+        self.offsets=concatenate([self.offsets,[self.offsets[-1]+len(keys)]])
+        keys=concatenate([self.keys,keys])
+        order=keys.argsort(kind='stable')
+        self.keys,self.position=keys[order],position[order]
+
+    def get_values(self,columns:ndarray,hours:ndarray=None)->ndarray:
+        """
+        POA of columns of the table. Only the orientations that are used are read from the
+        memory-mapped chunks.
+
+        Parameters
+        ----------
+        columns : ndarray
+            columns of the table (index)
+        hours : ndarray
+            position of the hours in the weather file, all the hours if None
+
+        Returns
+        -------
+        ndarray
+            float32 POA (W/m2) with one row per hour and one column per input column
+        """
+        columns=asarray(columns,dtype='int64')
+        values=empty((len(self.engine.dni) if hours is None else len(hours),len(columns)),dtype='float32')
+        chunk=searchsorted(self.offsets,columns,side='right')-1
+        for number in unique(chunk):
+            selected=flatnonzero(chunk==number)
+            rows=self.chunks[number][columns[selected]-self.offsets[number]]
+            values[:,selected]=(rows if hours is None else rows[:,hours]).T
+        return values
+
+    def poa(self,tilt:ndarray,azimuth:ndarray,hours:ndarray=None,scale:float=1.0)->ndarray:
+        """
+        Hourly POA irradiance of each segment.
+
+        Parameters
+        ----------
+        tilt, azimuth : ndarray
+            tilt and azimuth (degrees east of north) of each segment
+        hours : ndarray
+            position of the hours in the weather file, all the hours if None
+        scale : float
+            factor applied to the irradiance (ex. 1/1000 for kW/m2)
+
+        Returns
+        -------
+        ndarray
+            POA irradiance with one row per hour and one column per segment
+        """
+        return self.get_values(self.index(tilt,azimuth),hours)*scale
+
+    def shaded_poa(self,TID:ndarray,tilt:ndarray,azimuth:ndarray,hours:ndarray=None,scale:float=1.0,
+                   chunk_size:int=10**7)->tuple[ndarray,ndarray]:
+        """
+        Hourly POA irradiance of each segment and the POA reduced by the time in daylight (TID).
+
+        Parameters
+        ----------
+        TID : ndarray
+            time in daylight with one row per hour and one column per segment
+        tilt, azimuth : ndarray
+            tilt and azimuth (degrees east of north) of each segment
+        hours : ndarray
+            position of the hours of the TID in the weather file, all the hours if None
+        scale : float
+            factor applied to the irradiance (ex. 1/1000 for kW/m2)
+        chunk_size : int
+            maximum number of values calculated at once (hours times segments)
+
+        Returns
+        -------
+        tuple[ndarray,ndarray]
+            POA and shaded POA with one row per hour and one column per segment
+        """
+        columns=self.index(tilt,azimuth)
+        num_hours=len(self.engine.dni) if hours is None else len(hours)
+        poa,shaded=zeros((num_hours,len(columns))),zeros((num_hours,len(columns)))
+        step=max(1,chunk_size//max(1,num_hours))
+        for start in range(0,len(columns),step):
+            poa[:,start:start+step]=self.get_values(columns[start:start+step],hours)*scale
+            shaded[:,start:start+step]=TID[:,start:start+step]*poa[:,start:start+step]
+        return poa,shaded
+
+    def poa_sum(self,tilt:ndarray,azimuth:ndarray,scale:float=1.0,chunk_size:int=10**7)->ndarray:
+        """
+        Sum over all the hours of the POA irradiance of each segment (hours without
+        irradiance data are skipped).
+
+        Parameters
+        ----------
+        tilt, azimuth : ndarray
+            tilt and azimuth (degrees east of north) of each segment
+        scale : float
+            factor applied to the irradiance (ex. 1/1000 for kWh/m2)
+        chunk_size : int
+            maximum number of values read at once (hours times orientations)
+
+        Returns
+        -------
+        ndarray
+            POA sum of each segment
+        """
+        used,orientation=unique(self.index(tilt,azimuth),return_inverse=True)
+        sums=zeros(len(used))
+        step=max(1,chunk_size//max(1,len(self.engine.dni)))
+        for start in range(0,len(used),step):
+            sums[start:start+step]=nansum(self.get_values(used[start:start+step]),axis=0,dtype='float64')
+        return sums[orientation]*scale
+
+    def check_directory(self)->bool:
+        """
+        Checks whether the saved table can be used with the weather data and the resolution.
+
+        Returns
+        -------
+        bool
+            True if the folder exists and was made with the same inputs, albedo, resolution and hours
+        """
+        header_file=path.join(self.directory,'table.json')
+        if not(path.isfile(header_file)):
+            return False
+        with open(header_file) as file:
+            return json.load(file)==json.loads(json.dumps(self.header))
+
+    def load(self)->None:
+        """
+        Memory-maps the saved chunks of the table. A chunk is only used once its keys are
+        saved (the values are saved first).
+        """
+        number=0
+        while path.isfile(path.join(self.directory,'keys_'+str(number)+'.npy')):
+            keys=load(path.join(self.directory,'keys_'+str(number)+'.npy'))
+            values=load(path.join(self.directory,'values_'+str(number)+'.npy'),mmap_mode='r')
+            self.add(keys,values)
+            number+=1
+
+    def save(self,keys:ndarray,values:ndarray)->ndarray:
+        """
+        Saves a new chunk of the table (values_<n>.npy then keys_<n>.npy) in the folder of the
+        table without rewriting the chunks already saved. The description of the table
+        (table.json) is written with the first chunk, after removing the chunks of a table
+        with another description.
+
+        Parameters
+        ----------
+        keys : ndarray
+            keys of the orientations of the chunk
+        values : ndarray
+            float32 POA with one row per orientation and one column per hour
+
+        Returns
+        -------
+        ndarray
+            memory-mapped POA of the chunk
+        """
+        if len(self.chunks)==0:
+            makedirs(self.directory,exist_ok=True)
+            for name in listdir(self.directory):
+                remove(path.join(self.directory,name))
+            with open(path.join(self.directory,'table.json'),'w') as file:
+                json.dump(self.header,file)
+        name=str(len(self.chunks))
+        temp_file=path.join(self.directory,'values_temp.npy')
+        save(temp_file,values)
+        replace(temp_file,path.join(self.directory,'values_'+name+'.npy'))
+        save(temp_file,keys)
+        replace(temp_file,path.join(self.directory,'keys_'+name+'.npy'))
+        return load(path.join(self.directory,'values_'+name+'.npy'),mmap_mode='r')
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Solar resource bins of the rooftop segments. Each segment is assigned once to the bin of
+its solar resource relative to a maximum (ex. the bin [0.3,0.4) holds the segments with
+30% to 40% of the maximum). The sums by bin of any value per segment, and the weighted
+hourly profiles of the bins, are then calculated with one sparse matrix product instead
+of filtering the segments for each bin.
+"""
+from numpy import arange,asarray,bincount,errstate,flatnonzero,ndarray,searchsorted,zeros
+from scipy.sparse import csc_matrix
+
+class resource_bins:
+    def __init__(self,resource:ndarray,maximum:float,num_bins:int=10)->None:
+        """
+        Parameters
+        ----------
+        resource : ndarray
+            solar resource of each segment (ex. annual shaded POA)
+        maximum : float
+            resource of the top of the last bin. Segments with a resource below 0, at or above
+            the maximum (or nan) are not in any bin.
+        num_bins : int
+            number of bins of equal width between 0 and the maximum
+        """
+        if num_bins<1:
+            raise Exception("Not a valid number of bins. It should be at least 1")
+        resource=asarray(resource,dtype='float64')
+        self.num_bins=num_bins
+        self.num_segments=len(resource)
+        #lower limit of each bin and top of the last bin
+        self.edges=maximum*arange(num_bins+1)/num_bins
+        self.bin=searchsorted(self.edges,resource,side='right')-1
+        self.bin[(self.bin>=num_bins)|(resource!=resource)]=-1
+        self.segments=flatnonzero(self.bin>=0)
+
+    def thresholds(self)->ndarray:
+        """
+        Returns
+        -------
+        ndarray
+            lower limit of each bin as a fraction of the maximum
+        """
+        return arange(self.num_bins)/self.num_bins
+
+    def sum(self,values:ndarray)->ndarray:
+        """
+        Sum by bin of a value per segment.
+
+        Parameters
+        ----------
+        values : ndarray
+            value of each segment (ex. capacity)
+
+        Returns
+        -------
+        ndarray
+            sum of each bin
+        """
+        values=asarray(values,dtype='float64')[self.segments]
+        return bincount(self.bin[self.segments],weights=values,minlength=self.num_bins)
+
+    def matrix(self,weights:ndarray)->csc_matrix:
+        """
+        Sparse matrix of the bins (rows) and segments (columns) with the weight of each segment
+        in its bin.
+
+        Parameters
+        ----------
+        weights : ndarray
+            weight of each segment (ex. capacity)
+
+        Returns
+        -------
+        csc_matrix
+            weights of the segments by bin
+        """
+        weights=asarray(weights,dtype='float64')[self.segments]
+        return csc_matrix((weights,(self.bin[self.segments],self.segments)),shape=(self.num_bins,self.num_segments))
+
+    def weighted_profiles(self,chunks,weights:ndarray,num_hours:int)->ndarray:
+        """
+        Weighted average hourly profile of each bin. The hourly values can be given by groups
+        of segments so that they are never all in memory at once.
+
+        Parameters
+        ----------
+        chunks : iterable
+            (position of the first segment, hourly values with one row per hour and one column
+            per segment) for each group of segments
+        weights : ndarray
+            weight of each segment (ex. capacity)
+        num_hours : int
+            number of hours
+
+        Returns
+        -------
+        ndarray
+            weighted average with one row per bin and one column per hour (0 for bins without
+            segments)
+        """
+        matrix=self.matrix(weights)
+        profiles=zeros((self.num_bins,num_hours))
+        for start,hourly in chunks:
+            profiles+=(hourly@matrix[:,start:start+hourly.shape[1]].T).T
+        with errstate(divide='ignore',invalid='ignore'):
+            profiles=profiles/self.sum(weights)[:,None]
+        profiles[profiles!=profiles]=0
+        return profiles
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Shared access to the rasterized segmentation (FID raster). The raster is converted once
+to a .npy matrix with its zonal index (zonal_index) and its unique values, saved in a
+folder next to the raster (raster_segments_<key>, the key is the checksum of the raster).
+Everything is then memory-mapped: the shading, the technical potential and the processes
+of a pool read the same files without copying them, and a tile only reads its window.
+"""
+import json
+from numpy import load,ndarray,save,unique
+from numpy.lib.format import open_memmap
+from rasterio import open as open_file
+from rasterio.windows import Window
+from os import makedirs,path,replace
+from .file_checksum import file_checksum
+from .zonal_index import zonal_index
+
+class segment_raster:
+    #rasters already opened in this process, by folder
+    opened={}
+
+    def __init__(self,raster_file:str,block_rows:int=1024)->None:
+        """
+        Converts the raster if it was not converted yet. Use segment_raster.get to share the
+        raster within a process.
+
+        Parameters
+        ----------
+        raster_file : string
+            rasterized segmentation file (.tif)
+        block_rows : int
+            number of rows of the raster read at once during the conversion
+        """
+        self.raster_file=raster_file
+        self.directory=self.folder(raster_file)
+        #memory-mapped arrays, opened when first used
+        self.arrays={}
+        self.zonal_cache=None
+        if not(path.isfile(path.join(self.directory,'segments.json'))):
+            self.convert(block_rows)
+
+    @classmethod
+    def get(cls,raster_file:str)->'segment_raster':
+        """
+        Rasterized segmentation, only opened once per process.
+
+        Parameters
+        ----------
+        raster_file : string
+            rasterized segmentation file (.tif)
+
+        Returns
+        -------
+        segment_raster
+            memory-mapped segmentation
+        """
+        directory=cls.folder(raster_file)
+        if directory not in cls.opened:
+            cls.opened[directory]=cls(raster_file)
+        return cls.opened[directory]
+
+    @staticmethod
+    def folder(raster_file:str)->str:
+        """
+        Folder of the converted raster, named with the checksum of the raster so that a
+        new segmentation is converted again.
+
+        Parameters
+        ----------
+        raster_file : string
+            rasterized segmentation file (.tif)
+
+        Returns
+        -------
+        string
+            folder of the converted raster
+        """
+        return path.splitext(raster_file)[0]+'_segments_'+file_checksum(raster_file).digest()[:16]
+
+    def convert(self,block_rows:int)->None:
+        """
+        Copies the raster to a .npy matrix by blocks of rows and saves its zonal index and
+        unique values. The description file (segments.json) is written last so that an
+        interrupted conversion is done again.
+
+        Parameters
+        ----------
+        block_rows : int
+            number of rows of the raster read at once
+        """
+        print("Converting the rasterized segmentation ",self.raster_file)
+        makedirs(self.directory,exist_ok=True)
+        temp_file=path.join(self.directory,'segments_temp.npy')
+        with open_file(self.raster_file) as Rasterized_segments:
+            matrix=open_memmap(temp_file,mode='w+',dtype=Rasterized_segments.dtypes[0],shape=(Rasterized_segments.height,Rasterized_segments.width))
+            for row in range(0,Rasterized_segments.height,block_rows):
+                rows=min(block_rows,Rasterized_segments.height-row)
+                matrix[row:row+rows]=Rasterized_segments.read(1,window=Window(0,row,Rasterized_segments.width,rows))
+            matrix.flush()
+            del matrix
+        replace(temp_file,path.join(self.directory,'segments.npy'))
+        segments=self.read()
+        zonal_index(Rasterized_segments_ravel=segments.ravel()).save(self.directory)
+        save(path.join(self.directory,'unique.npy'),unique(segments))
+        with open(path.join(self.directory,'segments.json'),'w') as file:
+            json.dump({'raster_file':self.raster_file,'shape':list(segments.shape)},file)
+
+    def array(self,name:str)->ndarray:
+        """
+        Memory-mapped array of the converted raster.
+
+        Parameters
+        ----------
+        name : string
+            name of the array (segments or unique)
+
+        Returns
+        -------
+        ndarray
+            read-only memory-mapped array
+        """
+        if name not in self.arrays:
+            self.arrays[name]=load(path.join(self.directory,name+'.npy'),mmap_mode='r')
+        return self.arrays[name]
+
+    def read(self,window:Window=None)->ndarray:
+        """
+        FIDs of the cells of the raster or of a window of the raster, without copying them.
+
+        Parameters
+        ----------
+        window : Window
+            window of the raster, the whole raster if None
+
+        Returns
+        -------
+        ndarray
+            2D read-only array of the FIDs
+        """
+        segments=self.array('segments')
+        if window is None:
+            return segments
+        row,col=int(window.row_off),int(window.col_off)
+        return segments[row:row+int(window.height),col:col+int(window.width)]
+
+    def unique(self)->ndarray:
+        """
+        Returns
+        -------
+        ndarray
+            sorted unique values of the raster (including the cells without a segment)
+        """
+        return self.array('unique')
+
+    def zonal(self)->zonal_index:
+        """
+        Returns
+        -------
+        zonal_index
+            memory-mapped index of the cells of each FID
+        """
+        if self.zonal_cache is None:
+            self.zonal_cache=zonal_index.load(self.directory)
+        return self.zonal_cache
+
+    def __getstate__(self)->dict:
+        """
+        Only the name of the folder is sent to another process, the arrays are memory-mapped
+        again when they are used.
+        """
+        state=self.__dict__.copy()
+        state['arrays']={}
+        state['zonal_cache']=None
+        return state
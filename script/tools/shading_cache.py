@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Cache of the average sunlit fraction of each segment (FID) for one sun position.
+The shading only depends on the DSM and on the position of the sun, so the sun
+positions are grouped by azimuth sector and by altitude rounded to a tolerance and
+each group is only calculated once. The sunlit fraction of an hour is the average
+over the sun positions of that hour. The cache can be saved next to the mosaic and
+reused by every run on the same mosaic and segmentation.
+"""
+from numpy import (arange,array_equal,bincount,clip,concatenate,flatnonzero,isin,
+                   load,ndarray,ones,rint,savez,searchsorted,sort,unique,where,zeros)
+from pandas import DataFrame
+from scipy.sparse import coo_matrix
+from os import path
+from .shadow_engine import shadow_engine
+from .zonal_index import zonal_index
+
+class shading_cache:
+    #multiplier of the sector number in the key of a sun position
+    sector_key=100000
+
+    def __init__(self,engine:shadow_engine,zonal:zonal_index,tolerance:float=0.25,cache_file:str=None)->None:
+        """
+        Sets up the cache for the segments of a shading engine.
+
+        Parameters
+        ----------
+        engine : shadow_engine
+            shading engine of the rooftop cells (its pixels must be zonal.pixels)
+        zonal : zonal_index
+            index of the cells of each FID
+        tolerance : float
+            the sun altitude is rounded to a multiple of this value, in degrees
+        cache_file : string
+            file where the cache is saved (.npz). It is loaded if it was made with the same
+            DSM, segments and parameters. The cache is kept in memory only if None.
+        """
+        if tolerance<=0 or 90/tolerance>=self.sector_key:
+            raise Exception("Not a valid sun altitude tolerance. It should be between 0.001 and 90 degrees")
+        self.engine=engine
+        self.zonal=zonal
+        self.tolerance=tolerance
+        self.cache_file=cache_file
+        #sorted keys of the sun positions in the cache and sunlit fraction of each FID for each key
+        self.keys=zeros(0,dtype='int64')
+        self.values=zeros((0,len(zonal.FID)),dtype='float32')
+        if cache_file is not None and self.check_cache_file():
+            self.load()
+
+    def key(self,azimuth:ndarray,elevation:ndarray)->ndarray:
+        """
+        Key of the sun positions, made of the azimuth sector and of the rounded altitude.
+
+        Parameters
+        ----------
+        azimuth : ndarray
+            solar azimuth in degrees east of north
+        elevation : ndarray
+            solar elevation in degrees (above 0)
+
+        Returns
+        -------
+        ndarray
+            key of each sun position
+        """
+        return self.engine.sector(azimuth)*self.sector_key+rint(elevation/self.tolerance).astype('int64')
+
+    def missing(self,sun:DataFrame)->ndarray:
+        """
+        Keys of the sun positions above the horizon that are not in the cache.
+
+        Parameters
+        ----------
+        sun : DataFrame
+            sun positions with the columns azimuth and elevation
+
+        Returns
+        -------
+        ndarray
+            sorted keys to calculate
+        """
+        daylight=sun[sun['elevation']>0]
+        keys=unique(self.key(daylight['azimuth'].values,daylight['elevation'].values))
+        return keys[~isin(keys,self.keys)]
+
+    def evaluate(self,keys:ndarray,chunk_size:int=10**7)->ndarray:
+        """
+        Calculates the sunlit fraction of each FID for sun positions. For each sector, the
+        cells are sorted by FID and by horizon once, so that the number of cells of each FID
+        lower than the sun is found with one search per FID instead of comparing every cell.
+
+        Parameters
+        ----------
+        keys : ndarray
+            keys of the sun positions
+        chunk_size : int
+            maximum number of values calculated at once (sun positions times FIDs)
+
+        Returns
+        -------
+        ndarray
+            float32 matrix of the sunlit fraction with one row per key and one column per FID
+        """
+        values=zeros((len(keys),len(self.zonal.FID)),dtype='float32')
+        sectors=keys//self.sector_key
+        #cells outside the DSM are never sunlit, the horizon is bounded so that the FIDs do not overlap
+        blocked=self.engine.blocked
+        first=arange(len(self.zonal.FID))*2000.0
+        for sector in unique(sectors):
+            horizon=where(blocked,1000.0,clip(self.engine.horizon_angle(sector).astype('float64'),-100.0,100.0))
+            cells=sort(self.zonal.inverse*2000.0+horizon)
+            rows=flatnonzero(sectors==sector)
+            step=max(1,chunk_size//max(1,len(self.zonal.FID)))
+            for i in range(0,len(rows),step):
+                altitude=(keys[rows[i:i+step]]%self.sector_key)*self.tolerance
+                count=searchsorted(cells,first+altitude[:,None],side='left')-self.zonal.starts
+                values[rows[i:i+step]]=count/self.zonal.counts
+        return values
+
+    def add(self,keys:ndarray,values:ndarray)->None:
+        """
+        Adds calculated sun positions to the cache.
+
+        Parameters
+        ----------
+        keys : ndarray
+            keys of the sun positions (not already in the cache)
+        values : ndarray
+            sunlit fraction of each FID for each key
+        """
+        keys=concatenate([self.keys,keys])
+        order=keys.argsort(kind='stable')
+        self.keys=keys[order]
+        self.values=concatenate([self.values,values.astype('float32')])[order]
+
+    def update(self,sun:DataFrame)->None:
+        """
+        Calculates the sun positions that are not in the cache.
+
+        Parameters
+        ----------
+        sun : DataFrame
+            sun positions with the columns azimuth and elevation
+        """
+        keys=self.missing(sun)
+        if len(keys)>0:
+            self.add(keys,self.evaluate(keys))
+
+    def sunlit_fraction(self,sun:DataFrame)->ndarray:
+        """
+        Sunlit fraction of each FID for each hour, the average of the cached sunlit fraction
+        of the sun positions above the horizon in that hour (same output as averaging the
+        shadow_engine sunlit fraction of each cell). All the sun positions must be in the cache.
+
+        Parameters
+        ----------
+        sun : DataFrame
+            sun positions with the columns hour, azimuth and elevation (shadow_engine.sun_positions)
+
+        Returns
+        -------
+        ndarray
+            float32 matrix of the sunlit fraction with one row per hour and one column per FID
+        """
+        num_hours=int(sun['hour'].max())+1
+        daylight=sun[sun['elevation']>0]
+        rows=searchsorted(self.keys,self.key(daylight['azimuth'].values,daylight['elevation'].values))
+        hours=daylight['hour'].values
+        #number of times each cached sun position is in each hour
+        positions=coo_matrix((ones(len(rows),dtype='float32'),(hours,rows)),shape=(num_hours,len(self.keys))).tocsr()
+        samples=bincount(hours,minlength=num_hours)
+        sunlit=positions@self.values
+        return (sunlit/where(samples>0,samples,1)[:,None]).astype('float32')
+
+    def check_cache_file(self)->bool:
+        """
+        Checks whether the saved cache can be used with the DSM, the segments and the parameters.
+
+        Returns
+        -------
+        bool
+            True if the file exists, is newer than the DSM and was made with the same segments and parameters
+        """
+        if not(path.isfile(self.cache_file)) or path.getmtime(self.cache_file)<path.getmtime(self.engine.dsm_file):
+            return False
+        with load(self.cache_file) as cache:
+            return (float(cache['tolerance'])==self.tolerance and float(cache['az_fraction'])==self.engine.az_fraction
+                    and float(cache['max_dist'])==self.engine.max_dist and array_equal(cache['FID'],self.zonal.FID)
+                    and array_equal(cache['counts'],self.zonal.counts))
+
+    def load(self)->None:
+        """
+        Reads the saved cache.
+        """
+        with load(self.cache_file) as cache:
+            self.keys=cache['keys']
+            self.values=cache['values']
+
+    def save(self)->None:
+        """
+        Saves the cache to cache_file.
+        """
+        if self.cache_file is not None:
+            savez(self.cache_file,keys=self.keys,values=self.values,FID=self.zonal.FID,counts=self.zonal.counts,
+                  tolerance=self.tolerance,az_fraction=self.engine.az_fraction,max_dist=self.engine.max_dist)
@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+In-process replacement for the WhiteboxTools time_in_daylight tool. The DSM is
+read once, the horizon elevation angle is computed once per azimuth sector and
+the sunlit fraction of any batch of sun positions is found by comparing the sun
+altitude to that horizon. The horizon of every sector can be saved as a multi-band
+raster next to the mosaic so it is only calculated once per mosaic. A window of the DSM can be used instead
+of the whole mosaic to bound the memory used on large regions. When the horizon file is used, the horizon of
+the rooftop cells is copied once to a .npy file next to it and memory-mapped, so the processes of a pool
+share it instead of each one reading the DSM and every band of the horizon file.
+"""
+from numpy import (arange,arctan,cos,degrees,full,hypot,inf,isnan,load,maximum,
+                   ndarray,radians,searchsorted,sin,sort,unique,where,zeros,errstate,nan)
+from numpy.lib.format import open_memmap
+from pandas import DataFrame,DatetimeIndex,date_range
+from pvlib import solarposition
+from rasterio import open as open_file
+from rasterio.windows import Window
+from hashlib import sha256
+from os import path,replace
+import json
+
+class shadow_engine:
+    def __init__(self,dsm_file:str,pixels:ndarray=None,max_dist:float=50.0,az_fraction:float=15.0,horizon_file:str=None,window:Window=None)->None:
+        """
+        Loads the DSM used for the shading analysis.
+
+        Parameters
+        ----------
+        dsm_file : string
+            DSM (mosaic) file with the file extension .tif
+        pixels : ndarray
+            flat indices of the DSM cells where the shading is needed (ex. the rooftop
+            cells of the rasterized segmentation). All cells are used if None. The indices
+            are relative to the window if one is used.
+        max_dist : float
+            maximum search distance for the horizon, in the units of the DSM
+        az_fraction : float
+            width of the azimuth sectors, in degrees
+        horizon_file : string
+            file with the horizon of every azimuth sector (.tif). It is created if it does
+            not exist or if it is older than the DSM. The horizon is calculated when needed
+            and kept in memory only if None.
+        window : Window
+            part of the DSM to use (ex. a tile and its halo). The whole DSM is used if None.
+        """
+        self.dsm_file=dsm_file
+        self.window=window
+        with open_file(dsm_file) as dsm:
+            self.transform=dsm.transform if window is None else dsm.window_transform(window)
+            self.shape=(dsm.height,dsm.width) if window is None else (int(window.height),int(window.width))
+            self.cell_size=abs(dsm.transform.a)
+        #the DSM is only read when the horizon has to be calculated
+        self.dsm=None
+        self.max_dist=max_dist
+        self.az_fraction=az_fraction
+        self.num_sectors=int(round(360/az_fraction))
+        if pixels is None:
+            pixels=arange(self.shape[0]*self.shape[1])
+        self.pixels=pixels
+        self.rows,self.cols=pixels//self.shape[1],pixels%self.shape[1]
+        self.horizon={}
+        #cells without DSM data, never sunlit
+        self.blocked=None
+        if horizon_file is not None:
+            if not(self.check_horizon_file(horizon_file)):
+                self.write_horizon(horizon_file)
+                self.dsm=None
+            self.read_horizon(horizon_file)
+        else:
+            self.blocked=isnan(self.load_dsm()[self.rows,self.cols])
+
+    def load_dsm(self)->ndarray:
+        """
+        Reads the DSM (or its window) the first time it is needed.
+
+        Returns
+        -------
+        ndarray
+            2D array of the DSM with nan where there is no data
+        """
+        if self.dsm is None:
+            with open_file(self.dsm_file) as dsm:
+                self.dsm=dsm.read(1,window=self.window,masked=True).astype('float32').filled(nan)
+        return self.dsm
+
+    def sector(self,azimuth:ndarray)->ndarray:
+        """
+        Azimuth sector of the input solar azimuths.
+
+        Parameters
+        ----------
+        azimuth : ndarray
+            solar azimuth in degrees east of north
+
+        Returns
+        -------
+        ndarray
+            sector number of each azimuth
+        """
+        return (azimuth//self.az_fraction).astype(int)%self.num_sectors
+
+    def horizon_angle(self,sector:int)->ndarray:
+        """
+        Elevation angle of the horizon for one azimuth sector, calculated in the
+        direction of the centre of the sector up to max_dist.
+
+        Parameters
+        ----------
+        sector : int
+            azimuth sector number
+
+        Returns
+        -------
+        ndarray
+            horizon elevation angle in degrees for each cell in pixels
+        """
+        if sector in self.horizon:
+            return self.horizon[sector]
+        self.load_dsm()
+        num_rows,num_cols=self.dsm.shape
+        elevation=self.dsm[self.rows,self.cols]
+        slope=full(len(self.pixels),-inf,dtype='float32')
+        for offset in self.offsets(sector):
+            rows,cols=self.rows+offset[0],self.cols+offset[1]
+            inside=(rows>=0)&(rows<num_rows)&(cols>=0)&(cols<num_cols)
+            obstacle=full(len(self.pixels),-inf,dtype='float32')
+            obstacle[inside]=self.dsm[rows[inside],cols[inside]]
+            obstacle[isnan(obstacle)]=-inf
+            with errstate(invalid='ignore'):
+                maximum(slope,(obstacle-elevation)/(hypot(offset[0],offset[1])*self.cell_size),out=slope)
+        self.horizon[sector]=degrees(arctan(slope)).astype('float32')
+        return self.horizon[sector]
+
+    def offsets(self,sector:int)->list[tuple[int,int]]:
+        """
+        Row and column offsets of the cells crossed by a line in the direction of the
+        centre of the azimuth sector, up to max_dist.
+
+        Parameters
+        ----------
+        sector : int
+            azimuth sector number
+
+        Returns
+        -------
+        list[tuple[int,int]]
+            list of (row,column) offsets, from the closest to the furthest cell
+        """
+        azimuth=radians((sector+0.5)*self.az_fraction)
+        offsets=[]
+        for step in arange(1,int(self.max_dist/self.cell_size)+1):
+            #rows increase to the south and columns to the east
+            offset=(int(round(-step*cos(azimuth))),int(round(step*sin(azimuth))))
+            if offset not in offsets:
+                offsets.append(offset)
+        return offsets
+
+    def horizon_raster(self,sector:int)->ndarray:
+        """
+        Elevation angle of the horizon of every cell of the DSM for one azimuth sector.
+
+        Parameters
+        ----------
+        sector : int
+            azimuth sector number
+
+        Returns
+        -------
+        ndarray
+            2D array of the horizon elevation angle in degrees
+        """
+        self.load_dsm()
+        num_rows,num_cols=self.dsm.shape
+        obstacle=where(isnan(self.dsm),-inf,self.dsm)
+        slope=full(self.dsm.shape,-inf,dtype='float32')
+        for row,col in self.offsets(sector):
+            #cells (i,j) looking at the obstacles in cells (i+row,j+col)
+            target=(slice(max(0,-row),num_rows-max(0,row)),slice(max(0,-col),num_cols-max(0,col)))
+            source=(slice(max(0,row),num_rows+min(0,row)),slice(max(0,col),num_cols+min(0,col)))
+            with errstate(invalid='ignore'):
+                maximum(slope[target],(obstacle[source]-self.dsm[target])/(hypot(row,col)*self.cell_size),out=slope[target])
+        return degrees(arctan(slope)).astype('float32')
+
+    def check_horizon_file(self,horizon_file:str)->bool:
+        """
+        Checks whether the saved horizon file can be used with the DSM and the shading parameters.
+
+        Parameters
+        ----------
+        horizon_file : string
+            file with the horizon of every azimuth sector (.tif)
+
+        Returns
+        -------
+        bool
+            True if the file exists, is newer than the DSM and was made with the same window and parameters
+        """
+        if not(path.isfile(horizon_file)) or path.getmtime(horizon_file)<path.getmtime(self.dsm_file):
+            return False
+        with open_file(horizon_file) as horizon:
+            tags=horizon.tags()
+            return (horizon.count==self.num_sectors and horizon.shape==self.shape and horizon.transform==self.transform
+                    and float(tags.get('az_fraction',-1))==self.az_fraction and float(tags.get('max_dist',-1))==self.max_dist)
+
+    def write_horizon(self,horizon_file:str)->None:
+        """
+        Calculates the horizon of every azimuth sector and saves it as a multi-band
+        raster (one band per sector, band 1 is the sector starting at north).
+
+        Parameters
+        ----------
+        horizon_file : string
+            output file (.tif)
+        """
+        with open_file(self.dsm_file) as dsm:
+            profile=dsm.profile
+        profile.update(count=self.num_sectors,width=self.shape[1],height=self.shape[0],transform=self.transform,dtype='float32',nodata=None,compress='deflate',tiled=True,
+                       blockxsize=256,blockysize=256,BIGTIFF='IF_SAFER')
+        with open_file(horizon_file,'w',**profile) as horizon:
+            for sector in range(self.num_sectors):
+                horizon.write(self.horizon_raster(sector),sector+1)
+                print("Horizon calculated for azimuth sector ",sector+1," of ",self.num_sectors)
+            horizon.update_tags(az_fraction=self.az_fraction,max_dist=self.max_dist)
+
+    def read_horizon(self,horizon_file:str)->None:
+        """
+        Memory-maps the horizon of the cells in pixels for every azimuth sector. The cells
+        are copied from the horizon file to a .npy file next to it the first time
+        (<horizon_file>_cells.npy, one row per sector and a last row that is 1 for the cells
+        without DSM data) and copied again if the horizon file or the cells change.
+
+        Parameters
+        ----------
+        horizon_file : string
+            file with the horizon of every azimuth sector (.tif)
+        """
+        cells_file=path.splitext(horizon_file)[0]+'_cells.npy'
+        description={'pixels':sha256(self.pixels.astype('int64').tobytes()).hexdigest(),'horizon_time':path.getmtime(horizon_file)}
+        description_file=path.splitext(cells_file)[0]+'.json'
+        saved=None
+        if path.isfile(description_file) and path.isfile(cells_file):
+            with open(description_file) as file:
+                saved=json.load(file)
+        if saved!=description:
+            self.write_cells(horizon_file,cells_file,description,description_file)
+        cells=load(cells_file,mmap_mode='r')
+        for sector in range(self.num_sectors):
+            self.horizon[sector]=cells[sector]
+        self.blocked=cells[self.num_sectors]>0
+
+    def write_cells(self,horizon_file:str,cells_file:str,description:dict,description_file:str,block_rows:int=256)->None:
+        """
+        Copies the horizon of the cells in pixels to a .npy file by blocks of rows, so that
+        only one block of one band of the horizon file and of the DSM is in memory at once.
+        The description file is written last so that an interrupted copy is done again.
+
+        Parameters
+        ----------
+        horizon_file : string
+            file with the horizon of every azimuth sector (.tif)
+        cells_file : string
+            output file (.npy)
+        description : dict
+            checksum of the pixels and time of the horizon file
+        description_file : string
+            output description file (.json)
+        block_rows : int
+            number of rows read at once
+        """
+        temp_file=path.splitext(cells_file)[0]+'_temp.npy'
+        cells=open_memmap(temp_file,mode='w+',dtype='float32',shape=(self.num_sectors+1,len(self.pixels)))
+        #cells sorted by row so that each block is a range of the sorted cells
+        order=self.pixels.argsort(kind='stable')
+        rows,cols=self.rows[order],self.cols[order]
+        row_off,col_off=(0,0) if self.window is None else (int(self.window.row_off),int(self.window.col_off))
+        with open_file(horizon_file) as horizon, open_file(self.dsm_file) as dsm:
+            for row in range(0,self.shape[0],block_rows):
+                start,stop=searchsorted(rows,[row,row+block_rows])
+                if start==stop:
+                    continue
+                first,last=int(cols[start:stop].min()),int(cols[start:stop].max())+1
+                block=Window(first,row,last-first,min(block_rows,self.shape[0]-row))
+                rows_block,cols_block=rows[start:stop]-row,cols[start:stop]-first
+                for sector in range(self.num_sectors):
+                    cells[sector,order[start:stop]]=horizon.read(sector+1,window=block)[rows_block,cols_block]
+                elevation=dsm.read(1,window=Window(first+col_off,row+row_off,block.width,block.height),masked=True).astype('float32').filled(nan)
+                cells[self.num_sectors,order[start:stop]]=isnan(elevation[rows_block,cols_block])
+        cells.flush()
+        del cells
+        replace(temp_file,cells_file)
+        with open(description_file,'w') as file:
+            json.dump(description,file)
+
+    @staticmethod
+    def sun_positions(start:DatetimeIndex,latitude:float,longitude:float,time_step:int=1)->DataFrame:
+        """
+        Calculates the sun positions in each hour starting at the input times.
+
+        Parameters
+        ----------
+        start : DatetimeIndex
+            timezone-aware starting time of each hour
+        latitude, longitude : float
+            centre point of the region
+        time_step : int
+            time between two sun positions, in minutes
+
+        Returns
+        -------
+        DataFrame
+            azimuth and elevation of the sun with a column 'hour' giving the position of the hour in start
+        """
+        samples=arange(0,60,time_step)
+        times=DatetimeIndex([t for hour in start for t in date_range(hour,periods=len(samples),freq=str(time_step)+'min')])
+        solpos=solarposition.get_solarposition(times,latitude,longitude)
+        return DataFrame({'hour':arange(len(start)).repeat(len(samples)),
+                          'azimuth':solpos['azimuth'].values,'elevation':solpos['elevation'].values})
+
+    def sunlit_fraction(self,azimuth:ndarray,elevation:ndarray)->ndarray:
+        """
+        Proportion of the sun positions above the horizon for which each cell is not in
+        a shadow (same output as the time_in_daylight tool).
+
+        Parameters
+        ----------
+        azimuth : ndarray
+            solar azimuth in degrees east of north
+        elevation : ndarray
+            solar elevation in degrees
+
+        Returns
+        -------
+        ndarray
+            sunlit fraction of each cell in pixels
+        """
+        daylight=elevation>0
+        azimuth,elevation=azimuth[daylight],elevation[daylight]
+        sunlit=zeros(len(self.pixels),dtype='float32')
+        if len(elevation)==0:
+            return sunlit
+        sectors=self.sector(azimuth)
+        for sector in unique(sectors):
+            #number of sun positions higher than the horizon of each cell
+            altitude=sort(elevation[sectors==sector])
+            sunlit+=len(altitude)-searchsorted(altitude,self.horizon_angle(sector),side='right')
+        return where(self.blocked,0,sunlit/len(elevation)).astype('float32')
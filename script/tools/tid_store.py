@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+File format of the time in daylight (TID) results: a float32 matrix with one row per
+hour and one column per segment saved as a .npy file, and a small sidecar file
+(<name>_index.npz) with the hour index and the FID of each column. The matrix is
+memory-mapped when it is read so that only the columns that are used are loaded.
+"""
+from numpy import load,ndarray,savez
+from numpy.lib.format import open_memmap
+from pandas import DataFrame,DatetimeIndex,Index
+from os import path,remove,replace
+from datetime import timedelta,timezone
+
+class tid_store:
+    def __init__(self,file:str)->None:
+        """
+        Parameters
+        ----------
+        file : string
+            TID matrix file with the file extension .npy
+        """
+        self.file=file
+        self.index_file=path.splitext(file)[0]+'_index.npz'
+
+    def exists(self)->bool:
+        """
+        Checks whether the TID results were saved (the sidecar is written last).
+
+        Returns
+        -------
+        bool
+            True if the matrix and its sidecar exist
+        """
+        return path.isfile(self.file) and path.isfile(self.index_file)
+
+    def write(self,TID:DataFrame,chunk_size:int=1000)->None:
+        """
+        Saves the TID results. The input dataframe is not modified.
+
+        Parameters
+        ----------
+        TID : DataFrame
+            TID with hours as rows and FIDs as columns
+        chunk_size : int
+            number of columns converted to float32 at once
+        """
+        #the sidecar is removed first so that an interrupted write is not taken for saved results
+        if path.isfile(self.index_file):
+            remove(self.index_file)
+        temp_file=path.splitext(self.file)[0]+'_temp.npy'
+        matrix=open_memmap(temp_file,mode='w+',dtype='float32',shape=TID.shape)
+        for start in range(0,TID.shape[1],chunk_size):
+            matrix[:,start:start+chunk_size]=TID.iloc[:,start:start+chunk_size].to_numpy(dtype='float32',na_value=float('nan'))
+        matrix.flush()
+        del matrix
+        replace(temp_file,self.file)
+        if isinstance(TID.index,DatetimeIndex) and TID.index.tz is not None:
+            #UTC times with the time zone name and its offset from UTC (in seconds) if the name is not recognized when reading
+            savez(self.index_file,index=TID.index.tz_convert('UTC').tz_localize(None).to_numpy(dtype='datetime64[ns]'),timezone=str(TID.index.tz),
+                  offset=TID.index[0].utcoffset().total_seconds(),FID=TID.columns.to_numpy(dtype='int64'))
+        else:
+            savez(self.index_file,index=TID.index.to_numpy(),FID=TID.columns.to_numpy(dtype='int64'))
+
+    def matrix(self,mode:str='c')->ndarray:
+        """
+        Memory-maps the TID matrix. Slicing columns (ex. matrix[:,start:stop]) does not copy
+        or load the other columns.
+
+        Parameters
+        ----------
+        mode : string
+            numpy memory-map mode. 'c' (default) allows changes in memory without changing
+            the file, 'r' is read only.
+
+        Returns
+        -------
+        ndarray
+            TID with one row per hour and one column per segment
+        """
+        return load(self.file,mmap_mode=mode)
+
+    def index(self)->tuple[Index,ndarray]:
+        """
+        Reads the sidecar file.
+
+        Returns
+        -------
+        tuple[Index,ndarray]
+            hour index (rows) and FID (columns) of the TID matrix
+        """
+        with load(self.index_file) as sidecar:
+            index=Index(sidecar['index'])
+            if 'timezone' in sidecar:
+                index=index.tz_localize('UTC')
+                try:
+                    index=index.tz_convert(str(sidecar['timezone']))
+                except Exception:
+                    index=index.tz_convert(timezone(timedelta(seconds=float(sidecar['offset']))))
+            return index,sidecar['FID']
+
+    def read(self)->DataFrame:
+        """
+        Reads the TID results as a dataframe backed by the memory-mapped matrix.
+
+        Returns
+        -------
+        DataFrame
+            TID with hours as rows and FIDs as columns
+        """
+        index,FID=self.index()
+        return DataFrame(self.matrix(),index=index,columns=FID,copy=False)
+
+    def columns(self,start:int,stop:int)->ndarray:
+        """
+        TID of a range of segments without loading the others.
+
+        Parameters
+        ----------
+        start, stop : int
+            position of the first and after the last column
+
+        Returns
+        -------
+        ndarray
+            view of the TID matrix with one row per hour
+        """
+        return self.matrix('r')[:,start:stop]
+
+    def delete(self)->None:
+        """
+        Deletes the TID results.
+        """
+        for filename in [self.file,self.index_file]:
+            if path.isfile(filename):
+                remove(filename)
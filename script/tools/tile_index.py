@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Spatial index (R-tree) of the lidar tiles of a folder, built from the bounds in the header
+of each LAS/LAZ file (las_header). It selects the tiles that intersect the building
+footprints and/or a region of interest, so the DSM, mosaic and segmentation only process
+the tiles with buildings (ex. not water, farmland or forest) or a sub-area of the folder.
+The footprints and the region of interest must be in the coordinate system of the tiles.
+"""
+from multiprocessing import Pool
+from numpy import arange,array,ndarray,unique
+from shapely import STRtree,box
+from shapely.geometry.base import BaseGeometry
+from geopandas import read_file
+from os import path,scandir
+from .las_header import las_header
+
+class tile_index:
+    def __init__(self,directory:str,workers:int=1)->None:
+        """
+        Reads the header of each LAS/LAZ file of the folder and indexes their bounds.
+
+        Parameters
+        ----------
+        directory : string
+            folder of the lidar files
+        workers : int
+            number of headers read at once
+        """
+        self.directory=directory
+        self.files=sorted(entry.path for entry in scandir(directory) if entry.is_file() and path.splitext(entry.name)[1].lower() in ['.las','.laz'])
+        if workers<=1 or len(self.files)<=1:
+            headers=[self.read_bounds(file) for file in self.files]
+        else:
+            with Pool(workers) as pool:
+                headers=pool.map(tile_index.read_bounds,self.files,chunksize=64)
+        self.bounds=array(headers,dtype='float64').reshape(-1,4)
+        self.boxes=box(self.bounds[:,0],self.bounds[:,1],self.bounds[:,2],self.bounds[:,3])
+        self.tree=STRtree(self.boxes)
+
+    @staticmethod
+    def read_bounds(file:str)->tuple:
+        """
+        Parameters
+        ----------
+        file : string
+            LAS or LAZ file
+
+        Returns
+        -------
+        tuple
+            (min x, min y, max x, max y) of the points of the file
+        """
+        return las_header(file).bounds
+
+    @staticmethod
+    def region_geometry(region:tuple|list|str|BaseGeometry)->BaseGeometry:
+        """
+        Geometry of a region of interest.
+
+        Parameters
+        ----------
+        region : tuple, list, string or geometry
+            bounding box (min x, min y, max x, max y), vector file of polygons (ex. .shp) or
+            shapely geometry
+
+        Returns
+        -------
+        BaseGeometry
+            geometry of the region
+        """
+        if isinstance(region,BaseGeometry):
+            return region
+        if isinstance(region,str):
+            return read_file(region).geometry.union_all()
+        if len(region)!=4:
+            raise Exception("Not a valid region of interest. Options include: a bounding box (min x, min y, max x, max y), a vector file or a shapely geometry")
+        return box(*region)
+
+    def intersecting(self,geometry:BaseGeometry)->ndarray:
+        """
+        Parameters
+        ----------
+        geometry : BaseGeometry
+            geometry (ex. region of interest)
+
+        Returns
+        -------
+        ndarray
+            sorted positions of the tiles that intersect the geometry
+        """
+        return unique(self.tree.query(geometry,predicate='intersects'))
+
+    def select(self,footprint:str=None,region:tuple|list|str|BaseGeometry=None,margin:float=0)->list[str]:
+        """
+        Lidar files that intersect the building footprints and the region of interest.
+
+        Parameters
+        ----------
+        footprint : string
+            building footprint file, all the tiles (of the region) if None
+        region : tuple, list, string or geometry
+            region of interest (see region_geometry), the whole folder if None
+        margin : float
+            distance around each tile within which a building selects the tile (ex. to keep
+            the tiles that can shade the buildings of the next tile)
+
+        Returns
+        -------
+        list[string]
+            lidar files in the order of their name
+        """
+        selected=arange(len(self.files))
+        if region is not None:
+            selected=self.intersecting(self.region_geometry(region))
+        if footprint is not None and len(selected)>0:
+            tiles=self.boxes[selected]
+            if margin>0:
+                tiles=box(self.bounds[selected,0]-margin,self.bounds[selected,1]-margin,self.bounds[selected,2]+margin,self.bounds[selected,3]+margin)
+            #only the footprints within the bounds of the selected tiles are read
+            extent=(self.bounds[selected,0].min()-margin,self.bounds[selected,1].min()-margin,self.bounds[selected,2].max()+margin,self.bounds[selected,3].max()+margin)
+            footprints=read_file(footprint,columns=[],bbox=extent)
+            if len(footprints)==0:
+                selected=selected[:0]
+            else:
+                with_buildings=unique(footprints.sindex.query(tiles,predicate='intersects')[0])
+                selected=selected[with_buildings]
+        print("Selected ",len(selected)," of ",len(self.files)," lidar files")
+        return [self.files[i] for i in selected]
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Manifest of the outputs built from a folder of tiles (ex. the DSM of each LAS file). For
+each tile, the size, modification time and checksum of the source file and the parameters
+used (ex. the resolution) are saved in a .json file once its output is built. A tile is
+only built again when its output is missing or when its source or parameters changed, so
+an interrupted run resumes where it stopped.
+"""
+import json
+from os import path,replace,stat
+from .file_checksum import file_checksum
+
+class tile_manifest:
+    def __init__(self,manifest_file:str)->None:
+        """
+        Parameters
+        ----------
+        manifest_file : string
+            manifest file (.json), created if it does not exist
+        """
+        self.manifest_file=manifest_file
+        self.tiles={}
+        if path.isfile(manifest_file):
+            try:
+                with open(manifest_file,'r') as file:
+                    self.tiles=json.load(file)['tiles']
+            except (ValueError,KeyError):
+                print("Could not read the manifest ",manifest_file,", all the tiles will be built again")
+
+    @staticmethod
+    def signature(source:str)->dict:
+        """
+        Parameters
+        ----------
+        source : string
+            source file of a tile
+
+        Returns
+        -------
+        dict
+            size and modification time of the source file
+        """
+        status=stat(source)
+        return {'size':status.st_size,'modified':status.st_mtime_ns}
+
+    def up_to_date(self,source:str,output:str,parameters:dict)->bool:
+        """
+        Checks if the output of a tile was built from the current source with the same parameters.
+        The source is only hashed when its size is the same but its modification time changed
+        (ex. a file copied again), so unchanged tiles are checked without reading them.
+
+        Parameters
+        ----------
+        source : string
+            source file of the tile
+        output : string
+            output file of the tile
+        parameters : dict
+            parameters used to build the output (ex. the resolution)
+
+        Returns
+        -------
+        bool
+            True if the output does not need to be built again
+        """
+        tile=self.tiles.get(path.basename(source))
+        if tile is None or tile['output']!=path.basename(output) or tile['parameters']!=parameters or not(path.isfile(output)):
+            return False
+        signature=self.signature(source)
+        if signature['size']!=tile['size']:
+            return False
+        if signature['modified']!=tile['modified']:
+            if file_checksum(source).digest()!=tile['sha256']:
+                return False
+            tile.update(signature)
+        return True
+
+    def record(self,source:str,output:str,parameters:dict,sha256:str=None)->None:
+        """
+        Records a tile once its output is built.
+
+        Parameters
+        ----------
+        source : string
+            source file of the tile
+        output : string
+            output file of the tile
+        parameters : dict
+            parameters used to build the output
+        sha256 : string
+            checksum of the source file, calculated if None
+        """
+        tile=self.signature(source)
+        tile['sha256']=file_checksum(source).digest() if sha256 is None else sha256
+        tile['output']=path.basename(output)
+        tile['parameters']=parameters
+        self.tiles[path.basename(source)]=tile
+
+    def save(self)->None:
+        """
+        Saves the manifest. The file is replaced at once so an interruption never leaves a
+        partial manifest.
+        """
+        with open(self.manifest_file+'.tmp','w') as file:
+            json.dump({'tiles':self.tiles},file,indent=1)
+        replace(self.manifest_file+'.tmp',self.manifest_file)
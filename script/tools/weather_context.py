@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Weather data of a region with the solar position, the extraterrestrial irradiance and the
+pressure of each hour. The weather file is read and the solar position calculated once per
+process: the shading, the technical potential and the grid analyses of the same weather
+file and location share one context. The context is also saved next to the weather file
+(weather_file_weather_<key>.npz) so later runs skip reading the file and calculating the
+solar position.
+"""
+import json
+from datetime import timedelta,timezone as fixed_timezone
+from hashlib import sha256
+from numpy import array,asarray,load,savez
+from pandas import DataFrame,DatetimeIndex,DateOffset,Series,read_csv,to_datetime
+from pvlib import atmosphere,iotools,irradiance,solarposition
+from os import path
+from .file_checksum import file_checksum
+
+class weather_context:
+    #contexts already loaded in this process, by key
+    loaded={}
+    #version of the saved context, changed when the content of the file changes
+    version=1
+
+    def __init__(self,weather_file:str,latitude:float,longitude:float,altitude:float,timezone:str,reader:str='psm3')->None:
+        """
+        Reads the weather data from the saved context if it exists, from the weather file otherwise.
+        Use weather_context.get to share the context within a process.
+
+        Parameters
+        ----------
+        weather_file : string
+            weather file
+        latitude, longitude, altitude : float
+            location of the region
+        timezone : string
+            timezone of the region (used for the NASA POWER files)
+        reader : string
+            format of the weather file: psm3 (NSRDB), epw or nasa (NASA POWER .csv)
+        """
+        if reader not in ['psm3','epw','nasa']:
+            raise Exception("Not a valid weather file format. Options include: psm3, epw or nasa")
+        self.weather_file=weather_file
+        self.latitude=latitude
+        self.longitude=longitude
+        self.altitude=altitude
+        self.timezone=timezone
+        self.reader=reader
+        self.key=self.context_key(weather_file,latitude,longitude,altitude,timezone,reader)
+        #the context is only saved for weather files on disk
+        self.context_file=None
+        if path.isfile(weather_file):
+            self.context_file=path.splitext(weather_file)[0]+'_weather_'+self.key[:16]+'.npz'
+        if self.context_file is not None and path.isfile(self.context_file):
+            self.load()
+        else:
+            self.calculate()
+            self.save()
+
+    @classmethod
+    def get(cls,weather_file:str,latitude:float,longitude:float,altitude:float,timezone:str,reader:str='psm3')->'weather_context':
+        """
+        Context of a weather file and location, only read once per process.
+
+        Parameters
+        ----------
+        weather_file : string
+            weather file
+        latitude, longitude, altitude : float
+            location of the region
+        timezone : string
+            timezone of the region (used for the NASA POWER files)
+        reader : string
+            format of the weather file: psm3 (NSRDB), epw or nasa (NASA POWER .csv)
+
+        Returns
+        -------
+        weather_context
+            context of the weather file
+        """
+        key=cls.context_key(weather_file,latitude,longitude,altitude,timezone,reader)
+        if key not in cls.loaded:
+            cls.loaded[key]=cls(weather_file,latitude,longitude,altitude,timezone,reader)
+        return cls.loaded[key]
+
+    @staticmethod
+    def reader_for(latitude:float,mode:str)->str:
+        """
+        Format of the weather file of a region: NASA POWER (.csv) for the Market and grid
+        analyses and epw for the Technical analysis at and above 60 degrees of latitude, NSRDB
+        (psm3) otherwise.
+
+        Parameters
+        ----------
+        latitude : float
+            latitude of the region
+        mode : string
+            'Technical', 'Market', or 'grid'
+
+        Returns
+        -------
+        string
+            format of the weather file
+        """
+        if latitude>=60 and (mode=="Market" or mode=='grid'):
+            return 'nasa'
+        elif latitude>=60:
+            return 'epw'
+        return 'psm3'
+
+    @classmethod
+    def context_key(cls,weather_file:str,latitude:float,longitude:float,altitude:float,timezone:str,reader:str)->str:
+        """
+        Key of the context, made of the content of the weather file, the location, the timezone
+        and the format.
+
+        Returns
+        -------
+        string
+            SHA-256 of the inputs (hexadecimal)
+        """
+        weather=file_checksum(weather_file).digest() if path.isfile(weather_file) else weather_file
+        inputs=json.dumps([cls.version,weather,float(latitude),float(longitude),float(altitude),str(timezone),reader])
+        return sha256(inputs.encode()).hexdigest()
+
+    def calculate(self)->None:
+        """
+        Reads the weather file and calculates the solar position, the extraterrestrial
+        irradiance and the pressure.
+        """
+        print("Reading the weather file ",self.weather_file)
+        if self.reader=='nasa':
+            weather=read_csv(self.weather_file,skiprows=16)
+            weather.rename(columns={'ALLSKY_SFC_SW_DWN':'GHI'},inplace=True)
+            weather.rename(columns={'ALLSKY_SFC_SW_DNI':'DNI'},inplace=True)
+            weather.rename(columns={'ALLSKY_SFC_SW_DIFF':'DHI'},inplace=True)
+            weather.rename(columns={'T2M':'Temperature'},inplace=True)
+            weather['Timestamp']=to_datetime(weather[['YEAR','MO','DY','HR']].astype(str).agg('-'.join,axis=1),format='%Y-%m-%d-%H')
+            weather["Timestamp"] = weather["Timestamp"].dt.tz_localize(self.timezone)
+            weather["Timestamp"] += DateOffset(minutes=30)
+            # Set as index
+            weather = weather.set_index('Timestamp')
+        else:
+            if self.reader=='epw':
+                weather=iotools.read_epw(self.weather_file)[0]
+            else:
+                weather=iotools.read_psm3(self.weather_file)[0] # https://pvlib-python.readthedocs.io/en/stable/generated/pvlib.iotools.read_psm3.html
+            weather.rename(columns={'ghi':'GHI'},inplace=True)
+            weather.rename(columns={'dni':'DNI'},inplace=True)
+            weather.rename(columns={'dhi':'DHI'},inplace=True)
+            weather.rename(columns={'temp_air':'Temperature'},inplace=True)
+        self.weather=weather
+        self.pressure=atmosphere.alt2pres(self.altitude)
+        #Calculate the solar position
+        self.solar_position=solarposition.get_solarposition(
+                time=weather.index,
+                latitude=self.latitude,
+                longitude=self.longitude,
+                altitude=self.altitude,
+                temperature=weather["Temperature"],
+                pressure=self.pressure)
+        self.dni_extra=irradiance.get_extra_radiation(weather.index)
+
+    def frames(self)->tuple[DataFrame,DataFrame]:
+        """
+        Copies of the weather data and of the solar position that can be changed by the analysis.
+
+        Returns
+        -------
+        tuple[DataFrame,DataFrame]
+            weather data and solar position of each hour
+        """
+        return self.weather.copy(),self.solar_position.copy()
+
+    def save(self)->None:
+        """
+        Saves the context to context_file as one array per column.
+        """
+        if self.context_file is None:
+            return
+        index=self.weather.index
+        arrays={'key':self.key,'timezone':str(index.tz) if index.tz is not None else '',
+                'utc_offset':index[0].utcoffset().total_seconds() if index.tz is not None else 0.0,
+                'time':(index.tz_convert('UTC').tz_localize(None) if index.tz is not None else index).values,
+                'index_name':'' if index.name is None else str(index.name),'pressure':self.pressure,'dni_extra':asarray(self.dni_extra,dtype='float64'),
+                'weather_columns':array(self.weather.columns,dtype='U'),'solar_columns':array(self.solar_position.columns,dtype='U')}
+        for i,column in enumerate(self.weather.columns):
+            values=self.weather[column].to_numpy()
+            arrays['weather_'+str(i)]=values.astype('U') if values.dtype==object else values
+        for i,column in enumerate(self.solar_position.columns):
+            arrays['solar_'+str(i)]=self.solar_position[column].to_numpy(dtype='float64')
+        try:
+            savez(self.context_file,**arrays)
+        except OSError:
+            print("Could not save the weather context ",self.context_file)
+
+    def load(self)->None:
+        """
+        Reads the saved context.
+        """
+        with load(self.context_file) as context:
+            if str(context['key'])!=self.key:
+                raise Exception("The saved weather context does not match the weather file: "+self.context_file)
+            index=DatetimeIndex(context['time'])
+            if str(context['timezone']):
+                index=index.tz_localize('UTC')
+                try:
+                    index=index.tz_convert(str(context['timezone']))
+                except Exception:
+                    #fixed offsets (ex. epw files) do not always have a name that can be read back
+                    index=index.tz_convert(fixed_timezone(timedelta(seconds=float(context['utc_offset']))))
+            index.name=str(context['index_name']) or None
+            self.weather=DataFrame({column:context['weather_'+str(i)] for i,column in enumerate(context['weather_columns'])},index=index)
+            self.solar_position=DataFrame({column:context['solar_'+str(i)] for i,column in enumerate(context['solar_columns'])},index=index)
+            self.dni_extra=Series(context['dni_extra'],index=index)
+            self.pressure=float(context['pressure'])
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Zonal statistics by segment (FID) of the rasterized segmentation. The position of
+the rooftop cells and the number of cells of each FID are found once, then the
+average of any raster (or stack of rasters) by FID is a single reduction. The index
+can be saved and memory-mapped so that the processes of a pool share it without a copy.
+"""
+import json
+from numpy import (add,argsort,bincount,concatenate,cumsum,flatnonzero,load,ndarray,save,
+                   stack as stack_arrays,unique)
+from rasterio import open as open_file
+from os import makedirs,path
+
+class zonal_index:
+    #arrays of the index saved by save
+    arrays=['pixels','FID','inverse','counts','order','starts']
+
+    def __init__(self,raster_file:str=None,Rasterized_segments_ravel:ndarray=None)->None:
+        """
+        Indexes the cells of each segment of the rasterized segmentation.
+
+        Parameters
+        ----------
+        raster_file : string
+            rasterized segmentation file (.tif). Cells without a segment have a negative FID (-999).
+        Rasterized_segments_ravel : ndarray
+            1D vector of the rasterized segmentation, used instead of raster_file if it is
+            already in memory
+        """
+        if Rasterized_segments_ravel is None:
+            with open_file(raster_file) as Rasterized_segments:
+                Rasterized_segments_ravel=Rasterized_segments.read(1).ravel()
+        self.size=len(Rasterized_segments_ravel)
+        #Keep only the cells with a positive FID
+        self.pixels=flatnonzero(Rasterized_segments_ravel>0)
+        self.FID,self.inverse,self.counts=unique(Rasterized_segments_ravel[self.pixels],return_inverse=True,return_counts=True)
+        #Order of the cells grouped by FID and position of the first cell of each FID
+        self.order=argsort(self.inverse,kind='stable')
+        self.starts=concatenate([[0],cumsum(self.counts)[:-1]])
+        #folder of the saved index when it is memory-mapped (load)
+        self.directory=None
+
+    def save(self,directory:str)->None:
+        """
+        Saves the index as one .npy file per array so that it can be memory-mapped.
+
+        Parameters
+        ----------
+        directory : string
+            folder of the index, created if it does not exist
+        """
+        makedirs(directory,exist_ok=True)
+        for name in self.arrays:
+            save(path.join(directory,name+'.npy'),getattr(self,name))
+        with open(path.join(directory,'zonal_index.json'),'w') as file:
+            json.dump({'size':int(self.size)},file)
+
+    @classmethod
+    def load(cls,directory:str)->'zonal_index':
+        """
+        Memory-maps a saved index. The arrays are shared through the files by all the
+        processes that load them, and a loaded index sent to another process only sends
+        the name of the folder.
+
+        Parameters
+        ----------
+        directory : string
+            folder of the index (save)
+
+        Returns
+        -------
+        zonal_index
+            index of the cells of each segment
+        """
+        zonal=cls.__new__(cls)
+        with open(path.join(directory,'zonal_index.json'),'r') as file:
+            zonal.size=json.load(file)['size']
+        for name in cls.arrays:
+            setattr(zonal,name,load(path.join(directory,name+'.npy'),mmap_mode='r'))
+        zonal.directory=directory
+        return zonal
+
+    def __getstate__(self)->dict:
+        """
+        A memory-mapped index is sent to another process as the name of its folder.
+        """
+        if self.directory is not None:
+            return {'directory':self.directory}
+        return self.__dict__.copy()
+
+    def __setstate__(self,state:dict)->None:
+        if list(state)==['directory']:
+            state=zonal_index.load(state['directory']).__dict__
+        self.__dict__.update(state)
+
+    def values(self,rasters:ndarray)->ndarray:
+        """
+        Values of the rooftop cells of a stack of rasters.
+
+        Parameters
+        ----------
+        rasters : ndarray
+            stack of rasters (number of rasters first) with all the cells of each raster
+            (2D or 1D) or only those of the rooftop cells
+
+        Returns
+        -------
+        ndarray
+            2D array with one row per raster and one column per cell in pixels
+        """
+        rasters=rasters.reshape(len(rasters),-1)
+        if rasters.shape[1]==self.size:
+            return rasters[:,self.pixels]
+        return rasters
+
+    def mean(self,raster:ndarray)->ndarray:
+        """
+        Average value of a raster by FID.
+
+        Parameters
+        ----------
+        raster : ndarray
+            values of all the cells of a raster (2D or 1D), or only those of the rooftop cells
+
+        Returns
+        -------
+        ndarray
+            average value for each FID (in the order of self.FID)
+        """
+        return bincount(self.inverse,weights=self.values(raster[None])[0],minlength=len(self.FID))/self.counts
+
+    def mean_stack(self,rasters:ndarray|list[str])->ndarray:
+        """
+        Average value by FID of a stack of rasters (ex. one raster per hour).
+
+        Parameters
+        ----------
+        rasters : ndarray or list[str]
+            stack of rasters (number of rasters first) or list of raster files (.tif)
+
+        Returns
+        -------
+        ndarray
+            float32 matrix of the average values with one row per raster and one column per FID
+        """
+        return (self.sum_stack(rasters)/self.counts).astype('float32')
+
+    def sum_stack(self,rasters:ndarray|list[str])->ndarray:
+        """
+        Sum of the values of the cells of each FID for a stack of rasters. Used with
+        self.counts to combine the averages of FIDs split between several tiles.
+
+        Parameters
+        ----------
+        rasters : ndarray or list[str]
+            stack of rasters (number of rasters first) or list of raster files (.tif)
+
+        Returns
+        -------
+        ndarray
+            float64 matrix of the sums with one row per raster and one column per FID
+        """
+        if isinstance(rasters,list):
+            temp=[]
+            for filename in rasters:
+                with open_file(filename) as raster:
+                    temp.append(raster.read(1).ravel()[self.pixels])
+            rasters=stack_arrays(temp)
+        return add.reduceat(self.values(rasters)[:,self.order].astype('float64'),self.starts,axis=1)
@@ -5,7 +5,7 @@ Created on Tue Nov  1 08:51:08 2022
 @author: egaucher
 """
 
-from pandas import ExcelWriter
+from pandas import ExcelWriter,merge
 import region_data
 
 def print_results(data: list,region:region_data) ->None:
@@ -34,7 +34,7 @@ def print_results(data: list,region:region_data) ->None:
 
 def write_output_file(data: list,file_location: str,region:region_data) ->None:
     """
-    Function used to write the results into a text file and the coefficients to an excel sheet.
+    Function used to write the results into a text file and the coefficients to an excel sheet and a csv table.
 
     Parameters
     ----------
@@ -61,6 +61,12 @@ def write_output_file(data: list,file_location: str,region:region_data) ->None:
             data[6].to_excel(writen,sheet_name="Electricity",header=True,index=None)
     except:
         print("Could not write all results")
+    try:
+        #table of the coefficients by threshold that can be loaded with region.load_coefficients
+        merge(data[5],data[6],on='Threshold')[['Threshold','Capacity Coefficient - Shaded','Electricity Coefficient - Shaded']].to_csv(
+            file_location+r'\Coefs_'+region.file_classifier+'.csv',index=False)
+    except:
+        print("Could not write all results")
     return
 
 
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Shared fixtures of the tests. The modules of the script folder are imported the same way
+as in the example scripts, with the script folder on the path. The tools package needs the
+GDAL bindings (osgeo), so the test modules are skipped when they are not installed.
+"""
+import sys
+from os import path
+from numpy import full
+from pandas import DataFrame,concat,date_range
+from pvlib import irradiance,location
+from rasterio import open as open_file
+from rasterio.transform import from_origin
+import pytest
+
+sys.path.insert(0,path.join(path.dirname(path.dirname(path.abspath(__file__))),'script'))
+
+@pytest.fixture
+def dsm_file(tmp_path)->str:
+    """
+    Small DSM with 1 m cells: flat ground at 100 m, a building of 6 m, a taller building
+    of 15 m south of it and a strip of cells without data in the north-east corner.
+
+    Returns
+    -------
+    string
+        DSM file (.tif)
+    """
+    dsm=full((60,60),100.0,dtype='float32')
+    dsm[20:35,15:40]+=6
+    dsm[38:45,20:30]+=15
+    dsm[0:3,50:60]=-32768
+    dsm_file=str(tmp_path/'dsm.tif')
+    with open_file(dsm_file,'w',driver='GTiff',height=60,width=60,count=1,dtype='float32',nodata=-32768,
+                   crs='EPSG:32618',transform=from_origin(445000,5030000,1.0,1.0)) as file:
+        file.write(dsm,1)
+    return dsm_file
+
+@pytest.fixture(scope='session')
+def clearsky()->DataFrame:
+    """
+    Clear-sky irradiance (Ineichen) and solar position of each hour of a year in Ottawa.
+
+    Returns
+    -------
+    DataFrame
+        GHI, DNI, DHI, dni_extra, apparent_zenith and azimuth of each hour
+    """
+    times=date_range('2021-01-01 00:30',periods=8760,freq='h',tz='Etc/GMT+5')
+    site=location.Location(45.4,-75.7,'Etc/GMT+5',70)
+    solarposition=site.get_solarposition(times)
+    weather=site.get_clearsky(times).rename(columns={'ghi':'GHI','dni':'DNI','dhi':'DHI'})
+    weather['dni_extra']=irradiance.get_extra_radiation(times)
+    return concat([weather,solarposition[['apparent_zenith','azimuth']]],axis=1)
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Tests of the numpy shading backend of TimeInDaylight.py on the DSM fixture of
+Validate_shading_backends.py.
+"""
+from numpy import array_equal,stack
+import pytest
+
+pytest.importorskip('osgeo')
+import TimeInDaylight
+from Validate_shading_backends import shading_fixture
+
+def test_tiles_match_whole_mosaic(tmp_path):
+    folder=str(tmp_path/'fixture')
+    region=shading_fixture(folder)
+    whole=TimeInDaylight.TID(region,folder,'Technical','numpy')
+    hours=[i for i in whole.representative_hours(4) if whole.Weather_dataframe['GHI'].iloc[i]>0]
+    expected=stack(whole.shade_hours(hours,r'\Timeindaylight_check_'))
+    #tiles of 40 cells: the segments 1 and 3 cross the border of a tile
+    region.shading_tile_size=40
+    for workers in [1,2]:
+        tiled=TimeInDaylight.TID(region,folder,'Technical','numpy')
+        assert array_equal(tiled.FID,whole.FID)
+        assert stack(tiled.shade_hours(hours,r'\Timeindaylight_check_',workers))==pytest.approx(expected,abs=1e-6)
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Tests of the sums above the solar resource thresholds (tools/coefficient_curve.py)
+against the loop over the thresholds that they replaced in calculate_technical_potential.py.
+"""
+from numpy import nan
+from numpy.random import default_rng
+from pandas import DataFrame
+import pytest
+
+pytest.importorskip('osgeo')
+from tools import coefficient_curve
+
+def test_curve_matches_loop():
+    rng=default_rng(0)
+    rooftop=DataFrame({'TID':rng.random(400)*950,'POA_sum':rng.random(400)*1000,'PV_suitable_area_m2':rng.random(400)*50,
+                       'PV_energy_kWh':rng.random(400)*5000})
+    rooftop.loc[:4,'TID']=nan
+    #segments exactly at a threshold are above it
+    rooftop.loc[5,'TID']=rooftop['POA_sum'].max()*0.3
+    maximum=rooftop['POA_sum'].max()
+    curve=coefficient_curve(rooftop['TID'].values,maximum)
+    thresholds=coefficient_curve.thresholds(10)
+    assert thresholds==pytest.approx([0,0.1,0.2,0.3,0.4,0.5,0.6,0.7,0.8,0.9])
+    for name in ['PV_suitable_area_m2','PV_energy_kWh']:
+        expected=[rooftop.loc[rooftop['TID']>=maximum*percent_filter,name].sum() for percent_filter in thresholds]
+        assert curve.above(rooftop[name].values,thresholds)==pytest.approx(expected,rel=1e-12)
+    #thresholds above every segment
+    assert curve.above(rooftop['PV_energy_kWh'].values,[1.5])[0]==0
+    #a curve of many thresholds
+    fine=coefficient_curve.thresholds(1000)
+    expected=[rooftop.loc[rooftop['TID']>=maximum*percent_filter,'PV_energy_kWh'].sum() for percent_filter in fine]
+    assert curve.above(rooftop['PV_energy_kWh'].values,fine)==pytest.approx(expected,rel=1e-12)
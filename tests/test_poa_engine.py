@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Tests of the plane of array irradiance of many segments at once (tools/poa_engine.py)
+against pvlib.irradiance.get_total_irradiance with the Hay-Davies model.
+"""
+from numpy import array,nansum,ndarray,zeros
+from numpy.random import default_rng
+from pvlib import irradiance
+import pytest
+
+pytest.importorskip('osgeo')
+from tools import poa_engine
+
+#flat, vertical and tilted segments, with azimuths on both sides of north
+tilt=array([0,10,10,25,35,45,60,90,90])
+azimuth=array([180,180,90,270,200,0,135,359,45])
+
+def engine(clearsky,chunk_size:int=10**7)->poa_engine:
+    """
+    POA engine of the hours of the clear-sky year.
+    """
+    return poa_engine(clearsky['apparent_zenith'],clearsky['azimuth'],clearsky['DNI'],clearsky['GHI'],clearsky['DHI'],
+                      clearsky['dni_extra'],chunk_size=chunk_size)
+
+def reference(clearsky)->ndarray:
+    """
+    POA of each segment calculated with pvlib, one segment at a time.
+    """
+    poa=zeros((len(clearsky),len(tilt)))
+    for i in range(len(tilt)):
+        poa[:,i]=irradiance.get_total_irradiance(tilt[i],azimuth[i],clearsky['apparent_zenith'],clearsky['azimuth'],clearsky['DNI'],
+                                                 clearsky['GHI'],clearsky['DHI'],dni_extra=clearsky['dni_extra'],model='haydavies')['poa_global'].values
+    return poa
+
+def test_poa_matches_pvlib(clearsky):
+    expected=reference(clearsky)
+    #chunks of 2 segments
+    assert engine(clearsky,2*8760).poa(tilt,azimuth)==pytest.approx(expected,rel=1e-13,abs=1e-10)
+    assert engine(clearsky).poa(tilt,azimuth,1/1000,'float32')==pytest.approx(expected/1000,rel=1e-6,abs=1e-6)
+
+def test_sums_and_shading(clearsky):
+    expected=reference(clearsky)
+    assert engine(clearsky,3*8760).poa_sum(tilt,azimuth,1/1000)==pytest.approx(nansum(expected,axis=0)/1000,rel=1e-13)
+    TID=default_rng(0).random(expected.shape)
+    poa,shaded=engine(clearsky,3*8760).shaded_poa(TID,tilt,azimuth)
+    assert poa==pytest.approx(expected,rel=1e-13,abs=1e-10)
+    assert shaded==pytest.approx(TID*expected,rel=1e-13,abs=1e-10)
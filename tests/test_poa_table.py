@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Tests of the lookup table of the POA by orientation (tools/poa_table.py): values of the
+columns, rounding of the orientations and table saved in a folder keyed on its inputs.
+"""
+import json
+from os import listdir,path
+from numpy import array,array_equal,float32,memmap,nansum
+from numpy.random import default_rng
+import pytest
+
+pytest.importorskip('osgeo')
+from tools import poa_engine,poa_table
+
+inputs={'weather_file':'checksum','latitude':45.4,'longitude':-75.7,'timezone':'Etc/GMT+5'}
+
+def engine(clearsky,albedo:float=0.25)->poa_engine:
+    """
+    POA engine of the hours of the clear-sky year.
+    """
+    return poa_engine(clearsky['apparent_zenith'],clearsky['azimuth'],clearsky['DNI'],clearsky['GHI'],clearsky['DHI'],
+                      clearsky['dni_extra'],albedo)
+
+def test_columns(clearsky):
+    rng=default_rng(0)
+    tilt,azimuth=rng.integers(10,60,200).astype(float),rng.integers(-180,360,200).astype(float)
+    table=poa_table(engine(clearsky))
+    hours=array([100,4000,4001,6000])
+    assert array_equal(table.poa(tilt,azimuth),engine(clearsky).poa(tilt,azimuth%360,dtype='float32'))
+    assert array_equal(table.poa(tilt,azimuth,hours,1/1000),engine(clearsky).poa(tilt,azimuth%360,dtype='float32')[hours]*(1/1000))
+    #one column per orientation
+    assert len(table.keys)==len(set(zip(tilt,azimuth%360)))
+    assert table.poa_sum(tilt,azimuth)==pytest.approx(nansum(table.poa(tilt,azimuth),axis=0,dtype='float64'),rel=1e-12)
+    TID=rng.random((len(hours),len(tilt)))
+    poa,shaded=table.shaded_poa(TID,tilt,azimuth,hours,chunk_size=400)
+    assert array_equal(poa,table.poa(tilt,azimuth,hours)) and array_equal(shaded,TID*poa)
+
+def test_resolution(clearsky):
+    table=poa_table(engine(clearsky),1.0)
+    columns=table.index(array([10.2,9.8,35.0,35.0]),array([179.6,180.4,359.7,0.2]))
+    assert columns[0]==columns[1] and columns[2]==columns[3] and len(table.keys)==2
+
+def test_saved_table(clearsky,tmp_path):
+    prefix=str(tmp_path/'weather')
+    table=poa_table(engine(clearsky),0,prefix,inputs)
+    first=table.poa(array([20.0,30.0]),array([180.0,90.0]))
+    directory=table.directory
+    values=path.join(directory,'values_0.npy')
+    saved=open(values,'rb').read()
+    #the saved columns are memory-mapped and a new orientation is appended without rewriting them
+    loaded=poa_table(engine(clearsky),0,prefix,inputs)
+    assert len(loaded.chunks)==1 and isinstance(loaded.chunks[0],memmap)
+    assert array_equal(loaded.poa(array([30.0,20.0]),array([90.0,180.0])),first[:,::-1])
+    assert len(loaded.chunks)==1
+    both=loaded.poa(array([20.0,45.0]),array([180.0,270.0]))
+    assert sorted(listdir(directory))==['keys_0.npy','keys_1.npy','table.json','values_0.npy','values_1.npy']
+    assert open(values,'rb').read()==saved
+    assert array_equal(poa_table(engine(clearsky),0,prefix,inputs).poa(array([20.0,45.0]),array([180.0,270.0])),both)
+    assert array_equal(both[:,1],engine(clearsky).poa(array([45.0]),array([270.0]),dtype=float32)[:,0])
+
+def test_table_key(clearsky,tmp_path):
+    prefix=str(tmp_path/'weather')
+    table=poa_table(engine(clearsky),0,prefix,inputs)
+    table.index(array([20.0]),array([180.0]))
+    #another location, albedo or resolution with the same weather file has its own table
+    for other in [poa_table(engine(clearsky),0,prefix,dict(inputs,timezone='Etc/GMT+4')),poa_table(engine(clearsky,0.2),0,prefix,inputs),
+                  poa_table(engine(clearsky),1.0,prefix,inputs)]:
+        assert other.directory!=table.directory and len(other.keys)==0
+    #a folder with another description is not used and is started again
+    with open(path.join(table.directory,'table.json')) as file:
+        header=json.load(file)
+    with open(path.join(table.directory,'table.json'),'w') as file:
+        json.dump(dict(header,hours=24),file)
+    table=poa_table(engine(clearsky),0,prefix,inputs)
+    assert len(table.keys)==0
+    table.index(array([30.0]),array([180.0]))
+    assert sorted(listdir(table.directory))==['keys_0.npy','table.json','values_0.npy']
+    assert len(poa_table(engine(clearsky),0,prefix,inputs).keys)==1
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Tests of the solar resource bins (tools/resource_bins.py) against the loop over the
+thresholds that they replaced in calculate_technical_potential.py.
+"""
+from numpy import errstate,nan,zeros
+from numpy.random import default_rng
+import pytest
+
+pytest.importorskip('osgeo')
+from tools import resource_bins
+
+def loop(resource,maximum,capacity,shaded):
+    """
+    Capacity and weighted hourly profile of each bin, one threshold at a time.
+    """
+    threshold=[0,0.1,0.2,0.3,0.4,0.5,0.6,0.7,0.8,0.9]
+    totals,profiles=zeros(len(threshold)),zeros((len(threshold),shaded.shape[0]))
+    for ind,percent_filter in enumerate(threshold):
+        segments=(resource>=maximum*percent_filter)&(resource<maximum*(percent_filter+0.1))
+        totals[ind]=capacity[segments].sum()
+        with errstate(divide='ignore',invalid='ignore'):
+            profiles[ind]=shaded[:,segments]@capacity[segments]/capacity[segments].sum()
+    profiles[profiles!=profiles]=0
+    return totals,profiles
+
+def test_bins_match_loop():
+    rng=default_rng(0)
+    resource=rng.random(500)*900
+    #no segment in the top bins, segments without resource and at the maximum
+    resource[resource>700]*=0.5
+    resource[:5]=nan
+    maximum=1000.0
+    resource[5]=maximum
+    capacity=rng.random(500)*10
+    shaded=rng.random((48,500))
+    expected_totals,expected_profiles=loop(resource,maximum,capacity,shaded)
+    bins=resource_bins(resource,maximum)
+    assert bins.thresholds()==pytest.approx([0,0.1,0.2,0.3,0.4,0.5,0.6,0.7,0.8,0.9])
+    assert bins.sum(capacity)==pytest.approx(expected_totals,rel=1e-12)
+    assert expected_totals[-1]==0
+    #hourly values given by groups of segments
+    chunks=((start,shaded[:,start:start+64]) for start in range(0,500,64))
+    assert bins.weighted_profiles(chunks,capacity,48)==pytest.approx(expected_profiles,rel=1e-12)
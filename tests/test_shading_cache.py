@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Tests of the cache of the sunlit fraction by sun position (tools/shading_cache.py): the
+average sunlit fraction of each segment must be the one of the shading engine with the
+sun altitude rounded to the tolerance.
+"""
+from numpy import array_equal,full,isnan,rint,zeros
+from numpy.random import default_rng
+from pandas import date_range
+import pytest
+
+pytest.importorskip('osgeo')
+from tools import shadow_engine,shading_cache,zonal_index
+
+@pytest.fixture
+def zonal():
+    segments=full((60,60),-999,dtype='int32')
+    segments[10:50,10:45]=default_rng(0).integers(1,20,(40,35))
+    #segment partly on the cells without data of the DSM
+    segments[0:5,48:60]=30
+    return zonal_index(Rasterized_segments_ravel=segments.ravel())
+
+@pytest.fixture
+def sun():
+    times=date_range('2021-06-21 04:00',periods=17,freq='h',tz='Etc/GMT+5')
+    return shadow_engine.sun_positions(times,45.4,-75.7,time_step=5)
+
+def test_cache_matches_engine(dsm_file,zonal,sun):
+    engine=shadow_engine(dsm_file,zonal.pixels,max_dist=20.0)
+    cache=shading_cache(engine,zonal,0.25)
+    cache.update(sun)
+    assert len(cache.missing(sun))==0
+    result=cache.sunlit_fraction(sun)
+    for hour,positions in sun.groupby('hour'):
+        positions=positions[positions['elevation']>0]
+        sunlit=zeros(len(zonal.pixels))
+        for azimuth,elevation in zip(positions['azimuth'].values,positions['elevation'].values):
+            sunlit+=rint(elevation/0.25)*0.25>engine.horizon_angle(engine.sector(azimuth))
+        sunlit=sunlit/max(1,len(positions))
+        sunlit[isnan(engine.load_dsm().ravel()[zonal.pixels])]=0
+        assert result[hour]==pytest.approx(zonal.mean(sunlit),abs=1e-6)
+    #the segment on the cells without data is only sunlit on its cells with data
+    assert result[:,-1].max()<1
+
+def test_save_load(dsm_file,zonal,sun,tmp_path):
+    cache_file=str(tmp_path/'shading_cache.npz')
+    engine=shadow_engine(dsm_file,zonal.pixels,max_dist=20.0)
+    cache=shading_cache(engine,zonal,0.25,cache_file)
+    cache.update(sun)
+    cache.save()
+    loaded=shading_cache(engine,zonal,0.25,cache_file)
+    assert array_equal(loaded.keys,cache.keys) and len(loaded.missing(sun))==0
+    assert array_equal(loaded.sunlit_fraction(sun),cache.sunlit_fraction(sun))
+    #another tolerance does not use the saved cache
+    assert len(shading_cache(engine,zonal,0.5,cache_file).keys)==0
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Tests of the numpy shading engine (tools/shadow_engine.py): horizon of the cells against a
+walk along the ray of each azimuth sector, sunlit fraction against the horizon and horizon
+read back from the horizon file.
+"""
+from numpy import arange,arctan,array_equal,cos,degrees,hypot,inf,isnan,memmap,radians,sin,zeros
+from numpy.random import default_rng
+from rasterio.windows import Window
+import pytest
+
+pytest.importorskip('osgeo')
+from tools import shadow_engine
+
+def ray_horizon(dsm,row:int,col:int,sector:int,az_fraction:float=15.0,max_dist:float=50.0)->float:
+    """
+    Horizon of one cell (1 m cells) found by walking along the centre of the sector.
+    """
+    azimuth=radians((sector+0.5)*az_fraction)
+    slope,seen=-inf,set()
+    for step in range(1,int(max_dist)+1):
+        offset=(int(round(-step*cos(azimuth))),int(round(step*sin(azimuth))))
+        target=(row+offset[0],col+offset[1])
+        if offset in seen or not(0<=target[0]<dsm.shape[0] and 0<=target[1]<dsm.shape[1]) or isnan(dsm[target]):
+            continue
+        seen.add(offset)
+        slope=max(slope,(dsm[target]-dsm[row,col])/hypot(*offset))
+    return degrees(arctan(slope))
+
+def test_horizon_angle_matches_ray(dsm_file):
+    engine=shadow_engine(dsm_file,max_dist=20.0)
+    dsm=engine.load_dsm()
+    cells=default_rng(0).choice(dsm.size,50,replace=False)
+    for sector in [0,5,12,20]:
+        horizon=engine.horizon_angle(sector)
+        for cell in cells:
+            row,col=divmod(cell,dsm.shape[1])
+            if not(isnan(dsm[row,col])):
+                assert horizon[cell]==pytest.approx(ray_horizon(dsm,row,col,sector,max_dist=20.0),abs=1e-4)
+
+def test_horizon_of_known_cells(dsm_file):
+    engine=shadow_engine(dsm_file,max_dist=10.0)
+    #open ground far from the buildings
+    assert engine.horizon_angle(3).reshape(60,60)[55,55]==0
+    #ground north of the building looking south (sector 12, 180-195 degrees): 6 m at 1 m
+    assert engine.horizon_angle(12).reshape(60,60)[19,25]==pytest.approx(degrees(arctan(6.0)),abs=1e-4)
+    #the whole raster and the cells give the same horizon (nan without data)
+    assert array_equal(engine.horizon_raster(12).ravel(),engine.horizon_angle(12),equal_nan=True)
+
+def test_sunlit_fraction(dsm_file):
+    pixels=arange(60*60)
+    engine=shadow_engine(dsm_file,pixels,max_dist=20.0)
+    rng=default_rng(1)
+    azimuth,elevation=rng.random(200)*360,rng.random(200)*100-10
+    sunlit=engine.sunlit_fraction(azimuth,elevation)
+    daylight=elevation>0
+    expected=zeros(len(pixels))
+    for sector,altitude in zip(engine.sector(azimuth[daylight]),elevation[daylight]):
+        expected+=altitude>engine.horizon_angle(sector)
+    expected/=daylight.sum()
+    expected[isnan(engine.load_dsm().ravel())]=0
+    assert sunlit==pytest.approx(expected,abs=1e-6)
+    #the ground north of the building is shaded by a low sun from the south and sunlit at noon in summer
+    cell=19*60+25
+    assert engine.sunlit_fraction(zeros(1)+185,zeros(1)+30)[cell]==0
+    assert engine.sunlit_fraction(zeros(1)+185,zeros(1)+85)[cell]==1
+    #no sun above the horizon
+    assert (engine.sunlit_fraction(zeros(1)+185,zeros(1)-5)==0).all()
+
+def test_horizon_file_is_memory_mapped(dsm_file,tmp_path):
+    pixels=default_rng(2).permutation(60*60)[:900]
+    horizon_file=str(tmp_path/'dsm_horizon.tif')
+    in_memory=shadow_engine(dsm_file,pixels,max_dist=20.0)
+    shadow_engine(dsm_file,pixels,max_dist=20.0,horizon_file=horizon_file)
+    #the second engine only reads the horizon of the cells, memory-mapped, and not the DSM
+    engine=shadow_engine(dsm_file,pixels,max_dist=20.0,horizon_file=horizon_file)
+    assert engine.dsm is None and isinstance(engine.horizon[0],memmap)
+    assert array_equal(engine.blocked,in_memory.blocked)
+    #the horizon of the cells without data is not used (never sunlit)
+    for sector in range(engine.num_sectors):
+        assert array_equal(engine.horizon_angle(sector)[~engine.blocked],in_memory.horizon_angle(sector)[~engine.blocked])
+    azimuth,elevation=arange(0,360,7.5),zeros(48)+20
+    assert array_equal(engine.sunlit_fraction(azimuth,elevation),in_memory.sunlit_fraction(azimuth,elevation))
+    #other cells of the same horizon file
+    other=shadow_engine(dsm_file,pixels[:100],max_dist=20.0,horizon_file=horizon_file)
+    assert array_equal(other.horizon_angle(12)[~other.blocked],in_memory.horizon_angle(12)[:100][~other.blocked])
+
+def test_window(dsm_file,tmp_path):
+    window=Window(10,15,40,35)
+    pixels=arange(40*35)
+    engine=shadow_engine(dsm_file,pixels,max_dist=20.0,horizon_file=str(tmp_path/'tile_horizon.tif'),window=window)
+    whole=shadow_engine(dsm_file,max_dist=20.0).horizon_raster(12)[15:50,10:50]
+    window_engine=shadow_engine(dsm_file,pixels,max_dist=20.0,window=window)
+    assert array_equal(engine.horizon_angle(12),window_engine.horizon_angle(12))
+    #the cells far enough from the border of the window see the same horizon as in the whole DSM
+    assert array_equal(engine.horizon_angle(12).reshape(35,40)[:10],whole[:10])
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Tests of the file format of the TID results (tools/tid_store.py).
+"""
+from numpy import array_equal,float32,memmap,nan
+from numpy.random import default_rng
+from pandas import DataFrame,date_range
+import pytest
+
+pytest.importorskip('osgeo')
+from tools import tid_store
+
+def test_round_trip(tmp_path):
+    index=date_range('2021-01-01',periods=500,freq='h',tz='Etc/GMT+5')
+    TID=DataFrame(default_rng(0).random((500,7)),index=index,columns=[3,5,8,13,21,34,55])
+    TID.iloc[10:20,2]=nan
+    original=TID.copy()
+    store=tid_store(str(tmp_path/'Timeindaylight_hourly.npy'))
+    assert not(store.exists())
+    store.write(TID,chunk_size=3)
+    assert store.exists()
+    assert TID.equals(original)
+    saved=store.read()
+    assert saved.index.equals(index) and str(saved.index.tz)=='Etc/GMT+5'
+    assert array_equal(saved.columns,TID.columns)
+    assert array_equal(saved.to_numpy(),TID.to_numpy().astype(float32),equal_nan=True)
+    #a range of segments is read from the memory-mapped matrix
+    columns=store.columns(2,5)
+    assert isinstance(columns,memmap)
+    assert array_equal(columns,TID.iloc[:,2:5].to_numpy().astype(float32),equal_nan=True)
+    store.delete()
+    assert not(store.exists())
+
+def test_hours_of_the_representative_days(tmp_path):
+    TID=DataFrame(default_rng(1).random((96,4)),columns=[1,2,3,4])
+    store=tid_store(str(tmp_path/'Timeindaylight_rep.npy'))
+    store.write(TID)
+    saved=store.read()
+    assert array_equal(saved.index,TID.index) and array_equal(saved.columns,TID.columns)
+    assert array_equal(saved.to_numpy(),TID.to_numpy().astype(float32))
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Tests of the zonal index of the rasterized segmentation (tools/zonal_index.py) against
+an average by FID with pandas.
+"""
+import pickle
+from numpy import array_equal,float32,full,memmap
+from numpy.random import default_rng
+from pandas import DataFrame
+import pytest
+
+pytest.importorskip('osgeo')
+from tools import zonal_index
+
+@pytest.fixture
+def segments():
+    rng=default_rng(0)
+    segments=full((40,50),-999,dtype='int32')
+    segments[5:35,5:45]=rng.integers(1,30,(30,40))
+    #FID without cells and FIDs that are not consecutive
+    segments[segments==7]=-999
+    segments[segments==12]=112
+    return segments
+
+def test_mean(segments):
+    zonal=zonal_index(Rasterized_segments_ravel=segments.ravel())
+    raster=default_rng(1).random(segments.shape).astype(float32)
+    rooftop=segments.ravel()>0
+    expected=DataFrame({'FID':segments.ravel()[rooftop],'value':raster.ravel()[rooftop].astype('float64')}).groupby('FID')['value']
+    assert array_equal(zonal.FID,expected.mean().index)
+    assert array_equal(zonal.counts,expected.size().values)
+    assert zonal.mean(raster)==pytest.approx(expected.mean().values,rel=1e-12)
+    #only the rooftop cells
+    assert zonal.mean(raster.ravel()[rooftop])==pytest.approx(expected.mean().values,rel=1e-12)
+
+def test_stack(segments):
+    zonal=zonal_index(Rasterized_segments_ravel=segments.ravel())
+    rasters=default_rng(2).random((6,)+segments.shape).astype(float32)
+    sums=zonal.sum_stack(rasters)
+    means=zonal.mean_stack(rasters)
+    for hour,raster in enumerate(rasters):
+        assert means[hour]==pytest.approx(zonal.mean(raster),rel=1e-6)
+        assert sums[hour]==pytest.approx(zonal.mean(raster)*zonal.counts,rel=1e-12)
+
+def test_save_load(segments,tmp_path):
+    zonal=zonal_index(Rasterized_segments_ravel=segments.ravel())
+    zonal.save(str(tmp_path/'index'))
+    loaded=zonal_index.load(str(tmp_path/'index'))
+    assert isinstance(loaded.pixels,memmap) and loaded.size==zonal.size
+    for name in zonal_index.arrays:
+        assert array_equal(getattr(loaded,name),getattr(zonal,name))
+    #a loaded index is sent to another process as the name of its folder
+    state=pickle.dumps(loaded)
+    assert len(state)<1000
+    raster=default_rng(3).random(segments.shape)
+    assert array_equal(pickle.loads(state).mean(raster),zonal.mean(raster))